@@ -13,15 +13,107 @@
 # under the License.
 
 
-def switch_interface_config_select_name(switch_interface_config, names):
-    """Select and return all switch interfaces matching requested names.
+import re
+
+# Prefix of a selector which is a regular expression.
+REGEX_SELECTOR_PREFIX = "re:"
+
+# Regular expression matching a selector for a range of interface names, e.g.
+# Ethernet1/1-48.
+RANGE_SELECTOR_RE = re.compile(r"^(.*\D)(\d+)-(\d+)$")
+
+# Regular expression matching an interface name ending in a number.
+NUMBERED_NAME_RE = re.compile(r"^(.*\D)(\d+)$")
+
+
+def _compile_selectors(selectors, ranges=False):
+    """Compile a list of selectors.
+
+    A selector may be an exact value, a regular expression prefixed with
+    're:', or if ranges is True, a range of interface names such as
+    Ethernet1/1-48.
+
+    :param selectors: String or list of strings - selectors to compile
+    :param ranges: Whether to compile range selectors
+    :returns: a tuple of a set of exact values, a list of compiled regular
+        expressions, and a dict mapping the prefixes of range selectors to
+        lists of tuples of the start, end and zero padded width of each
+        range.
+    """
+    if isinstance(selectors, str):
+        selectors = [selectors]
+
+    exact = set()
+    patterns = []
+    compiled_ranges = {}
+    for selector in selectors:
+        if (isinstance(selector, str) and
+                selector.startswith(REGEX_SELECTOR_PREFIX)):
+            patterns.append(
+                re.compile(selector[len(REGEX_SELECTOR_PREFIX):]))
+            continue
+        exact.add(selector)
+        match = None
+        if ranges and isinstance(selector, str):
+            match = RANGE_SELECTOR_RE.match(selector)
+        if match:
+            prefix, start, end = match.groups()
+            # Preserve zero padding of the start of the range.
+            width = len(start) if start.startswith('0') else 0
+            compiled_ranges.setdefault(prefix, []).append(
+                (int(start), int(end), width))
+    return exact, patterns, compiled_ranges
+
+
+def _matches(value, exact, patterns):
+    return value in exact or any(pattern.fullmatch(str(value))
+                                 for pattern in patterns)
+
+
+def _in_ranges(name, ranges):
+    """Return whether an interface name is in any of a dict of ranges.
+
+    Names are matched numerically, rather than by expanding each range.
+    """
+    match = NUMBERED_NAME_RE.match(name)
+    if not match or match.group(1) not in ranges:
+        return False
+    digits = match.group(2)
+    number = int(digits)
+    for start, end, width in ranges[match.group(1)]:
+        if (start <= number <= end and
+                digits == str(number).zfill(width)):
+            return True
+    return False
+
+
+def switch_interface_config_index(switch_interface_config):
+    """Return an index of switch interfaces by description and mode.
+
+    The index may be built once and passed to the selection filters which
+    accept it, to avoid rebuilding it for each selection.
 
     :param switch_interface_config: Switch interface configuration dict
-    :param names: String or list of strings - interface names to match
+    :returns: a dict with items 'descriptions', a dict mapping descriptions to
+        lists of interface names, 'trunk', a list of names of trunk
+        interfaces, and 'access', a list of names of other interfaces.
     """
-    if isinstance(names, str):
-        names = [names]
+    descriptions = {}
+    trunk = []
+    access = []
+    for name, config in switch_interface_config.items():
+        description = config.get('description')
+        if description is not None:
+            descriptions.setdefault(description, []).append(name)
+        if config.get('ngs_trunk_port', True):
+            trunk.append(name)
+        else:
+            access.append(name)
+    return {'descriptions': descriptions, 'trunk': trunk, 'access': access}
 
+
+def _select(switch_interface_config, names):
+    """Return the interfaces in a set of names, preserving their order."""
     return {
         name: config
         for name, config in switch_interface_config.items()
@@ -29,36 +121,70 @@ def switch_interface_config_select_name(switch_interface_config, names):
     }
 
 
-def switch_interface_config_select_description(switch_interface_config, descriptions):
+def switch_interface_config_select_name(switch_interface_config, names):
+    """Select and return all switch interfaces matching requested names.
+
+    Names may be exact interface names, regular expressions prefixed with
+    're:', or ranges of interface names such as Ethernet1/1-48.
+
+    :param switch_interface_config: Switch interface configuration dict
+    :param names: String or list of strings - interface names to match
+    """
+    exact, patterns, ranges = _compile_selectors(names, ranges=True)
+    selected = exact.intersection(switch_interface_config)
+    if patterns or ranges:
+        selected.update(name for name in switch_interface_config
+                        if (_matches(name, exact, patterns) or
+                            _in_ranges(name, ranges)))
+    return _select(switch_interface_config, selected)
+
+
+def switch_interface_config_select_description(switch_interface_config,
+                                               descriptions, index=None):
     """Select and return all switch interfaces matching requested descriptions.
 
+    Descriptions may be exact descriptions, or regular expressions prefixed
+    with 're:'. Only trunk interfaces are selected.
+
     :param switch_interface_config: Switch interface configuration dict
     :param descriptions: String or list of strings - descriptions to match
+    :param index: Optional index of switch_interface_config returned by
+        switch_interface_config_index
     """
-    if isinstance(descriptions, str):
-        descriptions = [descriptions]
+    if index is None:
+        index = switch_interface_config_index(switch_interface_config)
 
-    return {
-        name: config
-        for name, config in switch_interface_config.items()
-        if (config.get('description') in descriptions and
-            config.get('ngs_trunk_port', True))
-    }
+    exact, patterns, _ = _compile_selectors(descriptions)
+    if patterns:
+        matching = [description for description in index['descriptions']
+                    if _matches(description, exact, patterns)]
+    else:
+        matching = exact.intersection(index['descriptions'])
+    trunk = set(index['trunk'])
+    selected = {name
+                for description in matching
+                for name in index['descriptions'][description]
+                if name in trunk}
+    return _select(switch_interface_config, selected)
 
 
-def switch_interface_config_select_trunk(switch_interface_config):
+def switch_interface_config_select_trunk(switch_interface_config, index=None):
     """Select and return all switch interfaces which are trunk links.
 
     Interfaces are assumed to be trunked, unless they have a ngs_trunk_port
     item which is set to False.
 
     :param switch_interface_config: Switch interface configuration dict
+    :param index: Optional index of switch_interface_config returned by
+        switch_interface_config_index
     """
-    return {
-        name: config
-        for name, config in switch_interface_config.items()
-        if config.get('ngs_trunk_port', True)
-    }
+    if index is None:
+        return {
+            name: config
+            for name, config in switch_interface_config.items()
+            if config.get('ngs_trunk_port', True)
+        }
+    return _select(switch_interface_config, set(index['trunk']))
 
 
 class FilterModule(object):
@@ -66,6 +192,7 @@ class FilterModule(object):
 
     def filters(self):
         return {
+            'switch_interface_config_index': switch_interface_config_index,
             'switch_interface_config_select_name': switch_interface_config_select_name,
             'switch_interface_config_select_description': switch_interface_config_select_description,
             'switch_interface_config_select_trunk': switch_interface_config_select_trunk,
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2026 StackHPC Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Export hardware introspection data for Ironic nodes.
+
+This script is run in the bifrost_deploy container, with the cloud to use set
+via OS_CLOUD. The inventories of the named nodes are queried concurrently
+using a single API session, and written to stdout as newline-delimited JSON
+as they are received. Each line is an object with items 'name', and either
+'data', the node's inventory, or 'error'.
+"""
+
+import argparse
+from concurrent import futures
+import json
+import sys
+
+# Minimum Ironic API microversion providing the node inventory API.
+INVENTORY_MICROVERSION = "1.81"
+
+
+def get_inventory(conn, name):
+    """Return the introspection data of a node."""
+    response = conn.baremetal.get("/nodes/%s/inventory" % name,
+                                  microversion=INVENTORY_MICROVERSION,
+                                  raise_exc=False)
+    if response.status_code != 200:
+        raise Exception("HTTP %d: %s" % (response.status_code,
+                                         response.text.strip()))
+    return response.json()
+
+
+def export(conn, names, concurrency, out):
+    """Write the introspection data of nodes to out as they are received."""
+    with futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pending = {executor.submit(get_inventory, conn, name): name
+                   for name in names}
+        for future in futures.as_completed(pending):
+            record = {"name": pending[future]}
+            try:
+                record["data"] = future.result()
+            except Exception as e:
+                record["error"] = str(e)
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=8,
+                        help="Maximum number of concurrent API requests")
+    parser.add_argument("names", nargs="*", help="Names of nodes")
+    args = parser.parse_args(argv)
+    # Import here to allow testing without openstacksdk.
+    import openstack
+    conn = openstack.connect()
+    export(conn, list(dict.fromkeys(args.names)), max(1, args.concurrency),
+           sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
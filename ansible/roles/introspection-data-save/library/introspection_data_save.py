@@ -0,0 +1,207 @@
+#!/usr/bin/python
+
+# Copyright (c) 2026 StackHPC Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+DOCUMENTATION = '''
+---
+module: introspection_data_save
+short_description: Save hardware introspection data of nodes to files
+description:
+    - Split a file of newline-delimited JSON output by
+      export-introspection-data.py into a file per node. The file is read a
+      line at a time, and records are serialised and written concurrently.
+      Files are only written if their content has changed.
+options:
+  src:
+    description: >
+      Path to a file of newline-delimited JSON, with one object per node with
+      items name, and either data or error.
+    required: True
+    type: path
+  nodes:
+    description: >
+      List of names of nodes for which data is expected. Nodes without a
+      record in data are reported as failed.
+    default: []
+    type: list
+    elements: str
+  path:
+    description: Path to a directory in which to save files.
+    required: True
+    type: path
+  format:
+    description: Format in which to save data.
+    default: json
+    choices: [json, yaml]
+    type: str
+  concurrency:
+    description: Maximum number of files to write concurrently.
+    default: 8
+    type: int
+author: StackHPC
+'''
+
+EXAMPLES = '''
+- name: Ensure introspection data is saved locally
+  introspection_data_save:
+    src: /tmp/introspection-data.ndjson
+    nodes: "{{ ansible_play_hosts }}"
+    path: /path/to/introspection-data
+    format: yaml
+'''
+
+RETURN = '''
+saved:
+    description: Sorted list of names of nodes whose data was saved.
+    type: list
+    returned: always
+failed_nodes:
+    description: >
+      Dict mapping names of nodes whose data could not be saved to an error
+      message.
+    type: dict
+    returned: always
+'''
+
+from concurrent import futures
+import json
+import os
+
+from ansible.module_utils.basic import AnsibleModule
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+
+def iter_records(lines):
+    """Parse newline-delimited JSON records, ignoring other lines."""
+    for line in lines:
+        line = line.strip()
+        if not line.startswith("{"):
+            continue
+        record = json.loads(line)
+        yield record["name"], record
+
+
+def serialise(data, fmt):
+    """Serialise data in the same format as to_nice_json/to_nice_yaml."""
+    if fmt == "yaml":
+        return yaml.safe_dump(data, indent=4, allow_unicode=True,
+                              default_flow_style=False)
+    return json.dumps(data, sort_keys=True, indent=4,
+                      separators=(',', ': '))
+
+
+def save(path, content, check_mode):
+    """Write content to a file if it differs, returning whether it changed."""
+    try:
+        with open(path) as f:
+            if f.read() == content:
+                return False
+    except OSError:
+        pass
+    if not check_mode:
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    return True
+
+
+def save_record(path, data, fmt, check_mode):
+    """Serialise a record's data and save it to a file."""
+    return save(path, serialise(data, fmt), check_mode)
+
+
+def save_all(records, path, fmt, concurrency, check_mode):
+    """Save the data of each record to a file concurrently.
+
+    Records are consumed as they are saved, so that at most twice the
+    concurrency are held in memory at once.
+
+    :param records: an iterable of tuples of (node name, record).
+    :returns: a tuple of a dict mapping saved node names to whether their
+        file changed, and a dict mapping failed node names to errors.
+    """
+    saved = {}
+    failed = {}
+    pending = {}
+
+    def collect(done):
+        for future in done:
+            name = pending.pop(future)
+            try:
+                saved[name] = future.result()
+            except Exception as e:
+                failed[name] = str(e)
+
+    with futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for name, record in records:
+            if "data" not in record:
+                failed[name] = record.get("error", "No data")
+                continue
+            if len(pending) >= 2 * concurrency:
+                done, _ = futures.wait(pending,
+                                       return_when=futures.FIRST_COMPLETED)
+                collect(done)
+            file_path = os.path.join(path, "%s.%s" % (name, fmt))
+            future = executor.submit(save_record, file_path, record["data"],
+                                     fmt, check_mode)
+            pending[future] = name
+        collect(futures.as_completed(list(pending)))
+    return saved, failed
+
+
+def run_module():
+    module = AnsibleModule(
+        argument_spec=dict(
+            src=dict(type='path', required=True),
+            nodes=dict(type='list', elements='str', default=[]),
+            path=dict(type='path', required=True),
+            format=dict(type='str', default='json', choices=['json', 'yaml']),
+            concurrency=dict(type='int', default=8),
+        ),
+        supports_check_mode=True,
+    )
+    fmt = module.params['format']
+    if fmt == "yaml" and yaml is None:
+        module.fail_json(msg="PyYAML is required to save data as YAML")
+    path = module.params['path']
+    if not module.check_mode:
+        os.makedirs(path, exist_ok=True)
+    try:
+        with open(module.params['src']) as f:
+            saved, failed = save_all(iter_records(f), path, fmt,
+                                     max(1, module.params['concurrency']),
+                                     module.check_mode)
+    except OSError as e:
+        module.fail_json(msg="Failed to read introspection data: %s" % e)
+    except (ValueError, KeyError, TypeError) as e:
+        module.fail_json(msg="Failed to parse introspection data: %s" % e)
+    for name in module.params['nodes']:
+        if name not in saved and name not in failed:
+            failed[name] = "No introspection data returned"
+    module.exit_json(changed=any(saved.values()), saved=sorted(saved),
+                     failed_nodes=dict(sorted(failed.items())))
+
+
+def main():
+    run_module()
+
+
+if __name__ == '__main__':
+    main()
@@ -15,19 +15,28 @@
 DOCUMENTATION = """
 module: ip_allocation
 short_description: Allocate an IP address for a host from a pool
+description:
+  - Allocate IP addresses for hosts from per-network pools, storing the
+    allocations in a YAML file.
+  - Either a single allocation may be requested using I(net_name),
+    I(hostname) and I(cidr), or allocations for many hosts and networks may
+    be requested in a single invocation using I(allocations).
+  - The allocation file is locked while it is read and updated, and is
+    replaced atomically.
 author: Mark Goddard (mark@stackhpc.com)
 options:
   - option-name: net_name
-    description: Name of the network
-    required: True
+    description: Name of the network. Required unless allocations is set.
+    required: False
     type: string
   - option-name: hostname
-    description: Name of the host
-    required: True
+    description: Name of the host. Required unless allocations is set.
+    required: False
     type: string
   - option-name: cidr
-    description: IP Network in CIDR format
-    required: True
+    description: >
+      IP Network in CIDR format. Required unless allocations is set.
+    required: False
     type: string
   - option-name: allocation_pool_start
     description: First address of the pool from which to allocate
@@ -43,6 +52,15 @@ options:
       does not exist.
     required: True
     type: string
+  - option-name: allocations
+    description: >
+      Dict mapping host names to a list of allocation requests for that host.
+      Each request is a dict with items net_name, cidr, and optionally
+      allocation_pool_start and allocation_pool_end. Mutually exclusive with
+      net_name, hostname, cidr, allocation_pool_start and
+      allocation_pool_end.
+    required: False
+    type: dict
 requirements:
   - netaddr
   - PyYAML
@@ -57,18 +75,45 @@ EXAMPLES = """
     allocation_pool_start: 10.0.0.1
     allocation_pool_end: 10.0.0.254
     allocation_file: /path/to/allocation/file.yml
+
+- name: Ensure hosts have IP addresses
+  ip_allocation:
+    allocations:
+      my-host:
+        - net_name: my-network
+          cidr: 10.0.0.0/24
+          allocation_pool_start: 10.0.0.1
+          allocation_pool_end: 10.0.0.254
+      my-other-host:
+        - net_name: my-network
+          cidr: 10.0.0.0/24
+          allocation_pool_start: 10.0.0.1
+          allocation_pool_end: 10.0.0.254
+    allocation_file: /path/to/allocation/file.yml
 """
 
 RETURN = """
 ip:
   description: The allocated IP address
-  returned: success
+  returned: success, when allocations is not set
   type: string
   sample: 10.0.0.1
+ips:
+  description: >
+    Dict mapping host names to a dict mapping network names to allocated IP
+    addresses
+  returned: success, when allocations is set
+  type: dict
+  sample: {"my-host": {"my-network": "10.0.0.1"}}
 """
 
 from ansible.module_utils.basic import *
+import contextlib
+import errno
+import fcntl
+import os
 import sys
+import tempfile
 
 # Store a list of import errors to report to the user.
 IMPORT_ERRORS=[]
@@ -80,6 +125,31 @@ try:
     import yaml
 except Exception as e:
     IMPORT_ERRORS.append(e)
+else:
+    # Use the LibYAML bindings if available, since the allocation file may be
+    # large.
+    YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+    YAML_DUMPER = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+
+
+@contextlib.contextmanager
+def lock_allocations(module):
+    """Hold an exclusive lock on the allocation file's directory.
+
+    The directory rather than the file itself is locked, since the file is
+    replaced when the allocations are written.
+    """
+    filename = module.params['allocation_file']
+    dirname = os.path.dirname(os.path.abspath(filename))
+    try:
+        fd = os.open(dirname, os.O_RDONLY)
+    except OSError as e:
+        module.fail_json(msg="Failed to open directory %s for locking" % dirname)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
 
 
 def read_allocations(module):
@@ -87,7 +157,7 @@ def read_allocations(module):
     filename = module.params['allocation_file']
     try:
         with open(filename, 'r') as f:
-            content = yaml.safe_load(f)
+            content = yaml.load(f, Loader=YAML_LOADER)
     except IOError as e:
         if e.errno == errno.ENOENT:
             # Ignore ENOENT - we will create the file.
@@ -96,89 +166,239 @@ def read_allocations(module):
     except yaml.YAMLError as e:
         module.fail_json(msg="Failed to parse allocation file %s as YAML" % filename)
     if content is None:
-        # If the file is empty, yaml.safe_load() will return None.
+        # If the file is empty, yaml.load() will return None.
         content = {}
     return content
 
 
+def get_umask():
+    """Return the process's umask."""
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
 def write_allocations(module, allocations):
-    """Write IP address allocations to the allocation file."""
+    """Write IP address allocations to the allocation file.
+
+    The allocations are written to a temporary file in the same directory,
+    which then replaces the allocation file atomically.
+    """
     filename = module.params['allocation_file']
+    dirname = os.path.dirname(os.path.abspath(filename))
+    try:
+        mode = os.stat(filename).st_mode & 0o777
+    except OSError:
+        mode = 0o666 & ~get_umask()
+    tmp_filename = None
     try:
-        with open(filename, 'w') as f:
-            yaml.dump(allocations, f, default_flow_style=False)
+        with tempfile.NamedTemporaryFile('w', dir=dirname, delete=False,
+                                         prefix='.network-allocation-') as f:
+            tmp_filename = f.name
+            yaml.dump(allocations, f, Dumper=YAML_DUMPER,
+                      default_flow_style=False)
+        os.chmod(tmp_filename, mode)
+        os.replace(tmp_filename, filename)
+        tmp_filename = None
     except IOError as e:
         module.fail_json(msg="Failed to open allocation file %s for writing" % filename)
     except yaml.YAMLError as e:
         module.fail_json(msg="Failed to dump allocation file %s as YAML" % filename)
+    finally:
+        if tmp_filename:
+            os.unlink(tmp_filename)
+
 
+class NetworkAllocations(object):
+    """Index of the IP addresses allocated on a network.
 
-def update_allocation(module, allocations):
+    The index is built in a single pass over the existing allocations for the
+    network, during which invalid and duplicate allocations are detected.
+    Whether an IP address is allocated is answered by a dict lookup. Free
+    addresses are found by advancing a cursor per allocation pool, which only
+    moves forwards since addresses are never released, so allocating many
+    addresses from a pool costs time linear in the size of the pool in total.
+    """
+
+    def __init__(self, module, network, net_allocations):
+        self.network = network
+        self.net_allocations = net_allocations
+        # Map of allocated IP addresses as integers to host names.
+        self.allocated = {}
+        # Map of allocation pools as (first, last) integer tuples to the
+        # lowest IP address in the pool which may be free.
+        self.cursors = {}
+        self.index(module)
+
+    def index(self, module):
+        """Index existing allocations, checking they are valid and unique."""
+        invalid_allocations = {}
+        duplicate_allocations = {}
+        allocated = {}
+        for hostname, ip in self.net_allocations.items():
+            ip = netaddr.IPAddress(ip)
+            if ip not in self.network:
+                invalid_allocations[hostname] = ip
+                continue
+            value = int(ip)
+            if value in allocated:
+                duplicate_allocations.setdefault(ip, [allocated[value]])
+                duplicate_allocations[ip].append(hostname)
+            allocated[value] = hostname
+        if invalid_allocations:
+            module.fail_json(msg="Found invalid existing allocations in network %s: %s" %
+                (self.network,
+                 ", ".join("%s: %s" % (hn, ip)
+                           for hn, ip in invalid_allocations.items())))
+        if duplicate_allocations:
+            module.fail_json(msg="Found duplicate existing allocations in network %s: %s" %
+                (self.network,
+                 ", ".join("%s: %s" % (ip, ", ".join(hns))
+                           for ip, hns in duplicate_allocations.items())))
+        self.allocated = allocated
+
+    def set_network(self, module, network):
+        """Set the network, checking existing allocations against it."""
+        if network != self.network:
+            self.network = network
+            self.cursors = {}
+            self.index(module)
+
+    def allocate(self, hostname, pool):
+        """Allocate the lowest free IP address in a pool to a host.
+
+        :param hostname: Name of the host
+        :param pool: Allocation pool as a (first, last) tuple of integers
+        :returns: The allocated IP address as a string, or None if the pool
+                  has no free addresses.
+        """
+        first, last = pool
+        ip = max(self.cursors.get(pool, first), first)
+        while ip <= last and ip in self.allocated:
+            ip += 1
+        self.cursors[pool] = ip
+        if ip > last:
+            return None
+        self.allocated[ip] = hostname
+        self.net_allocations[hostname] = str(
+            netaddr.IPAddress(ip, self.network.version))
+        return self.net_allocations[hostname]
+
+
+def get_allocation_pool(network, allocation_pool_start, allocation_pool_end):
+    """Return an allocation pool as a (first, last) tuple of integers."""
+    if allocation_pool_start and allocation_pool_end:
+        return (int(netaddr.IPAddress(allocation_pool_start)),
+                int(netaddr.IPAddress(allocation_pool_end)))
+    if network.broadcast is None:
+        # Point-to-point links and single addresses have no network or
+        # broadcast addresses to reserve.
+        return (network.first, network.last)
+    return (network.first + 1, network.last - 1)
+
+
+def update_allocation(module, allocations, hostname, request, indexes=None):
     """Allocate an IP address on a network for a host.
 
     :param module: AnsibleModule instance
     :param allocations: Existing IP address allocations
+    :param hostname: Name of the host
+    :param request: Dict describing the allocation request, with items
+                    net_name, cidr, and optionally allocation_pool_start and
+                    allocation_pool_end.
+    :param indexes: Optional dict mapping network names to
+                    NetworkAllocations objects, used to share indexes between
+                    calls.
     """
-    net_name = module.params['net_name']
-    hostname = module.params['hostname']
-    cidr = module.params['cidr']
-    allocation_pool_start = module.params['allocation_pool_start']
-    allocation_pool_end = module.params['allocation_pool_end']
-    network = netaddr.IPNetwork(cidr)
+    if indexes is None:
+        indexes = {}
+    net_name = request['net_name']
+    network = netaddr.IPNetwork(request['cidr'])
     result = {
         'changed': False,
     }
     object_name = "%s_ips" % net_name
     net_allocations = allocations.setdefault(object_name, {})
-    invalid_allocations = {hn: ip for hn, ip in net_allocations.items()
-                           if netaddr.IPAddress(ip) not in network}
-    if invalid_allocations:
-        module.fail_json(msg="Found invalid existing allocations in network %s: %s" %
-            (network,
-             ", ".join("%s: %s" % (hn, ip)
-                       for hn, ip in invalid_allocations.items())))
+    index = indexes.get(net_name)
+    if index is None:
+        index = NetworkAllocations(module, network, net_allocations)
+        indexes[net_name] = index
+    else:
+        index.set_network(module, network)
     if hostname not in net_allocations:
         result['changed'] = True
-        allocated_ips = netaddr.IPSet(net_allocations.values())
-        if allocation_pool_start and allocation_pool_end:
-            allocation_pool = netaddr.IPRange(allocation_pool_start, allocation_pool_end)
-            allocation_pool = netaddr.IPSet(allocation_pool)
-        else:
-            allocation_pool = netaddr.IPSet([network])
-            if network.prefixlen != 32:
-                reserved_ips = [network.network, network.broadcast]
-                allocation_pool -= netaddr.IPSet(reserved_ips)
-        free_ips = allocation_pool - allocated_ips
-        for free_cidr in free_ips.iter_cidrs():
-            ip = free_cidr[0]
-            break
-        else:
+        pool = get_allocation_pool(network,
+                                   request.get('allocation_pool_start'),
+                                   request.get('allocation_pool_end'))
+        if index.allocate(hostname, pool) is None:
             module.fail_json(msg="No unallocated IP addresses for %s in %s" % (hostname, net_name))
-        free_ips.remove(ip)
-        net_allocations[hostname] = str(ip)
     result['ip'] = net_allocations[hostname]
     return result
 
 
+def update_allocations(module, allocations):
+    """Allocate IP addresses on networks for many hosts.
+
+    :param module: AnsibleModule instance
+    :param allocations: Existing IP address allocations
+    """
+    result = {
+        'changed': False,
+        'ips': {},
+    }
+    indexes = {}
+    for hostname, requests in sorted(module.params['allocations'].items()):
+        host_ips = result['ips'].setdefault(hostname, {})
+        for request in requests or []:
+            host_result = update_allocation(module, allocations, hostname,
+                                            request, indexes)
+            result['changed'] |= host_result['changed']
+            host_ips[request['net_name']] = host_result['ip']
+    return result
+
+
 def allocate(module):
-    """Allocate an IP address for a host, updating the allocation file."""
-    allocations = read_allocations(module)
-    result = update_allocation(module, allocations)
-    if result['changed'] and not module.check_mode:
-        write_allocations(module, allocations)
+    """Allocate IP addresses for hosts, updating the allocation file."""
+    with lock_allocations(module):
+        allocations = read_allocations(module)
+        if module.params['allocations'] is not None:
+            result = update_allocations(module, allocations)
+        else:
+            request = {
+                'net_name': module.params['net_name'],
+                'cidr': module.params['cidr'],
+                'allocation_pool_start': module.params['allocation_pool_start'],
+                'allocation_pool_end': module.params['allocation_pool_end'],
+            }
+            result = update_allocation(module, allocations,
+                                       module.params['hostname'], request)
+        if result['changed'] and not module.check_mode:
+            write_allocations(module, allocations)
     return result
 
 
 def main():
     module = AnsibleModule(
         argument_spec=dict(
-            net_name=dict(required=True, type='str'),
-            hostname=dict(required=True, type='str'),
-            cidr=dict(required=True, type='str'),
+            net_name=dict(required=False, type='str'),
+            hostname=dict(required=False, type='str'),
+            cidr=dict(required=False, type='str'),
             allocation_pool_start=dict(required=False, type='str'),
             allocation_pool_end=dict(required=False, type='str'),
             allocation_file=dict(required=True, type='str'),
+            allocations=dict(required=False, type='dict'),
         ),
+        mutually_exclusive=[
+            ['allocations', 'net_name'],
+            ['allocations', 'hostname'],
+            ['allocations', 'cidr'],
+            ['allocations', 'allocation_pool_start'],
+            ['allocations', 'allocation_pool_end'],
+        ],
+        required_one_of=[['allocations', 'net_name']],
+        required_by={
+            'net_name': ['hostname', 'cidr'],
+        },
         supports_check_mode=True,
     )
 
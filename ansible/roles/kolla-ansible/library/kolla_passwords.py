@@ -20,9 +20,10 @@ short_description: Generates a kolla-ansible passwords file
 
 from ansible.module_utils.basic import *
 
+from concurrent import futures
+import hashlib
 import os
 import os.path
-import shutil
 import tempfile
 
 IMPORT_ERRORS = []
@@ -30,117 +31,236 @@ try:
     import yaml
 except ImportError as e:
     IMPORT_ERRORS.append(e)
+try:
+    from ansible.constants import DEFAULT_VAULT_ID_MATCH
+    from ansible.parsing.vault import is_encrypted
+    from ansible.parsing.vault import VaultLib
+    from ansible.parsing.vault import VaultSecret
+except ImportError as e:
+    IMPORT_ERRORS.append(e)
+# hvac is only required when using Hashicorp Vault.
+try:
+    import hvac
+    from requests import adapters
+    import requests
+except ImportError as e:
+    hvac = None
+    HVAC_IMPORT_ERROR = e
+
+# Maximum number of concurrent requests to Hashicorp Vault.
+VAULT_CONCURRENCY = 8
+
+# Keys which kolla-genpwd leaves null, and which therefore do not require it to
+# be run. Other null keys are generated by kolla-genpwd.
+BLANK_KEYS = {'docker_registry_password'}
 
 
 def virtualenv_path_prefix(module):
     return "%s/bin" % module.params['virtualenv']
 
 
-def kolla_genpwd(module, file_path):
-    """Run the kolla-genpwd command."""
-    cmd = ["kolla-genpwd", "--passwords", file_path]
-    module.run_command(cmd, check_rc=True,
-                       path_prefix=virtualenv_path_prefix(module))
-
-
-def kolla_mergepwd(module, old_path, new_path, final_path):
-    """Run the kolla-mergepwd command."""
-    cmd = ["kolla-mergepwd",
-           "--old", old_path,
-           "--new", new_path,
-           "--final", final_path]
-    module.run_command(cmd, check_rc=True,
-                       path_prefix=virtualenv_path_prefix(module))
-
-def kolla_readpwd(module, file_path, vault_addr="", vault_mount_point="", vault_kv_path="",
-                  vault_namespace="", vault_role_id=None, vault_secret_id=None,
-                  vault_token=None, vault_cacert=""):
-    """Run the kolla-readpwd command."""
-
-    if vault_role_id and vault_secret_id:
-        vault_auth = ["--vault-role-id", vault_role_id,
-                      "--vault-secret-id", vault_secret_id]
-    else:
-        vault_auth = ["--vault-token", vault_token]
-
-    cmd = ["kolla-readpwd",
-           "--passwords", file_path,
-           "--vault-addr", vault_addr,
-           "--vault-mount-point", vault_mount_point,
-           "--vault-kv-path", vault_kv_path,
-           "--vault-namespace", vault_namespace,
-           "--vault-cacert", vault_cacert] + vault_auth
-
-    module.run_command(cmd, check_rc=True,
-                       path_prefix=virtualenv_path_prefix(module))
-
-def kolla_writepwd(module, file_path, vault_addr="", vault_mount_point="", vault_kv_path="",
-                  vault_namespace="", vault_role_id=None, vault_secret_id=None,
-                  vault_token=None, vault_cacert=""):
-    """Run the kolla-writepwd command."""
-
-    if vault_role_id and vault_secret_id:
-        vault_auth = ["--vault-role-id", vault_role_id,
-                      "--vault-secret-id", vault_secret_id, ]
-    else:
-        vault_auth = ["--vault-token", vault_token, ]
-    cmd = ["kolla-writepwd",
-           "--passwords", file_path,
-           "--vault-addr", vault_addr,
-           "--vault-mount-point", vault_mount_point,
-           "--vault-kv-path", vault_kv_path,
-           "--vault-namespace", vault_namespace,
-           "--vault-cacert", vault_cacert] + vault_auth
-
-    module.run_command(cmd, check_rc=True,
-                       path_prefix=virtualenv_path_prefix(module))
-
-
-def create_vault_password_file(module):
-    """Create a vault password file."""
-    with tempfile.NamedTemporaryFile(delete=False) as f:
-        f.write(module.params['vault_password'].encode())
-        return f.name
-
-
-def vault_encrypt(module, file_path):
-    """Encrypt a file using Ansible vault"""
-    password_path = create_vault_password_file(module)
-    try:
-        cmd = ["ansible-vault", "encrypt",
-               "--vault-password-file", password_path,
-               file_path]
-        module.run_command(cmd, check_rc=True,
-                           path_prefix=virtualenv_path_prefix(module))
-    finally:
-        os.unlink(password_path)
+def dump_passwords(passwords):
+    """Serialise passwords in the same format as the kolla-* commands."""
+    return yaml.safe_dump(passwords, default_flow_style=False)
+
 
+def load_passwords(content, path):
+    passwords = yaml.safe_load(content)
+    if not isinstance(passwords, dict):
+        raise ValueError("Passwords file %s is not in a valid format" % path)
+    return passwords
 
-def vault_decrypt(module, file_path):
-    """Decrypt a file using Ansible vault"""
 
-    # Return immediately if file not encrypted
-    with open(file_path, 'r') as f:
-        if not f.readline()[:15] == "$ANSIBLE_VAULT;":
-            return
+def passwords_digest(passwords):
+    """Return a stable hash of the content of a passwords dict."""
+    return hashlib.sha256(dump_passwords(passwords).encode()).hexdigest()
+
+
+def get_vault(module):
+    if not module.params['vault_password']:
+        return None
+    secret = VaultSecret(module.params['vault_password'].encode())
+    return VaultLib([(DEFAULT_VAULT_ID_MATCH, secret)])
+
+
+def read_passwords(vault, path):
+    """Read a passwords file, decrypting it if necessary.
+
+    :returns: a tuple of the passwords dict and whether the file was
+        encrypted.
+    """
+    with open(path, 'rb') as f:
+        content = f.read()
+    encrypted = is_encrypted(content)
+    if encrypted and vault:
+        content = vault.decrypt(content)
+    return load_passwords(content, path), encrypted
+
+
+def merge_passwords(old, new):
+    """Merge two dicts of passwords.
+
+    Values in old take precedence over those in new.
+    """
+    merged = dict(new)
+    merged.update(old)
+    return merged
+
 
-    password_path = create_vault_password_file(module)
+def kolla_mergepwd(old, new):
+    """Merge an existing passwords file in the same way as kolla-mergepwd.
+
+    Values in old take precedence over those in new. As in kolla-mergepwd,
+    the Redis password is used for Valkey if old has no Valkey password.
+    """
+    new = dict(new)
+    if ('valkey_master_password' in new and
+            'redis_master_password' in old and
+            'valkey_master_password' not in old and
+            old['redis_master_password']):
+        new['valkey_master_password'] = old['redis_master_password']
+    return merge_passwords(old, new)
+
+
+def needs_generation(key, value):
+    """Return whether kolla-genpwd would generate a value for a key."""
+    if isinstance(value, dict):
+        # SSH key pairs.
+        return (value.get('private_key') is None and
+                value.get('public_key') is None)
+    return value is None and key not in BLANK_KEYS
+
+
+def run_with_passwords_file(module, passwords, cmd):
+    """Run a kolla-* command on a temporary passwords file.
+
+    :returns: the contents of the passwords file after running the command.
+    """
+    fd, path = tempfile.mkstemp()
     try:
-        cmd = ["ansible-vault", "decrypt",
-               "--vault-password-file", password_path,
-               file_path]
-        module.run_command(cmd, check_rc=True,
+        with os.fdopen(fd, 'w') as f:
+            f.write(dump_passwords(passwords))
+        module.run_command(cmd + ["--passwords", path], check_rc=True,
                            path_prefix=virtualenv_path_prefix(module))
+        with open(path) as f:
+            return load_passwords(f.read(), path)
     finally:
-        os.unlink(password_path)
+        os.unlink(path)
 
 
-def create_named_tempfile():
-    """Create a named temporary file and return its name."""
-    with tempfile.NamedTemporaryFile(delete=False) as f:
-        temp_file_path = f.name
-        f.close()
-    return temp_file_path
+def kolla_genpwd(module, passwords):
+    """Generate missing passwords using kolla-genpwd.
+
+    Only the keys which require generation are passed to kolla-genpwd, which
+    is not run at all if there are none.
+    """
+    missing = {key: value for key, value in passwords.items()
+               if needs_generation(key, value)}
+    if not missing:
+        return passwords
+    generated = run_with_passwords_file(module, missing, ["kolla-genpwd"])
+    return merge_passwords(generated, passwords)
+
+
+class HashicorpVault(object):
+    """Client for passwords stored in a Hashicorp Vault KV v2 secrets engine.
+
+    Each password is stored as a secret at <kv_path>/<key>, in the same format
+    as kolla-readpwd and kolla-writepwd: strings are stored in a single
+    'password' item, and dicts such as SSH key pairs are stored directly.
+    The client authenticates once, and reuses a pool of HTTP connections for
+    concurrent requests.
+    """
+
+    def __init__(self, module, concurrency=VAULT_CONCURRENCY):
+        params = module.params
+        self.mount_point = params['vault_mount_point']
+        self.kv_path = params['vault_kv_path']
+        self.concurrency = concurrency
+        session = requests.Session()
+        adapter = adapters.HTTPAdapter(pool_connections=1,
+                                       pool_maxsize=concurrency)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        self.client = hvac.Client(url=params['vault_addr'],
+                                  namespace=params['vault_namespace'] or None,
+                                  verify=params['vault_cacert'] or True,
+                                  session=session)
+        if params['vault_role_id'] and params['vault_secret_id']:
+            self.client.auth.approle.login(role_id=params['vault_role_id'],
+                                           secret_id=params['vault_secret_id'])
+        else:
+            self.client.token = params['vault_token']
+
+    def _path(self, key):
+        return "%s/%s" % (self.kv_path, key)
+
+    def _map(self, func, keys):
+        with futures.ThreadPoolExecutor(self.concurrency) as executor:
+            return dict(zip(keys, executor.map(func, keys)))
+
+    def _read(self, key):
+        # NOTE: Use the adapter directly, since the KV v2 read API warns
+        # about changes to its handling of deleted versions. Vault returns
+        # 404 for missing and deleted secrets.
+        url = "/v1/%s/data/%s" % (self.mount_point, self._path(key))
+        try:
+            response = self.client.adapter.get(url)
+        except hvac.exceptions.InvalidPath:
+            return None
+        return response['data']['data']
+
+    def read(self, keys):
+        """Read passwords from Vault.
+
+        :returns: a dict mapping each key to the data of its secret, or None
+            if it does not exist.
+        """
+        return self._map(self._read, list(keys))
+
+    @staticmethod
+    def to_secret(value):
+        """Return the secret data for a password, as kolla-writepwd does."""
+        if isinstance(value, str):
+            return {'password': value}
+        return value
+
+    @staticmethod
+    def from_secret(secret):
+        """Return the password for secret data, as kolla-readpwd does."""
+        return secret.get('password', secret)
+
+    def _write(self, key, secret):
+        self.client.secrets.kv.v2.create_or_update_secret(
+            path=self._path(key), mount_point=self.mount_point,
+            secret=secret)
+
+    def write(self, passwords, remote):
+        """Write passwords which differ from those in Vault.
+
+        :param passwords: dict of passwords to write. Empty values are
+            ignored.
+        :param remote: dict mapping keys to secret data, as returned by read.
+        :returns: a sorted list of the keys written.
+        """
+        changed = {key: self.to_secret(value)
+                   for key, value in passwords.items()
+                   if value and remote.get(key) != self.to_secret(value)}
+        self._map(lambda key: self._write(key, changed[key]), list(changed))
+        return sorted(changed)
+
+
+def write_passwords(module, content):
+    """Atomically write content to the destination passwords file."""
+    dest = module.params['dest']
+    fd, path = tempfile.mkstemp(dir=os.path.dirname(dest))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        module.atomic_move(path, dest)
+    finally:
+        if os.path.isfile(path):
+            os.unlink(path)
 
 
 def kolla_passwords(module):
@@ -151,117 +271,84 @@ def kolla_passwords(module):
     exists.  We then apply any custom password overrides. Finally, we generate
     any passwords that are missing.  If requested, the final file will be
     encrypted using ansible vault.
+
+    Merging, comparison and encryption are performed in memory. The
+    destination file is only encrypted and written if the hash of its content
+    has changed.
     """
     if not os.path.isfile(module.params['sample']):
         module.fail_json(msg="Sample passwords.yml file %s does not exist" %
                          module.params['sample'])
 
-    temp_file_path = create_named_tempfile()
+    dest = module.params['dest']
     try:
+        vault = get_vault(module)
+
         # Start with kolla's sample password file.
-        shutil.copyfile(module.params['sample'], temp_file_path)
+        with open(module.params['sample']) as f:
+            passwords = load_passwords(f.read(), module.params['sample'])
 
         # If passwords exist, decrypt and merge these in.
-        if module.params['src'] and os.path.isfile(module.params['src']):
-            src_path = create_named_tempfile()
-            try:
-                shutil.copyfile(module.params['src'], src_path)
-                if module.params['vault_password']:
-                    vault_decrypt(module, src_path)
-                kolla_mergepwd(module, src_path, temp_file_path, temp_file_path)
-            finally:
-                os.unlink(src_path)
-
+        src = module.params['src']
+        existing = None
+        if src and os.path.isfile(src):
+            existing, src_encrypted = read_passwords(vault, src)
+            passwords = kolla_mergepwd(existing, passwords)
+
+        # Passwords stored in Hashicorp Vault take precedence over those in
+        # the passwords file.
+        remote = {}
         if module.params['vault_addr']:
-            src_path = create_named_tempfile()
-            try:
-                shutil.copyfile(module.params['src'], src_path)
-                kolla_readpwd(module, src_path,
-                              module.params['vault_addr'],
-                              module.params['vault_mount_point'],
-                              module.params['vault_kv_path'],
-                              module.params['vault_namespace'],
-                              module.params['vault_role_id'],
-                              module.params['vault_secret_id'],
-                              module.params['vault_token'],
-                              module.params['vault_cacert'])
-                kolla_mergepwd(module, src_path, temp_file_path, temp_file_path)
-                kolla_genpwd(module, temp_file_path)
-                kolla_writepwd(module, temp_file_path,
-                              module.params['vault_addr'],
-                              module.params['vault_mount_point'],
-                              module.params['vault_kv_path'],
-                              module.params['vault_namespace'],
-                              module.params['vault_role_id'],
-                              module.params['vault_secret_id'],
-                              module.params['vault_token'],
-                              module.params['vault_cacert'])
-            finally:
-                os.unlink(src_path)
+            if hvac is None:
+                raise HVAC_IMPORT_ERROR
+            hashicorp_vault = HashicorpVault(module)
+            remote = hashicorp_vault.read(passwords)
+            stored = {key: hashicorp_vault.from_secret(secret)
+                      for key, secret in remote.items() if secret}
+            passwords = merge_passwords(stored, passwords)
 
         # Merge in overrides.
         if module.params['overrides']:
-            with tempfile.NamedTemporaryFile(delete=False) as f:
-                # NOTE(mgoddard): Temporary files are opened in binary mode, so
-                # specify an encoding.
-                yaml.dump(module.params['overrides'], f, encoding='utf-8')
-                overrides_path = f.name
-            try:
-                kolla_mergepwd(module, overrides_path, temp_file_path, temp_file_path)
-                if module.params['vault_addr']:
-                    kolla_writepwd(module, temp_file_path,
-                                   module.params['vault_addr'],
-                                   module.params['vault_mount_point'],
-                                   module.params['vault_kv_path'],
-                                   module.params['vault_namespace'],
-                                   module.params['vault_role_id'],
-                                   module.params['vault_secret_id'],
-                                   module.params['vault_token'],
-                                   module.params['vault_cacert'])
-            finally:
-                os.unlink(overrides_path)
+            passwords = merge_passwords(module.params['overrides'], passwords)
 
         # Generate null passwords.
-        kolla_genpwd(module, temp_file_path)
+        passwords = kolla_genpwd(module, passwords)
+
+        # Write new and changed passwords to Hashicorp Vault in a single pass.
+        vault_written = []
+        if module.params['vault_addr'] and not module.check_mode:
+            vault_written = hashicorp_vault.write(passwords, remote)
 
         # Compare with the decrypted destination file.
-        if os.path.isfile(module.params['dest']):
-            if module.params['vault_password']:
-                dest_path = create_named_tempfile()
-                try:
-                    shutil.copyfile(module.params['dest'], dest_path)
-                    vault_decrypt(module, dest_path)
-                    checksum_dest = module.sha1(dest_path)
-                finally:
-                    os.unlink(dest_path)
+        if os.path.isfile(dest):
+            if (existing is not None and
+                    os.path.realpath(src) == os.path.realpath(dest)):
+                current, dest_encrypted = existing, src_encrypted
             else:
-                checksum_dest = module.sha1(module.params['dest'])
-            checksum_temp_file = module.sha1(temp_file_path)
-            changed = checksum_dest != checksum_temp_file
+                current, dest_encrypted = read_passwords(vault, dest)
+            changed = (passwords_digest(current) !=
+                       passwords_digest(passwords) or
+                       dest_encrypted != bool(vault))
         else:
-            os.makedirs(os.path.dirname(module.params['dest']),
-                        exist_ok=True)
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
             changed = True
 
-        # Encrypt the file.
-        if changed and module.params['vault_password']:
-            vault_encrypt(module, temp_file_path)
-
-        # Move into place.
+        # Encrypt the file and move into place.
         if changed and not module.check_mode:
-            module.atomic_move(temp_file_path, module.params['dest'])
+            content = dump_passwords(passwords).encode()
+            if vault:
+                content = vault.encrypt(content)
+            write_passwords(module, content)
     except Exception as e:
         module.fail_json(msg="Failed to generate kolla passwords: %s" % repr(e))
-    finally:
-        if os.path.isfile(temp_file_path):
-            os.unlink(temp_file_path)
 
     if not module.check_mode:
         # Update the file's attributes.
         file_args = module.load_file_common_arguments(module.params)
         changed = module.set_fs_attributes_if_different(file_args, changed)
 
-    return {'changed': changed}
+    return {'changed': changed or bool(vault_written),
+            'vault_written': vault_written}
 
 
 def main():
@@ -12,13 +12,78 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+from ansible.errors import AnsibleUndefinedVariable
+from ansible.parsing.vault import EncryptedString
 from ansible.plugins.action import ActionBase
+import hashlib
+import json
 import os
 from collections import defaultdict
+import functools
 import pathlib
+import re
 
+import jinja2
+import jinja2.filters
+from jinja2 import meta
+from jinja2 import nodes
+import jinja2.tests
 from wcmatch import glob
 
+# Bump this to invalidate all manifest entries, e.g. when the way in which
+# files are generated changes. This is also used by
+# kolla_custom_config_manifest.
+MANIFEST_VERSION = 2
+
+# Strategies which template their source files.
+TEMPLATED_STRATEGIES = {"template", "merge_configs", "merge_yaml"}
+
+# Names which, if referenced by a template, make its output depend on more
+# than the values of the variables it references.
+UNCACHEABLE_NAMES = {
+    "hostvars", "item", "lookup", "lipsum", "now", "omit", "params", "q",
+    "query", "vars",
+}
+
+# Filters and tests whose output depends only on their arguments. Templates
+# using any other filter or test are not cached, since it may read variables
+# from the template context, e.g. net_ip reads <network>_ips, or other state,
+# e.g. the exists test.
+PURE_FILTERS = (set(jinja2.filters.FILTERS) - {"random"}) | {
+    "b64decode", "b64encode", "basename", "bool", "checksum", "combine",
+    "comment", "dict2items", "difference", "dirname", "extract", "flatten",
+    "from_json", "from_yaml", "from_yaml_all", "hash", "intersect",
+    "items2dict", "mandatory", "quote", "regex_escape", "regex_findall",
+    "regex_replace", "regex_search", "splitext", "symmetric_difference",
+    "ternary", "to_json", "to_nice_json", "to_nice_yaml", "to_uuid",
+    "to_yaml", "type_debug", "union", "unique", "urlsplit", "zip",
+    "zip_longest",
+}
+PURE_TESTS = set(jinja2.tests.TESTS) | {
+    "all", "any", "changed", "contains", "failed", "falsy", "finished",
+    "match", "regex", "search", "skipped", "started", "subset", "succeeded",
+    "success", "superset", "truthy", "vault_encrypted", "version",
+    "version_compare",
+}
+
+# Filters which apply the filter or test named by their positional argument
+# at the given index.
+_HIGHER_ORDER_FILTERS = {
+    "map": (0, PURE_FILTERS),
+    "select": (0, PURE_TESTS),
+    "reject": (0, PURE_TESTS),
+    "selectattr": (1, PURE_TESTS),
+    "rejectattr": (1, PURE_TESTS),
+}
+
+# Jinja globals which are not variables.
+JINJA_GLOBALS = {"cycler", "dict", "joiner", "namespace", "range"}
+
+_UNDEFINED = "<undefined>"
+
+# Characters with special meaning in a glob.
+_GLOB_MAGIC = re.compile(r"[*?[\\]")
+
 def _dedup(xs):
     # Deduplicate a list whilst maintaining order
     seen = set()
@@ -29,6 +94,145 @@ def _dedup(xs):
             result.append(x)
     return result
 
+
+def _glob_prefix(glob_):
+    """Return the literal first path component of a glob, or None."""
+    first = glob_.split("/", 1)[0]
+    if first in ("", ".", "..") or _GLOB_MAGIC.search(first):
+        return None
+    return first
+
+
+def _extension(name):
+    """Return the text from the last dot in a file name, or ''."""
+    _, dot, extension = name.rpartition(".")
+    return dot and dot + extension
+
+
+def _glob_extension(glob_):
+    """Return the literal extension of paths matching a glob, or None."""
+    last = glob_.rsplit("/", 1)[-1]
+    if not last or "[" in last or "\\" in last:
+        return None
+    extension = _extension(last)
+    if _GLOB_MAGIC.search(extension or last):
+        return None
+    return extension
+
+
+class GlobMatcher(object):
+    """Match relative paths against a list of globs.
+
+    Matching is equivalent to wcmatch's globmatch with the GLOBSTAR flag, but
+    avoids compiling and testing every glob for every path. Globs are indexed
+    by their literal first path component and extension, and the globs which
+    may match paths with a given first component and extension are compiled
+    into a single regular expression when first needed. Results are cached
+    for each path.
+    """
+
+    def __init__(self, globs):
+        self.globs = list(globs)
+        self._prefixes = [_glob_prefix(g) for g in self.globs]
+        self._extensions = [_glob_extension(g) for g in self.globs]
+        self._patterns = [glob.translate(g, flags=glob.GLOBSTAR)[0]
+                          for g in self.globs]
+        self._compiled = {}
+        # Map of (first path component, extension) to a tuple of a combined
+        # regular expression and the index of the glob for each group.
+        self._buckets = {}
+        self._cache = {}
+
+    def _bucket(self, key):
+        first, extension = key
+        groups = []
+        group_globs = []
+        for index, patterns in enumerate(self._patterns):
+            if self._prefixes[index] not in (None, first):
+                continue
+            if self._extensions[index] not in (None, extension):
+                continue
+            for pattern in patterns:
+                groups.append("(%s)" % pattern)
+                group_globs.append(index)
+        bucket = (re.compile("|".join(groups) or "(?!)"), group_globs)
+        self._buckets[key] = bucket
+        return bucket
+
+    def first_match(self, path):
+        """Return the index of the first glob matching path, or None."""
+        try:
+            return self._cache[path]
+        except KeyError:
+            pass
+        first = path.split("/", 1)[0]
+        extension = _extension(path.rsplit("/", 1)[-1])
+        key = (first, extension)
+        regex, group_globs = self._buckets.get(key) or self._bucket(key)
+        match = regex.match(path)
+        # Alternatives are tried in order, so the first matching glob is the
+        # one that matched.
+        result = None if match is None else group_globs[match.lastindex - 1]
+        self._cache[path] = result
+        return result
+
+    def matches(self, path):
+        """Return the indices of all globs matching path, in order."""
+        result = []
+        for index, patterns in enumerate(self._patterns):
+            if index not in self._compiled:
+                self._compiled[index] = [re.compile(p) for p in patterns]
+            if any(p.match(path) for p in self._compiled[index]):
+                result.append(index)
+        return result
+
+
+class SymlinkLoop(Exception):
+    pass
+
+
+def _scan_tree(root):
+    """Walk a directory tree once.
+
+    Returns a list of (relative path, symlinked) tuples for each file in the
+    tree, where symlinked is True if the path passes through a symbolic link
+    to a directory. Hidden files and directories are included. Symbolic links
+    to directories are followed.
+
+    :raises: SymlinkLoop if a symbolic link refers to a parent directory.
+    """
+    files = []
+
+    def scan(path, relative_dir, real_dir, symlinked, parents):
+        try:
+            with os.scandir(path) as it:
+                entries = list(it)
+        except OSError:
+            return
+        for entry in entries:
+            relative_path = relative_dir + entry.name
+            try:
+                is_dir = entry.is_dir()
+                is_link = is_dir and entry.is_symlink()
+            except OSError:
+                continue
+            if is_dir:
+                if is_link:
+                    real_path = os.path.realpath(entry.path)
+                    if real_path in parents:
+                        raise SymlinkLoop(entry.path)
+                else:
+                    real_path = os.path.join(real_dir, entry.name)
+                scan(entry.path, relative_path + os.sep, real_path,
+                     symlinked or is_link, parents | {real_path})
+            elif entry.is_file():
+                files.append((relative_path, symlinked))
+
+    real_root = os.path.realpath(root)
+    scan(root, "", real_root, False, {real_root})
+    return files
+
+
 class ConfigCollector(object):
     def __init__(self, include_globs, ignore_globs, destination, search_paths,
                  rules):
@@ -57,6 +261,8 @@ class ConfigCollector(object):
         # Some files are templated by external tasks. This is a list of files
         # to not clean up.
         self.ignore_globs = ignore_globs
+        self._ignore_matcher = GlobMatcher(
+            item["glob"] for item in ignore_globs if item["enabled"])
         # Where the files are being templated to
         self.destination = destination
         # Where to search for the source files
@@ -65,40 +271,36 @@ class ConfigCollector(object):
         # Rules to determine merging strategy when multiple files are found
         # with the same relative path. Lower priority numbers win.
         self.rules = sorted(rules, key=lambda d: d['priority'])
+        self._enabled_rules = [rule for rule in self.rules
+                               if rule.get('enabled', True)]
+        self._rule_matcher = GlobMatcher(
+            rule["glob"] for rule in self._enabled_rules)
 
     def filter_files_in_destination(self):
-        ignored = set()
-        for f in self.files_in_destination:
-            for item in self.ignore_globs:
-                if not item["enabled"]:
-                    continue
-                if glob.globmatch(f, item["glob"], flags=glob.GLOBSTAR):
-                    ignored.add(f)
-        result = set(self.files_in_destination) - ignored
-        return list(result)
+        return [f for f in self.files_in_destination
+                if self._ignore_matcher.first_match(f) is None]
 
     def _find_matching_rule(self, relative_path, sources):
         # First match wins
-        for rule in self.rules:
-            if not rule.get('enabled', True):
-                continue
-            glob_ = rule["glob"]
-            if glob.globmatch(relative_path, glob_, flags=glob.GLOBSTAR):
-                requires_merge = (rule["strategy"] in
-                    ["merge_configs", "merge_yaml"])
-                # Fallback to templating when there is only one source. This
-                # allows you to have config files that template to invalid
-                # yaml/ini. This was allowed prior to config merging so
-                # improves backwards compatibility.
-                if requires_merge and len(sources) == 1:
-                    # The rule can be used again to match a different file
-                    # so don't modify in place.
-                    rule = rule.copy()
-                    rule["strategy"] = 'template'
-                    # Strip parameters as they may not be compatible with
-                    # template module.
-                    rule['params'] = {}
-                return rule
+        index = self._rule_matcher.first_match(relative_path)
+        if index is None:
+            return None
+        rule = self._enabled_rules[index]
+        requires_merge = (rule["strategy"] in
+            ["merge_configs", "merge_yaml"])
+        # Fallback to templating when there is only one source. This
+        # allows you to have config files that template to invalid
+        # yaml/ini. This was allowed prior to config merging so
+        # improves backwards compatibility.
+        if requires_merge and len(sources) == 1:
+            # The rule can be used again to match a different file
+            # so don't modify in place.
+            rule = rule.copy()
+            rule["strategy"] = 'template'
+            # Strip parameters as they may not be compatible with
+            # template module.
+            rule['params'] = {}
+        return rule
 
     def partition_into_actions(self):
         actions = {
@@ -189,34 +391,272 @@ class ConfigCollector(object):
         return actions
 
     def collect(self):
+        # Each directory is walked once, and every file is matched against
+        # all of the include globs, rather than globbing once per include
+        # glob.
         for item in self.include_globs:
-            self._collect_source(item)
-            self._collect_destination(item)
-
-    def _collect_source(self, item):
-        enabled = item.get("enabled", False)
-        if not isinstance(enabled, bool):
-            raise ValueError("Expecting a boolean: %s" % item)
-        if not enabled:
-            return
-        for search_path in self.search_paths:
-            abs_glob = os.path.join(search_path, item["glob"])
-            files = glob.glob(abs_glob, flags=glob.GLOBSTAR)
-            for abs_path in files:
-                if not os.path.isfile(abs_path):
-                    continue
-                relative_path = os.path.relpath(abs_path, search_path)
-                self.files_in_source[relative_path].append(abs_path)
-
-    def _collect_destination(self, item):
-        abs_glob = os.path.join(self.destination, item["glob"])
-        files = glob.glob(abs_glob, flags=glob.GLOBSTAR)
-        for abs_path in files:
-            if not os.path.isfile(abs_path):
-                continue
-            relative_path = os.path.relpath(abs_path, self.destination)
+            enabled = item.get("enabled", False)
+            if not isinstance(enabled, bool):
+                raise ValueError("Expecting a boolean: %s" % item)
+        source_matcher = GlobMatcher(
+            item["glob"] for item in self.include_globs
+            if item.get("enabled", False))
+        destination_matcher = GlobMatcher(
+            item["glob"] for item in self.include_globs)
+
+        # Group sources in order of the first matching include glob, then
+        # search path.
+        sources = []
+        for index, search_path in enumerate(self.search_paths):
+            files = self._collect(search_path, source_matcher)
+            for order, (first, relative_path) in enumerate(files):
+                sources.append((first, index, order, relative_path,
+                                os.path.join(search_path, relative_path)))
+        sources.sort(key=lambda source: source[:3])
+        for _, _, _, relative_path, abs_path in sources:
+            self.files_in_source[relative_path].append(abs_path)
+
+        for _, relative_path in self._collect(self.destination,
+                                              destination_matcher):
             self.files_in_destination.add(relative_path)
 
+    def _collect(self, root, matcher):
+        """Return files under root matching any of the matcher's globs.
+
+        Returns a list of (index, relative path) tuples, where index is the
+        index of the first matching glob.
+        """
+        result = []
+        globbed = {}
+        try:
+            files = _scan_tree(root)
+        except SymlinkLoop:
+            # Globs may match paths which pass through the loop a bounded
+            # number of times. Fall back to globbing for each glob.
+            for index, glob_ in enumerate(matcher.globs):
+                abs_glob = os.path.join(root, glob_)
+                for abs_path in glob.glob(abs_glob, flags=glob.GLOBSTAR):
+                    if os.path.isfile(abs_path):
+                        result.append(
+                            (index, os.path.relpath(abs_path, root)))
+            return result
+        for relative_path, symlinked in files:
+            if not symlinked:
+                index = matcher.first_match(relative_path)
+                if index is not None:
+                    result.append((index, relative_path))
+                continue
+            # The globstar (**) does not traverse symbolic links to
+            # directories. This is rare, so fall back to wcmatch's glob to
+            # check whether the file would be matched.
+            for index in matcher.matches(relative_path):
+                if index not in globbed:
+                    abs_glob = os.path.join(root, matcher.globs[index])
+                    globbed[index] = {
+                        os.path.relpath(abs_path, root)
+                        for abs_path in glob.glob(abs_glob,
+                                                  flags=glob.GLOBSTAR)
+                    }
+                if relative_path in globbed[index]:
+                    result.append((index, relative_path))
+                    break
+        return result
+
+class Uncacheable(Exception):
+    pass
+
+
+def _placeholder(value, *args, **kwargs):
+    return value
+
+
+@functools.lru_cache(maxsize=None)
+def _parse_environment():
+    """Return a Jinja environment for parsing templates.
+
+    Pure Ansible filters and tests are registered with placeholders, since
+    Jinja requires filters and tests to exist when analysing a template.
+    """
+    env = jinja2.Environment(
+        extensions=["jinja2.ext.do", "jinja2.ext.loopcontrols"])
+    for plugins, names in ((env.filters, PURE_FILTERS),
+                           (env.tests, PURE_TESTS)):
+        for name in names:
+            plugins.setdefault(name, _placeholder)
+            plugins.setdefault("ansible.builtin." + name, _placeholder)
+    return env
+
+
+def _stat_signature(path):
+    """Return the size, modification time and mode of a file, or None.
+
+    This is also used by kolla_custom_config_manifest.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns,
+            "mode": st.st_mode}
+
+
+def _json_default(value):
+    if isinstance(value, EncryptedString):
+        return str(value)
+    raise Uncacheable("Cannot fingerprint value of type %s" %
+                      type(value).__name__)
+
+
+class ConfigManifest(object):
+    """Skip generation of files whose inputs have not changed.
+
+    The manifest records, for each destination file, a fingerprint of the
+    inputs used to generate it, and the size and modification time of the
+    generated file. The fingerprint covers the strategy and its parameters,
+    the contents of the source files, and the values of all variables
+    referenced by templated sources. A file is skipped if its fingerprint
+    matches the manifest and it has not been modified since it was generated.
+    """
+
+    def __init__(self, path, resolve_variable):
+        self.path = path
+        # Function returning the value of a variable, given its name.
+        self.resolve_variable = resolve_variable
+        self.entries = self._load()
+        self._variables = {}
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if manifest.get("version") != MANIFEST_VERSION:
+            return {}
+        return manifest.get("files", {})
+
+    @staticmethod
+    def _check_pure(node):
+        """Check that a filter or test node depends only on its arguments.
+
+        :raises: Uncacheable if the filter or test is not known to be pure.
+        """
+        is_filter = isinstance(node, nodes.Filter)
+        allowed = PURE_FILTERS if is_filter else PURE_TESTS
+        name = node.name
+        if name.startswith("ansible.builtin."):
+            name = name[len("ansible.builtin."):]
+        if name not in allowed:
+            raise Uncacheable("Template uses %s %s" %
+                              ("filter" if is_filter else "test", node.name))
+        if is_filter and name in _HIGHER_ORDER_FILTERS:
+            index, allowed = _HIGHER_ORDER_FILTERS[name]
+            if len(node.args) <= index:
+                return
+            arg = node.args[index]
+            if not isinstance(arg, nodes.Const):
+                raise Uncacheable("Template uses dynamic filter %s" % name)
+            if arg.value not in allowed:
+                raise Uncacheable("Template uses %s with %s" %
+                                  (name, arg.value))
+
+    def _referenced_variables(self, content):
+        if content.startswith("#jinja2:"):
+            # Templates may override the Jinja delimiters.
+            raise Uncacheable("Template overrides Jinja environment")
+        try:
+            ast = _parse_environment().parse(content)
+        except jinja2.TemplateSyntaxError as e:
+            raise Uncacheable(str(e))
+        if any(True for _ in meta.find_referenced_templates(ast)):
+            raise Uncacheable("Template references other templates")
+        for node in ast.find_all((nodes.Filter, nodes.Test)):
+            self._check_pure(node)
+        try:
+            names = meta.find_undeclared_variables(ast) - JINJA_GLOBALS
+        except jinja2.TemplateSyntaxError as e:
+            raise Uncacheable(str(e))
+        if (names & UNCACHEABLE_NAMES or
+                any(name.startswith(("ansible_loop", "template_"))
+                    for name in names)):
+            raise Uncacheable("Template references dynamic variables")
+        return names
+
+    def _variable(self, name):
+        if name not in self._variables:
+            try:
+                value = self.resolve_variable(name)
+            except AnsibleUndefinedVariable:
+                value = _UNDEFINED
+            self._variables[name] = json.dumps(value, sort_keys=True,
+                                               default=_json_default)
+        return self._variables[name]
+
+    def fingerprint(self, strategy, sources, params):
+        """Return a fingerprint of the inputs to a generated file.
+
+        :raises: Uncacheable if the inputs cannot be fingerprinted.
+        """
+        digest = hashlib.sha256()
+        header = {
+            "version": MANIFEST_VERSION,
+            "strategy": strategy,
+            "sources": sources,
+            "params": params,
+        }
+        digest.update(json.dumps(header, sort_keys=True,
+                                 default=_json_default).encode())
+        names = set()
+        for source in sources:
+            with open(source, "rb") as f:
+                content = f.read()
+            digest.update(hashlib.sha256(content).digest())
+            if strategy in TEMPLATED_STRATEGIES:
+                try:
+                    text = content.decode()
+                except UnicodeDecodeError as e:
+                    raise Uncacheable(str(e))
+                names |= self._referenced_variables(text)
+        for name in sorted(names):
+            digest.update(name.encode() + b"\0")
+            digest.update(self._variable(name).encode() + b"\0")
+        return digest.hexdigest()
+
+    def filter_actions(self, actions):
+        """Remove actions for files whose inputs have not changed.
+
+        Adds the following keys to actions:
+        * fingerprints: a dict mapping each destination file that may be
+          cached to its fingerprint.
+        * unchanged: a list of destination files that were skipped.
+        """
+        fingerprints = {}
+        unchanged = []
+        for strategy in ["copy", "template", "concat", "merge_configs",
+                         "merge_yaml"]:
+            remaining = []
+            for action in actions[strategy]:
+                dest = action["dest"]
+                sources = action.get("sources") or [action["src"]]
+                try:
+                    fingerprint = self.fingerprint(strategy, sources,
+                                                   action["params"])
+                except Uncacheable:
+                    remaining.append(action)
+                    continue
+                fingerprints[dest] = fingerprint
+                entry = self.entries.get(dest)
+                if (entry and entry["fingerprint"] == fingerprint and
+                        entry["stat"] == _stat_signature(dest)):
+                    unchanged.append(dest)
+                else:
+                    remaining.append(action)
+            actions[strategy] = remaining
+        actions["fingerprints"] = fingerprints
+        actions["unchanged"] = unchanged
+        return actions
+
+
 class ActionModule(ActionBase):
 
     def run(self, tmp=None, task_vars=None):
@@ -241,6 +681,15 @@ class ActionModule(ActionBase):
 
         collector.collect()
 
-        result.update(collector.partition_into_actions())
+        actions = collector.partition_into_actions()
+        manifest = args.get("manifest")
+        if manifest:
+            manifest = ConfigManifest(manifest, self._resolve_variable)
+            actions = manifest.filter_actions(actions)
+        result.update(actions)
 
         return result
+
+    def _resolve_variable(self, name):
+        return self._templar.template(
+            self._templar.resolve_variable_expression(name))
@@ -0,0 +1,83 @@
+# Copyright (c) 2026 StackHPC Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from ansible.plugins.action import ActionBase
+import importlib.util
+import json
+import os
+import tempfile
+
+
+def _load_info_plugin():
+    """Load the kolla_custom_config_info action plugin.
+
+    The manifest version and file signature are defined by
+    kolla_custom_config_info, which reads the manifest.
+    """
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        "kolla_custom_config_info.py")
+    spec = importlib.util.spec_from_file_location(
+        "kayobe_kolla_custom_config_info", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+_info = _load_info_plugin()
+MANIFEST_VERSION = _info.MANIFEST_VERSION
+_stat_signature = _info._stat_signature
+
+
+class ActionModule(ActionBase):
+    """Record generated extra configuration files in a manifest.
+
+    Used by kolla_custom_config_info to skip files whose inputs have not
+    changed. Takes the fingerprints returned by kolla_custom_config_info, and
+    records them along with the current state of each generated file.
+    """
+
+    def run(self, tmp=None, task_vars=None):
+        if task_vars is None:
+            task_vars = dict()
+
+        result = super(ActionModule, self).run(tmp, task_vars)
+        result['changed'] = False
+
+        if self._play_context.check_mode:
+            result['skipped'] = True
+            result['msg'] = "Manifest is not updated in check mode"
+            return result
+
+        path = self._task.args["path"]
+        fingerprints = self._task.args.get("fingerprints") or {}
+        files = {}
+        for dest, fingerprint in fingerprints.items():
+            stat = _stat_signature(dest)
+            if stat is not None:
+                files[dest] = {"fingerprint": fingerprint, "stat": stat}
+        manifest = {"version": MANIFEST_VERSION, "files": files}
+
+        dirname = os.path.dirname(path)
+        os.makedirs(dirname, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=dirname, prefix=".manifest-")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(manifest, f, indent=2, sort_keys=True)
+            os.chmod(tmp_path, 0o640)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+        return result
@@ -0,0 +1,178 @@
+#!/usr/bin/python
+
+# Copyright (c) 2026 StackHPC Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+DOCUMENTATION = '''
+---
+module: container_image_pull
+short_description: Pull container images concurrently
+description:
+    - Pull a list of container images using the docker or podman CLI, with a
+      bounded number of concurrent pulls. Failed pulls are retried with an
+      exponential backoff. An image is reported as changed if its ID changed.
+options:
+  images:
+    description: List of image references to pull. Duplicates are ignored.
+    required: True
+    type: list
+    elements: str
+  engine:
+    description: Container engine CLI to use.
+    default: docker
+    choices: [docker, podman]
+    type: str
+  concurrency:
+    description: Maximum number of concurrent pulls.
+    default: 4
+    type: int
+  retries:
+    description: Number of times to retry a failed pull.
+    default: 2
+    type: int
+author: StackHPC
+'''
+
+EXAMPLES = '''
+- name: Ensure container images are pulled
+  container_image_pull:
+    images:
+      - docker.io/library/registry:2
+      - docker.io/stackhpc/squid:3.5.20-1
+    concurrency: 2
+'''
+
+RETURN = '''
+images:
+    description: >
+      List of results for each image, with items image, changed, failed,
+      attempts, seconds, size (in bytes) and msg if the pull failed.
+    type: list
+    returned: always
+start:
+    description: Time at which pulls started, in seconds since the epoch.
+    type: float
+    returned: always
+end:
+    description: Time at which pulls ended, in seconds since the epoch.
+    type: float
+    returned: always
+'''
+
+from concurrent import futures
+import subprocess
+import time
+
+from ansible.module_utils.basic import AnsibleModule
+
+# Maximum delay between retries of a failed pull, in seconds.
+MAX_RETRY_DELAY = 30
+
+
+def _run(cmd):
+    try:
+        return subprocess.run(cmd, stdout=subprocess.PIPE,
+                              stderr=subprocess.PIPE, universal_newlines=True)
+    except OSError as e:
+        return subprocess.CompletedProcess(cmd, 1, "", str(e))
+
+
+def inspect_image(engine, image):
+    """Return a tuple of the ID and size of a local image, or None."""
+    proc = _run([engine, "image", "inspect", "--format", "{{.Id}} {{.Size}}",
+                 image])
+    if proc.returncode != 0:
+        return None
+    image_id, size = proc.stdout.split()
+    return image_id, int(size)
+
+
+def pull_image(engine, image, retries, check_mode):
+    """Pull an image and return a dict describing the result."""
+    start = time.monotonic()
+    before = inspect_image(engine, image)
+    result = {"image": image, "changed": False, "failed": False,
+              "attempts": 0, "size": before[1] if before else 0}
+    if check_mode:
+        result["changed"] = before is None
+        return result
+    for attempt in range(retries + 1):
+        if attempt:
+            time.sleep(min(2 ** attempt, MAX_RETRY_DELAY))
+        result["attempts"] += 1
+        proc = _run([engine, "pull", image])
+        if proc.returncode == 0:
+            break
+    else:
+        result["failed"] = True
+        result["msg"] = proc.stderr.strip() or proc.stdout.strip()
+    if not result["failed"]:
+        after = inspect_image(engine, image)
+        if after:
+            result["changed"] = before is None or after[0] != before[0]
+            result["size"] = after[1]
+    result["seconds"] = round(time.monotonic() - start, 3)
+    return result
+
+
+def pull_images(engine, images, concurrency, retries, check_mode):
+    """Pull images concurrently, returning a list of results in order."""
+    images = list(dict.fromkeys(images))
+    if not images:
+        return []
+    workers = max(1, min(concurrency, len(images)))
+    with futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(
+            lambda image: pull_image(engine, image, retries, check_mode),
+            images))
+
+
+def run_module():
+    module = AnsibleModule(
+        argument_spec=dict(
+            images=dict(type='list', elements='str', required=True),
+            engine=dict(type='str', default='docker',
+                        choices=['docker', 'podman']),
+            concurrency=dict(type='int', default=4),
+            retries=dict(type='int', default=2),
+        ),
+        supports_check_mode=True,
+    )
+    start = time.time()
+    results = pull_images(module.params['engine'], module.params['images'],
+                          module.params['concurrency'],
+                          module.params['retries'], module.check_mode)
+    end = time.time()
+    failed = [result for result in results if result["failed"]]
+    response = {
+        "changed": any(result["changed"] for result in results),
+        "images": results,
+        "start": start,
+        "end": end,
+    }
+    if failed:
+        module.fail_json(
+            msg="Failed to pull images: %s" % ", ".join(
+                "%s (%s)" % (result["image"], result["msg"])
+                for result in failed),
+            **response)
+    module.exit_json(**response)
+
+
+def main():
+    run_module()
+
+
+if __name__ == '__main__':
+    main()
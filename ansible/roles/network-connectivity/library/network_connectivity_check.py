@@ -0,0 +1,253 @@
+#!/usr/bin/python
+
+# Copyright (c) 2026 StackHPC Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+DOCUMENTATION = '''
+---
+module: network_connectivity_check
+short_description: Check connectivity to a list of targets concurrently
+description:
+    - Ping a list of targets, such as other hosts, gateways and external
+      addresses, using a bounded number of concurrent ping processes. Where
+      a target has an MTU, packets of the maximum size are sent with
+      fragmentation prohibited. Packet loss and round trip times are
+      reported for each target, and summarised for each network.
+options:
+  targets:
+    description: >
+      List of targets to check. Each target is a dict with items address,
+      the IP address or hostname to ping, and optionally type, network,
+      destination and mtu. Other items are included in the results.
+    required: True
+    type: list
+    elements: dict
+  count:
+    description: Number of packets to send to each target.
+    default: 1
+    type: int
+  timeout:
+    description: Time to wait for each response, in seconds.
+    default: 1
+    type: int
+  interval:
+    description: >
+      Interval between sending packets to a target, in seconds. Only used
+      if count is greater than 1.
+    default: 0.2
+    type: float
+  concurrency:
+    description: Maximum number of concurrent ping processes.
+    default: 64
+    type: int
+  icmp_overhead_bytes:
+    description: >
+      Number of bytes to subtract from the MTU to allow for ICMP and IP
+      headers.
+    default: 28
+    type: int
+author: StackHPC
+'''
+
+EXAMPLES = '''
+- name: Ensure hosts on the same network are reachable
+  network_connectivity_check:
+    targets:
+      - type: gateway
+        network: internal
+        destination: gateway
+        address: 10.0.0.1
+        mtu: 9000
+      - type: host
+        network: internal
+        destination: controller0
+        address: 10.0.0.2
+        mtu: 9000
+      - type: external
+        address: 8.8.8.8
+    count: 3
+'''
+
+RETURN = '''
+checks:
+    description: >
+      List of results for each target, in order. Each result contains the
+      items of the target, and failed, transmitted, received, loss (as a
+      percentage), rtt_min, rtt_avg and rtt_max (in milliseconds, or null
+      if no responses were received), and msg if the check failed.
+    type: list
+    returned: always
+networks:
+    description: >
+      Dict mapping names of networks to a summary of the checks of targets
+      on the network, with items checked, failed, loss (the mean percentage
+      packet loss), rtt_avg (the mean round trip time in milliseconds, or
+      null) and mtu.
+    type: dict
+    returned: always
+seconds:
+    description: Time taken to perform all checks, in seconds.
+    type: float
+    returned: always
+'''
+
+from concurrent import futures
+import re
+import subprocess
+import time
+
+from ansible.module_utils.basic import AnsibleModule
+
+# Regular expressions matching ping statistics output by iputils and busybox.
+TRANSMITTED_RE = re.compile(
+    r"(\d+) packets transmitted, (\d+) (?:packets )?received")
+LOSS_RE = re.compile(r"([\d.]+)% packet loss")
+RTT_RE = re.compile(r"= ([\d.]+)/([\d.]+)/([\d.]+)")
+
+
+def _run(cmd):
+    try:
+        return subprocess.run(cmd, stdout=subprocess.PIPE,
+                              stderr=subprocess.PIPE, universal_newlines=True)
+    except OSError as e:
+        return subprocess.CompletedProcess(cmd, 1, "", str(e))
+
+
+def ping_cmd(target, count, timeout, interval, icmp_overhead_bytes):
+    """Return a ping command line for a target."""
+    cmd = ["ping", "-q", "-n", "-c", str(count), "-W", str(timeout)]
+    if count > 1:
+        cmd += ["-i", str(interval)]
+    mtu = target.get("mtu")
+    if mtu:
+        cmd += ["-M", "do", "-s", str(int(mtu) - icmp_overhead_bytes)]
+    cmd.append(str(target["address"]))
+    return cmd
+
+
+def parse_ping(output):
+    """Parse the summary statistics output by ping.
+
+    :returns: a dict with items transmitted, received, loss, rtt_min,
+        rtt_avg and rtt_max.
+    """
+    stats = {"transmitted": 0, "received": 0, "loss": 100.0,
+             "rtt_min": None, "rtt_avg": None, "rtt_max": None}
+    match = TRANSMITTED_RE.search(output)
+    if match:
+        stats["transmitted"] = int(match.group(1))
+        stats["received"] = int(match.group(2))
+    match = LOSS_RE.search(output)
+    if match:
+        stats["loss"] = float(match.group(1))
+    match = RTT_RE.search(output)
+    if match:
+        stats["rtt_min"], stats["rtt_avg"], stats["rtt_max"] = (
+            float(value) for value in match.groups())
+    return stats
+
+
+def check_target(target, count, timeout, interval, icmp_overhead_bytes):
+    """Ping a target and return a dict describing the result."""
+    proc = _run(ping_cmd(target, count, timeout, interval,
+                         icmp_overhead_bytes))
+    result = dict(target)
+    result.update(parse_ping(proc.stdout))
+    result["failed"] = proc.returncode != 0 or result["received"] == 0
+    if result["failed"]:
+        result["msg"] = (proc.stderr.strip() or
+                         "%d%% packet loss" % result["loss"])
+    return result
+
+
+def check_targets(targets, count, timeout, interval, concurrency,
+                  icmp_overhead_bytes):
+    """Check targets concurrently, returning a list of results in order."""
+    if not targets:
+        return []
+    workers = max(1, min(concurrency, len(targets)))
+    with futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(
+            lambda target: check_target(target, count, timeout, interval,
+                                        icmp_overhead_bytes),
+            targets))
+
+
+def summarise(results):
+    """Summarise the results of checks for each network."""
+    networks = {}
+    for result in results:
+        if not result.get("network"):
+            continue
+        networks.setdefault(result["network"], []).append(result)
+    summary = {}
+    for name, checks in sorted(networks.items()):
+        rtts = [check["rtt_avg"] for check in checks
+                if check["rtt_avg"] is not None]
+        summary[name] = {
+            "checked": len(checks),
+            "failed": sum(1 for check in checks if check["failed"]),
+            "loss": round(sum(check["loss"] for check in checks) /
+                          len(checks), 3),
+            "rtt_avg": round(sum(rtts) / len(rtts), 3) if rtts else None,
+            "mtu": max((check.get("mtu") or 0 for check in checks)) or None,
+        }
+    return summary
+
+
+def run_module():
+    module = AnsibleModule(
+        argument_spec=dict(
+            targets=dict(type='list', elements='dict', required=True),
+            count=dict(type='int', default=1),
+            timeout=dict(type='int', default=1),
+            interval=dict(type='float', default=0.2),
+            concurrency=dict(type='int', default=64),
+            icmp_overhead_bytes=dict(type='int', default=28),
+        ),
+        supports_check_mode=True,
+    )
+    targets = module.params['targets']
+    invalid = [target for target in targets if not target.get("address")]
+    if invalid:
+        module.fail_json(msg="Targets without an address: %s" % invalid)
+    start = time.monotonic()
+    results = check_targets(targets, max(1, module.params['count']),
+                            module.params['timeout'],
+                            module.params['interval'],
+                            module.params['concurrency'],
+                            module.params['icmp_overhead_bytes'])
+    response = {
+        "changed": False,
+        "checks": results,
+        "networks": summarise(results),
+        "seconds": round(time.monotonic() - start, 3),
+    }
+    failed = [result for result in results if result["failed"]]
+    if failed:
+        module.fail_json(
+            msg="Failed to reach %s" % ", ".join(
+                "%s (%s)" % (result.get("destination") or result["address"],
+                             result["msg"])
+                for result in failed),
+            **response)
+    module.exit_json(**response)
+
+
+def main():
+    run_module()
+
+
+if __name__ == '__main__':
+    main()
@@ -9,10 +9,26 @@ Usage:
 
 python swift-ring-builder.py <config file path> <build path> <service name>
 
+python swift-ring-builder.py [--incremental] --build-path <build path> \
+    <service name>...
+
 Example:
 
 python swift-ring-builder.py /path/to/config.yml /path/to/builds object
 
+python swift-ring-builder.py --build-path /path/to/builds object account
+
+In the second form, the configuration for each service is read from
+<build path>/<service name>-ring.yml, and the rings are built concurrently.
+With --incremental, an existing <build path>/<service name>.builder file is
+updated to match the configuration, rather than building a new ring. This
+minimises the number of partitions moved. A summary of the changes is written
+to <build path>/<service name>-ring-summary.json.
+
+If the Swift library is available, rings are built in-process, with one
+builder kept in memory for each ring. Otherwise the swift-ring-builder command
+is used.
+
 Example configuration format:
 
 ---
@@ -33,11 +49,21 @@ hosts:
       - device: /dev/sdc
         weight: 100
 """
+import concurrent.futures
+import json
+import os
 import subprocess
 import sys
 
 import yaml
 
+try:
+    from swift.common import exceptions as swift_exceptions
+    from swift.common.ring import RingBuilder as SwiftRingBuilder
+    from swift.common.ring.utils import validate_and_normalize_address
+except ImportError:
+    SwiftRingBuilder = None
+
 
 class RingBuilder(object):
     """Helper class for building Swift rings."""
@@ -98,8 +124,210 @@ class RingBuilder(object):
             sys.exit(1)
 
 
+class InProcessRingBuilder(object):
+    """Helper class for building Swift rings using the Swift library.
+
+    This avoids loading and saving the builder file in a swift-ring-builder
+    process for every command. Output and failure conditions follow those of
+    swift-ring-builder.
+    """
+
+    def __init__(self, build_path, service_name):
+        self.builder_file = os.path.join(build_path,
+                                         '%s.builder' % service_name)
+        self.ring_file = os.path.join(build_path, '%s.ring.gz' % service_name)
+        self.service_name = service_name
+        self.builder = None
+
+    def create(self, part_power, replication_count, min_part_hours):
+        try:
+            self.builder = SwiftRingBuilder(int(part_power),
+                                            float(replication_count),
+                                            int(min_part_hours))
+        except ValueError as e:
+            print(e)
+            print("Failed to create %s ring" % self.service_name)
+            sys.exit(1)
+
+    def load(self):
+        """Load an existing builder file.
+
+        Returns False if the builder file does not exist.
+        """
+        if not os.path.exists(self.builder_file):
+            return False
+        self.builder = SwiftRingBuilder.load(self.builder_file)
+        return True
+
+    def get_device(self, host, device):
+        """Return a Swift device dict for a device in the configuration."""
+        try:
+            return {
+                'region': int(host['region']),
+                'zone': int(host['zone']),
+                'ip': validate_and_normalize_address(host['ip']),
+                'port': int(host['port']),
+                'replication_ip': validate_and_normalize_address(
+                    host['replication_ip']),
+                'replication_port': int(host['replication_port']),
+                'device': device['device'],
+                'weight': float(device['weight']),
+                'meta': '',
+            }
+        except ValueError as e:
+            print(e)
+            print("Failed to add device %s on host %s to %s ring" %
+                  (host['host'], device['device'], self.service_name))
+            sys.exit(1)
+
+    def add_device(self, host, device):
+        new_dev = self.get_device(host, device)
+        try:
+            for dev in self.builder.devs:
+                if dev is None:
+                    continue
+                if (dev['ip'] == new_dev['ip'] and
+                        dev['port'] == new_dev['port'] and
+                        dev['device'] == new_dev['device']):
+                    raise ValueError('Device %d already uses %s:%d/%s.' %
+                                     (dev['id'], dev['ip'], dev['port'],
+                                      dev['device']))
+            dev_id = self.builder.add_dev(new_dev)
+        except (ValueError, swift_exceptions.RingBuilderError) as e:
+            print(e)
+            print("Failed to add device %s on host %s to %s ring" %
+                  (host['host'], device['device'], self.service_name))
+            sys.exit(1)
+        print('Device %s:%d/%s with %s weight got id %s in %s ring' %
+              (new_dev['ip'], new_dev['port'], new_dev['device'],
+               new_dev['weight'], dev_id, self.service_name))
+
+    def update(self, config):
+        """Apply the differences between the builder and a configuration.
+
+        Devices are identified by IP, port and device name. Devices not in
+        the configuration are removed, and devices not in the builder are
+        added. Devices which have moved to a different region or zone are
+        removed and added again.
+
+        :returns: a dict with the number of devices added, removed,
+            reweighted and otherwise updated.
+        """
+        summary = {'added': 0, 'removed': 0, 'reweighted': 0, 'updated': 0}
+        builder = self.builder
+        if int(config['part_power']) != builder.part_power:
+            print("Cannot change the partition power of the %s ring from %d "
+                  "to %s" % (self.service_name, builder.part_power,
+                             config['part_power']))
+            sys.exit(1)
+        if float(config['replication_count']) != builder.replicas:
+            builder.set_replicas(float(config['replication_count']))
+        if int(config['min_part_hours']) != builder.min_part_hours:
+            builder.change_min_part_hours(int(config['min_part_hours']))
+
+        desired = {}
+        for host in config['hosts']:
+            for device in host['devices'] or []:
+                dev = self.get_device(host, device)
+                key = (dev['ip'], dev['port'], dev['device'])
+                if key in desired:
+                    print("Device %s:%d/%s is configured more than once" %
+                          key)
+                    print("Failed to update %s ring" % self.service_name)
+                    sys.exit(1)
+                desired[key] = dev
+
+        existing = {(dev['ip'], dev['port'], dev['device']): dev
+                    for dev in builder.devs if dev is not None}
+        for key, dev in existing.items():
+            new_dev = desired.get(key)
+            if (new_dev is not None and
+                    (dev['region'], dev['zone']) ==
+                    (new_dev['region'], new_dev['zone'])):
+                del desired[key]
+                if dev['weight'] != new_dev['weight']:
+                    builder.set_dev_weight(dev['id'], new_dev['weight'])
+                    summary['reweighted'] += 1
+                if ((dev['replication_ip'], dev['replication_port']) !=
+                        (new_dev['replication_ip'],
+                         new_dev['replication_port'])):
+                    dev['replication_ip'] = new_dev['replication_ip']
+                    dev['replication_port'] = new_dev['replication_port']
+                    summary['updated'] += 1
+                continue
+            builder.remove_dev(dev['id'])
+            summary['removed'] += 1
+            print('Removing device %s:%d/%s from %s ring' %
+                  (key + (self.service_name,)))
+
+        # Devices being removed remain in the builder until it is
+        # rebalanced, so add devices without checking for duplicates.
+        for dev in desired.values():
+            try:
+                dev_id = builder.add_dev(dev)
+            except (ValueError, swift_exceptions.RingBuilderError) as e:
+                print(e)
+                print("Failed to update %s ring" % self.service_name)
+                sys.exit(1)
+            summary['added'] += 1
+            print('Device %s:%d/%s with %s weight got id %s in %s ring' %
+                  (dev['ip'], dev['port'], dev['device'], dev['weight'],
+                   dev_id, self.service_name))
+        return summary
+
+    def rebalance(self, strict=True):
+        """Rebalance the ring, and save the builder and ring files.
+
+        :param strict: whether to fail if the ring is not optimally balanced
+            or dispersed after rebalancing, as swift-ring-builder does.
+        :returns: a dict describing the rebalance.
+        """
+        try:
+            parts, balance, _ = self.builder.rebalance()
+            self.builder.validate()
+        except swift_exceptions.RingBuilderError as e:
+            print(e)
+            print("Failed to rebalance %s ring" % self.service_name)
+            sys.exit(1)
+        total = int(self.builder.parts * self.builder.replicas)
+        print('Reassigned %d (%.02f%%) partitions in %s ring. '
+              'Balance is now %.02f.  Dispersion is now %.02f' %
+              (parts, 100.0 * parts / self.builder.parts, self.service_name,
+               balance, self.builder.dispersion))
+        # swift-ring-builder saves the ring, but exits with a warning status
+        # in these cases.
+        warning = None
+        if self.builder.dispersion > 0:
+            warning = ('Dispersion of %.06f indicates some parts are not '
+                       'optimally dispersed' % self.builder.dispersion)
+        elif balance > 5 and balance / 100.0 > self.builder.overload:
+            warning = ('Balance of %.02f indicates you should push this '
+                       'ring, wait at least %d hours, and rebalance/repush' %
+                       (balance, self.builder.min_part_hours))
+        self.builder.get_ring().save(self.ring_file)
+        self.builder.save(self.builder_file)
+        if warning:
+            print("NOTE: %s" % warning)
+            if strict:
+                print("Failed to rebalance %s ring" % self.service_name)
+                sys.exit(1)
+        return {
+            'parts_moved': parts,
+            'parts_total': total,
+            'parts_moved_percent': round(100.0 * parts / total, 2),
+            'balance': round(balance, 2),
+            'dispersion': round(self.builder.dispersion, 2),
+        }
+
+
+def get_builder(build_path, service_name):
+    if SwiftRingBuilder is not None:
+        return InProcessRingBuilder(build_path, service_name)
+    return RingBuilder(build_path, service_name)
+
+
 def build_rings(config, build_path, service_name):
-    builder = RingBuilder(build_path, service_name)
+    builder = get_builder(build_path, service_name)
     builder.create(config['part_power'], config['replication_count'],
                    config['min_part_hours'])
     for host in config['hosts']:
@@ -112,16 +340,99 @@ def build_rings(config, build_path, service_name):
     builder.rebalance()
 
 
-def main():
-    if len(sys.argv) != 4:
-        raise Exception("Usage: {0} <config file path> <build path> "
-                        "<service name>")
-    config_path = sys.argv[1]
-    build_path = sys.argv[2]
-    service_name = sys.argv[3]
+def update_rings(config, build_path, service_name):
+    """Update an existing ring to match a configuration.
+
+    Only the differences between the existing builder and the configuration
+    are applied, and the ring is rebalanced once. If there is no existing
+    builder, the ring is built from scratch. A summary of the changes is
+    printed, and written to <build path>/<service name>-ring-summary.json.
+    """
+    if SwiftRingBuilder is None:
+        print("Incremental ring updates require the Swift library")
+        sys.exit(1)
+    builder = InProcessRingBuilder(build_path, service_name)
+    if builder.load():
+        summary = builder.update(config)
+    else:
+        print("No existing %s ring builder. Creating a new ring" %
+              service_name)
+        builder.create(config['part_power'], config['replication_count'],
+                       config['min_part_hours'])
+        for host in config['hosts']:
+            for device in host['devices'] or []:
+                builder.add_device(host, device)
+        summary = {'added': len(builder.builder.devs), 'removed': 0,
+                   'reweighted': 0, 'updated': 0}
+    summary['service'] = service_name
+    # Partitions will be moved over several rebalances where min_part_hours
+    # prevents moving them all at once, so don't fail on imbalance.
+    summary.update(builder.rebalance(strict=False))
+    print("Summary of changes to %(service)s ring: %(added)d devices added, "
+          "%(removed)d removed, %(reweighted)d reweighted, %(updated)d "
+          "updated. %(parts_moved)d of %(parts_total)d partition replicas "
+          "(%(parts_moved_percent).02f%%) reassigned." % summary)
+    summary_path = os.path.join(build_path,
+                                '%s-ring-summary.json' % service_name)
+    with open(summary_path, 'w') as f:
+        json.dump(summary, f)
+    return summary
+
+
+def load_config(config_path):
     with open(config_path) as f:
-        config = yaml.safe_load(f)
-    build_rings(config, build_path, service_name)
+        return yaml.safe_load(f)
+
+
+def build_service_ring(build_path, service_name, incremental=False):
+    config_path = os.path.join(build_path, '%s-ring.yml' % service_name)
+    config = load_config(config_path)
+    if incremental:
+        update_rings(config, build_path, service_name)
+    else:
+        build_rings(config, build_path, service_name)
+
+
+def build_service_rings(build_path, service_names, incremental=False):
+    """Build the rings for several services concurrently.
+
+    Returns the number of rings which failed to build.
+    """
+    failures = 0
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=len(service_names)) as executor:
+        futures = [executor.submit(build_service_ring, build_path, name,
+                                   incremental)
+                   for name in service_names]
+        for future in futures:
+            try:
+                future.result()
+            except SystemExit as e:
+                if e.code:
+                    failures += 1
+    return failures
+
+
+def main():
+    usage = ("Usage: {0} <config file path> <build path> <service name>\n"
+             "       {0} [--incremental] --build-path <build path> "
+             "<service name>...".format(sys.argv[0]))
+    args = sys.argv[1:]
+    incremental = args[:1] == ['--incremental']
+    if incremental:
+        args = args[1:]
+    if len(args) >= 3 and args[0] == '--build-path':
+        build_path = args[1]
+        service_names = args[2:]
+        if build_service_rings(build_path, service_names, incremental):
+            sys.exit(1)
+        return
+    if len(args) != 3 or incremental:
+        raise Exception(usage)
+    config_path = args[0]
+    build_path = args[1]
+    service_name = args[2]
+    build_rings(load_config(config_path), build_path, service_name)
 
 
 if __name__ == "__main__":
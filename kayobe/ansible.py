@@ -12,6 +12,7 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import contextlib
 import errno
 import logging
 import os
@@ -21,9 +22,11 @@ import subprocess
 import sys
 import tempfile
 
-from ansible.parsing.vault import EncryptedString
+from ansible.module_utils.parsing.convert_bool import boolean
 
+from kayobe import daemon
 from kayobe import exception
+from kayobe import hostvars
 from kayobe import utils
 from kayobe import vault
 
@@ -57,6 +60,9 @@ def add_args(parser):
     parser.add_argument("--environment", default=default_environment,
                         help="specify environment name (default=$%s or None)" %
                              ENVIRONMENT_ENV)
+    parser.add_argument("--explain-plan", action="store_true",
+                        help="log how Kayobe playbook runs are merged into "
+                             "ansible-playbook invocations")
     parser.add_argument("-e", "--extra-vars", metavar="EXTRA_VARS",
                         action="append",
                         help="set additional variables as key=value or "
@@ -398,6 +404,11 @@ def _get_environment(parsed_args, external_playbook=False):
     # environment variable is set, so that it can be referenced by playbooks.
     if parsed_args.environment:
         env.setdefault(ENVIRONMENT_ENV, parsed_args.environment)
+        # Pass the resolved environment dependencies to the environments
+        # lookup plugin, avoiding resolution in each Ansible process.
+        environment_finder = utils.EnvironmentFinder(
+            env[CONFIG_PATH_ENV], env[ENVIRONMENT_ENV])
+        environment_finder.export(env)
     # If a custom Ansible configuration file exists, use it.
     ansible_cfg_path = os.path.join(parsed_args.config_path, "ansible.cfg")
     if utils.is_readable_file(ansible_cfg_path)["result"]:
@@ -487,6 +498,39 @@ def _get_environment(parsed_args, external_playbook=False):
     return env
 
 
+def _is_external_playbook(playbooks):
+    """Return whether a list of playbooks is external to Kayobe.
+
+    This is determined by the first playbook in the list.
+    """
+    first_playbook = os.path.realpath(playbooks[0])
+    return not first_playbook.startswith(os.path.realpath(
+        utils.get_data_files_path("ansible")))
+
+
+def _run_daemon_playbook(parsed_args, cmd, env, quiet=False):
+    """Run an ansible-playbook command via the Kayobe daemon, if running.
+
+    :returns: the return code of the command, or None if the command was not
+        run by the daemon.
+    """
+    socket_path = daemon.get_socket_path(parsed_args.config_path,
+                                         parsed_args.environment)
+    if not os.path.exists(socket_path):
+        return None
+    LOG.debug("Running command via Kayobe daemon at %s", socket_path)
+    devnull = os.open(os.devnull, os.O_RDWR) if quiet else None
+    try:
+        return daemon.run_playbook(socket_path, cmd, env, stdout=devnull,
+                                   stderr=devnull)
+    except daemon.DaemonError as e:
+        LOG.error("%s", e)
+        return 1
+    finally:
+        if devnull is not None:
+            os.close(devnull)
+
+
 def run_playbooks(parsed_args, playbooks,
                   extra_vars=None, limit=None, tags=None, quiet=False,
                   check_output=False, verbose_level=None, check=None,
@@ -498,14 +542,17 @@ def run_playbooks(parsed_args, playbooks,
                      verbose_level=verbose_level, check=check,
                      ignore_limit=ignore_limit, list_tasks=list_tasks,
                      diff=diff)
-    first_playbook = os.path.realpath(playbooks[0])
-    external_playbook = False
-    if not first_playbook.startswith(os.path.realpath(
-            utils.get_data_files_path("ansible"))):
-        external_playbook = True
+    external_playbook = _is_external_playbook(playbooks)
     env = _get_environment(parsed_args, external_playbook)
     try:
-        utils.run_command(cmd, check_output=check_output, quiet=quiet, env=env)
+        returncode = None
+        if not check_output:
+            returncode = _run_daemon_playbook(parsed_args, cmd, env, quiet)
+        if returncode is None:
+            utils.run_command(cmd, check_output=check_output, quiet=quiet,
+                              env=env)
+        elif returncode != 0:
+            raise subprocess.CalledProcessError(returncode, cmd)
     except subprocess.CalledProcessError as e:
         LOG.error("Kayobe playbook(s) %s exited %d",
                   ", ".join(playbooks), e.returncode)
@@ -514,6 +561,21 @@ def run_playbooks(parsed_args, playbooks,
         sys.exit(e.returncode)
 
 
+def start_daemon(parsed_args, socket_path=None):
+    """Start a Kayobe daemon for running Kayobe Ansible playbooks.
+
+    This replaces the current process.
+    """
+    if not socket_path:
+        socket_path = daemon.get_socket_path(parsed_args.config_path,
+                                             parsed_args.environment)
+    env = _get_environment(parsed_args)
+    # The vault password is provided by the CLI with each request.
+    env.pop(vault.VAULT_PASSWORD_ENV, None)
+    LOG.info("Starting Kayobe daemon on %s", socket_path)
+    daemon.start(socket_path, env)
+
+
 def build_long_opts(arg_dict):
     """Convert dict to flat ['--flag', 'value', ...] list."""
     cmd = []
@@ -583,20 +645,138 @@ def run_playbook(parsed_args, playbook, *args, **kwargs):
     return run_playbooks(parsed_args, [playbook], *args, **kwargs)
 
 
-def _sanitise_hostvar(var):
-    """Sanitise a host variable."""
-    if isinstance(var, EncryptedString):
-        return "******"
-    # Recursively sanitise dicts and lists.
-    if isinstance(var, dict):
-        return {k: _sanitise_hostvar(v) for k, v in var.items()}
-    if isinstance(var, list):
-        return [_sanitise_hostvar(v) for v in var]
-    return var
+class PlaybookPlan(object):
+    """A plan for running a sequence of Kayobe Ansible playbooks.
 
+    Each call to run_playbooks() is added to the plan as a stage, and deferred
+    until the plan is flushed. Adjacent stages that would execute
+    ansible-playbook with the same arguments and environment are merged into
+    a single invocation, avoiding the cost of starting Ansible, loading the
+    inventory and gathering facts for each stage.
 
-def config_dump(parsed_args, host=None, hosts=None, var_name=None,
-                facts=None, extra_vars=None, tags=None, verbose_level=None):
+    Kayobe configuration is loaded when ansible-playbook starts, so stages
+    that write Kayobe configuration used by following stages, such as IP
+    address allocation, must be added as barriers.
+    """
+
+    def __init__(self, parsed_args):
+        self.parsed_args = parsed_args
+        self.stages = []
+        self.barriers = set()
+
+    def add(self, playbooks, barrier=False, **kwargs):
+        """Add a stage to the plan.
+
+        Accepts the same arguments as run_playbooks(). Stages that capture
+        output cannot be deferred, so flush the plan and run them
+        immediately.
+
+        :param barrier: If True, following stages are not merged into the same
+            invocation as this stage.
+        """
+        if kwargs.get("check_output"):
+            self.flush()
+            return run_playbooks(self.parsed_args, playbooks, **kwargs)
+        if barrier:
+            self.barriers.add(len(self.stages))
+        self.stages.append((list(playbooks), kwargs))
+
+    def _stage_key(self, playbooks, kwargs):
+        """Return a key identifying stages that may be merged."""
+        options = build_args(self.parsed_args, [], **{
+            k: v for k, v in kwargs.items() if k != "quiet"})
+        return (tuple(options), _is_external_playbook(playbooks),
+                kwargs.get("quiet", False))
+
+    def merge(self):
+        """Merge adjacent compatible stages.
+
+        :returns: a list of (stage indices, playbooks, kwargs) tuples, one for
+            each ansible-playbook invocation.
+        """
+        invocations = []
+        last_key = None
+        for index, (playbooks, kwargs) in enumerate(self.stages):
+            key = self._stage_key(playbooks, kwargs)
+            if (invocations and key == last_key and
+                    index - 1 not in self.barriers):
+                invocations[-1][0].append(index)
+                invocations[-1][1].extend(playbooks)
+            else:
+                invocations.append(([index], list(playbooks), kwargs))
+            last_key = key
+        return invocations
+
+    def explain(self, invocations):
+        """Log the stages of the plan and how they have been merged."""
+        lines = ["Kayobe playbook plan: %d stage(s) in %d invocation(s)" %
+                 (len(self.stages), len(invocations))]
+        for number, (indices, _, kwargs) in enumerate(invocations, 1):
+            args = ", ".join("%s=%s" % (k, kwargs[k]) for k in sorted(kwargs)
+                             if k not in ("quiet", "verbose_level"))
+            args = args or "default arguments"
+            lines.append("  Invocation %d (%s):" % (number, args))
+            for index in indices:
+                playbooks = self.stages[index][0]
+                barrier = " (barrier)" if index in self.barriers else ""
+                lines.append("    Stage %d: %s%s" % (index + 1, ", ".join(
+                    os.path.basename(p) for p in playbooks), barrier))
+        LOG.info("\n".join(lines))
+
+    def flush(self):
+        """Run all pending stages."""
+        if not self.stages:
+            return
+        invocations = self.merge()
+        if getattr(self.parsed_args, "explain_plan", False):
+            self.explain(invocations)
+        self.stages = []
+        self.barriers = set()
+        for _, playbooks, kwargs in invocations:
+            run_playbooks(self.parsed_args, playbooks, **kwargs)
+
+
+def evaluate_hostvars(parsed_args, playbook, extra_vars=None, tags=None,
+                      verbose_level=None):
+    """Write the files of dump-config.yml without running the playbook.
+
+    Host variables are evaluated by the Kayobe daemon if it is running, or
+    otherwise by a new interpreter with the environment used to run
+    playbooks.
+    """
+    _validate_args(parsed_args, [playbook])
+    cmd = build_args(parsed_args, [playbook],
+                     extra_vars=extra_vars, tags=tags,
+                     verbose_level=verbose_level, check=False,
+                     list_tasks=False, diff=False)
+    cmd[0] = hostvars.COMMAND
+    env = _get_environment(parsed_args)
+    returncode = _run_daemon_playbook(parsed_args, cmd, env)
+    if returncode is None:
+        try:
+            utils.run_command([sys.executable, "-m", "kayobe.hostvars"] +
+                              cmd[1:], env=env)
+            returncode = 0
+        except subprocess.CalledProcessError as e:
+            returncode = e.returncode
+    if returncode != 0:
+        LOG.error("Failed to evaluate host variables for %s", playbook)
+        sys.exit(returncode)
+
+
+def iter_config_dump(parsed_args, host=None, hosts=None, var_name=None,
+                     facts=None, extra_vars=None, tags=None,
+                     verbose_level=None):
+    """Dump configuration, yielding the variables of each host lazily.
+
+    Variables are dumped to a JSON file for each host, with vault encrypted
+    values masked. Unless facts are requested, the variables are evaluated
+    directly from the inventory, rather than by running dump-config.yml. The
+    files are then read one at a time as results are consumed, in order of
+    hostname.
+
+    :returns: a generator of tuples of (inventory_hostname, hostvars).
+    """
     dump_dir = tempfile.mkdtemp()
     try:
         if not extra_vars:
@@ -608,32 +788,49 @@ def config_dump(parsed_args, host=None, hosts=None, var_name=None,
             extra_vars["dump_var_name"] = var_name
         if facts is not None:
             extra_vars["dump_facts"] = facts
-        # Don't use check mode or list tasks for configuration dumps as we
-        # won't get any results back.
         playbook_path = utils.get_data_files_path("ansible", "dump-config.yml")
-        run_playbook(parsed_args, playbook_path,
-                     extra_vars=extra_vars, tags=tags, check_output=True,
-                     verbose_level=verbose_level, check=False,
-                     list_tasks=False, diff=False)
-        hostvars = {}
+        if facts is None or not boolean(facts, strict=False):
+            evaluate_hostvars(parsed_args, playbook_path,
+                              extra_vars=extra_vars, tags=tags,
+                              verbose_level=verbose_level)
+        else:
+            # Don't use check mode or list tasks for configuration dumps as
+            # we won't get any results back.
+            run_playbook(parsed_args, playbook_path,
+                         extra_vars=extra_vars, tags=tags, check_output=True,
+                         verbose_level=verbose_level, check=False,
+                         list_tasks=False, diff=False)
+        dump_files = []
         for path in os.listdir(dump_dir):
             LOG.debug("Found dump file %s", path)
             inventory_hostname, ext = os.path.splitext(path)
-            if ext == ".yml":
-                dump_file = os.path.join(dump_dir, path)
-                hvars = utils.read_config_dump_yaml_file(dump_file)
-                if host:
-                    return hvars
-                else:
-                    hostvars[inventory_hostname] = hvars
+            if ext == ".json":
+                dump_files.append((inventory_hostname, path))
             else:
                 LOG.warning("Unexpected extension on config dump file %s",
                             path)
-        return {k: _sanitise_hostvar(v) for k, v in hostvars.items()}
+        for inventory_hostname, path in sorted(dump_files):
+            dump_file = os.path.join(dump_dir, path)
+            yield (inventory_hostname,
+                   utils.read_config_dump_json_file(dump_file))
     finally:
         shutil.rmtree(dump_dir)
 
 
+def config_dump(parsed_args, host=None, hosts=None, var_name=None,
+                facts=None, extra_vars=None, tags=None, verbose_level=None):
+    results = iter_config_dump(parsed_args, host=host, hosts=hosts,
+                               var_name=var_name, facts=facts,
+                               extra_vars=extra_vars, tags=tags,
+                               verbose_level=verbose_level)
+    with contextlib.closing(results):
+        if host:
+            for _, hvars in results:
+                return hvars
+            return {}
+        return dict(results)
+
+
 def install_galaxy_roles(parsed_args, force=False):
     """Install Ansible Galaxy role dependencies.
 
@@ -12,7 +12,6 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
-import glob
 import json
 import os
 import re
@@ -21,16 +20,16 @@ import yaml
 
 from cliff.command import Command
 from cliff.hooks import CommandHook
+from cliff.lister import Lister
 
 from kayobe import ansible
+from kayobe import daemon
 from kayobe import environment
+from kayobe import hooks
 from kayobe import kolla_ansible
 from kayobe import utils
 from kayobe import vault
 
-# This is set to an arbitrary large number to simplify the sorting logic
-DEFAULT_SEQUENCE_NUMBER = sys.maxsize
-
 
 def _build_playbook_list(*playbooks):
     """Return a list of names of playbook files given their basenames."""
@@ -78,18 +77,56 @@ class KayobeAnsibleMixin(object):
             verbosity_args["quiet"] = True
         return verbosity_args
 
-    def run_kayobe_playbooks(self, parsed_args, *args, **kwargs):
+    def run(self, parsed_args):
+        # Defer Kayobe playbook runs for the duration of the command, including
+        # hooks, so that adjacent compatible runs may be merged.
+        self._playbook_plan = ansible.PlaybookPlan(parsed_args)
+        try:
+            return super(KayobeAnsibleMixin, self).run(parsed_args)
+        except KeyboardInterrupt:
+            self._playbook_plan = None
+            raise
+        finally:
+            self.flush_kayobe_playbooks()
+            self._playbook_plan = None
+
+    def flush_kayobe_playbooks(self):
+        """Run any deferred Kayobe playbooks.
+
+        This must be called before any action that may depend on the effects
+        of previous playbooks.
+        """
+        plan = getattr(self, "_playbook_plan", None)
+        if plan is not None:
+            plan.flush()
+
+    def run_kayobe_playbooks(self, parsed_args, *args, barrier=False,
+                             **kwargs):
+        """Run Kayobe playbooks, deferring them while a plan is active.
+
+        :param barrier: If True, the playbooks write Kayobe configuration used
+            by following playbooks, which must not be merged with them.
+        """
         kwargs.update(self._get_verbosity_args())
+        plan = getattr(self, "_playbook_plan", None)
+        if plan is not None:
+            return plan.add(*args, barrier=barrier, **kwargs)
         return ansible.run_playbooks(parsed_args, *args, **kwargs)
 
-    def run_kayobe_playbook(self, parsed_args, *args, **kwargs):
-        kwargs.update(self._get_verbosity_args())
-        return ansible.run_playbook(parsed_args, *args, **kwargs)
+    def run_kayobe_playbook(self, parsed_args, playbook, *args, **kwargs):
+        return self.run_kayobe_playbooks(parsed_args, [playbook], *args,
+                                         **kwargs)
 
     def run_kayobe_config_dump(self, parsed_args, *args, **kwargs):
+        self.flush_kayobe_playbooks()
         kwargs.update(self._get_verbosity_args())
         return ansible.config_dump(parsed_args, *args, **kwargs)
 
+    def iter_kayobe_config_dump(self, parsed_args, *args, **kwargs):
+        self.flush_kayobe_playbooks()
+        kwargs.update(self._get_verbosity_args())
+        return ansible.iter_config_dump(parsed_args, *args, **kwargs)
+
     def generate_kolla_ansible_config(self, parsed_args, install=False,
                                       service_config=True,
                                       bifrost_config=False):
@@ -140,30 +177,29 @@ class KollaAnsibleMixin(object):
             verbosity_args["quiet"] = True
         return verbosity_args
 
+    def _flush_kayobe_playbooks(self):
+        # Kolla Ansible may depend on configuration generated by deferred
+        # Kayobe playbooks.
+        flush = getattr(self, "flush_kayobe_playbooks", None)
+        if flush:
+            flush()
+
     def run_kolla_ansible(self, *args, **kwargs):
+        self._flush_kayobe_playbooks()
         kwargs.update(self._get_verbosity_args())
         return kolla_ansible.run(*args, **kwargs)
 
     def run_kolla_ansible_overcloud(self, *args, **kwargs):
+        self._flush_kayobe_playbooks()
         kwargs.update(self._get_verbosity_args())
         return kolla_ansible.run_overcloud(*args, **kwargs)
 
     def run_kolla_ansible_seed(self, *args, **kwargs):
+        self._flush_kayobe_playbooks()
         kwargs.update(self._get_verbosity_args())
         return kolla_ansible.run_seed(*args, **kwargs)
 
 
-def _split_hook_sequence_number(hook):
-    hook = os.path.basename(hook)
-    parts = hook.split("-", 1)
-    if len(parts) < 2:
-        return (DEFAULT_SEQUENCE_NUMBER, hook)
-    try:
-        return (int(parts[0]), parts[1])
-    except ValueError:
-        return (DEFAULT_SEQUENCE_NUMBER, hook)
-
-
 class HookDispatcher(CommandHook):
     """Runs custom playbooks before and after a command"""
 
@@ -184,59 +220,33 @@ class HookDispatcher(CommandHook):
         pass
 
     def _find_hooks(self, env_paths, target):
-        name = self.name
-        # Map from hook directory path to a set of hook basenames in that path.
-        hooks: {str: {str}} = {}
-        for env_path in env_paths:
-            path = os.path.join(env_path, "hooks", name, "%s.d" % target)
-            self.logger.debug("Discovering hooks in: %s" % path)
-            if not os.path.exists(path):
-                continue
-
-            hook_paths = glob.glob(os.path.join(path, "*.yml"))
-            hook_basenames = {os.path.basename(hook) for hook in hook_paths}
-
-            # Override any earlier hooks with the same basename.
-            for other_hooks in hooks.values():
-                other_hooks -= hook_basenames
-
-            hooks[path] = hook_basenames
-
-        # Return a flat list of hook paths (including directory).
-        hooks = [os.path.join(path, basename)
-                 for path, basenames in hooks.items()
-                 for basename in basenames]
-        self.logger.debug("Discovered the following hooks: %s" % hooks)
-        return hooks
+        index = hooks.HookIndex.load(env_paths)
+        found = index.get(self.name, target)
+        self.logger.debug("Discovered the following hooks: %s" %
+                          [hook.path for hook in found])
+        return found
 
     def hooks(self, env_paths, target, filter):
         hooks_out = []
         if filter == "all":
             self.logger.debug("Skipping all hooks")
             return hooks_out
-        hooks_in = self._find_hooks(env_paths, target)
-        # Hooks can be prefixed with a sequence number to adjust running order,
-        # e.g 10-my-custom-playbook.yml. Sort by sequence number.
-        hooks_in = sorted(hooks_in, key=_split_hook_sequence_number)
-        for hook in hooks_in:
-            # Resolve symlinks so that we can reference roles.
-            hook = os.path.realpath(hook)
-            if filter and re.search(filter, hook):
-                self.logger.debug("Skipping hook: %s", hook)
+        # Hooks are ordered by sequence number and have their symlinks
+        # resolved by the index.
+        for hook in self._find_hooks(env_paths, target):
+            if filter and re.search(filter, hook.realpath):
+                self.logger.debug("Skipping hook: %s", hook.realpath)
             else:
-                hooks_out.append(hook)
+                hooks_out.append(hook.realpath)
         return hooks_out
 
     def run_hooks(self, parsed_args, target):
-        env_paths = [parsed_args.config_path]
-        environment_finder = utils.EnvironmentFinder(
-            parsed_args.config_path, parsed_args.environment)
-        env_paths.extend(environment_finder.ordered_paths())
-
-        hooks = self.hooks(env_paths, target, parsed_args.skip_hooks)
-        if hooks:
-            self.logger.debug("Running hooks: %s" % hooks)
-            self.command.run_kayobe_playbooks(parsed_args, hooks)
+        env_paths = hooks.get_env_paths(parsed_args.config_path,
+                                        parsed_args.environment)
+        hook_paths = self.hooks(env_paths, target, parsed_args.skip_hooks)
+        if hook_paths:
+            self.logger.debug("Running hooks: %s" % hook_paths)
+            self.command.run_kayobe_playbooks(parsed_args, hook_paths)
 
     def _preflight_checks(self, parsed_args):
         # NOTE(mgoddard): Currently all commands use KayobeAnsibleMixin, so
@@ -303,6 +313,7 @@ class ControlHostBootstrap(KayobeAnsibleMixin, KollaAnsibleMixin, VaultMixin,
             self.app.LOG.debug("Skipping dependency and Galaxy installation "
                                "due to --no-install")
         else:
+            self.flush_kayobe_playbooks()
             ansible.install_galaxy_roles(parsed_args)
             ansible.install_galaxy_collections(parsed_args)
 
@@ -318,6 +329,7 @@ class ControlHostBootstrap(KayobeAnsibleMixin, KollaAnsibleMixin, VaultMixin,
         playbooks = _build_playbook_list("bootstrap")
         self.run_kayobe_playbooks(parsed_args, playbooks, ignore_limit=True)
 
+        self.flush_kayobe_playbooks()
         passwords_exist = ansible.passwords_yml_exists(parsed_args)
         if passwords_exist:
             # Install and generate configuration - necessary for post-deploy.
@@ -386,7 +398,7 @@ class ControlHostConfigure(KayobeAnsibleMixin, VaultMixin, Command):
         # Allocate IP addresses.
         playbooks = _build_playbook_list("ip-allocation")
         self.run_kayobe_playbooks(parsed_args, playbooks,
-                                  limit="ansible-control")
+                                  limit="ansible-control", barrier=True)
 
         # Kayobe playbooks.
         kwargs = {}
@@ -456,6 +468,7 @@ class ControlHostUpgrade(KayobeAnsibleMixin, VaultMixin, Command):
 
     def take_action(self, parsed_args):
         self.app.LOG.debug("Upgrading Kayobe Ansible control host")
+        self.flush_kayobe_playbooks()
         # Remove roles that are no longer used. Do this before installing new
         # ones, just in case a custom role dependency includes any.
         ansible.prune_galaxy_roles(parsed_args)
@@ -540,15 +553,63 @@ class ConfigurationDump(KayobeAnsibleMixin, VaultMixin, Command):
 
     def take_action(self, parsed_args):
         self.app.LOG.debug("Dumping Ansible configuration")
-        hostvars = self.run_kayobe_config_dump(
-            parsed_args, host=parsed_args.host, hosts=parsed_args.hosts,
+        if parsed_args.host:
+            hostvars = self.run_kayobe_config_dump(
+                parsed_args, host=parsed_args.host,
+                facts=parsed_args.dump_facts, var_name=parsed_args.var_name)
+            self._dump_json(hostvars)
+            return
+        results = self.iter_kayobe_config_dump(
+            parsed_args, hosts=parsed_args.hosts,
             facts=parsed_args.dump_facts, var_name=parsed_args.var_name)
+        # Write the variables of each host as they are read, rather than
+        # holding those of all hosts in memory. The output is the same as
+        # dumping a dict of all hosts.
+        first = True
+        for host, hostvars in results:
+            sys.stdout.write("{\n    " if first else ",\n    ")
+            first = False
+            json.dump(host, sys.stdout)
+            sys.stdout.write(": ")
+            self._dump_json(hostvars, indent_level=1)
+        sys.stdout.write("{}" if first else "\n}")
+
+    def _dump_json(self, value, indent_level=0):
         try:
-            json.dump(hostvars, sys.stdout, sort_keys=True, indent=4)
+            output = json.dumps(value, sort_keys=True, indent=4)
         except TypeError as e:
             self.app.LOG.error("Failed to JSON encode configuration: %s",
                                repr(e))
             sys.exit(1)
+        # Newlines within JSON strings are escaped, so this only affects
+        # indentation.
+        sys.stdout.write(output.replace("\n", "\n" + "    " * indent_level))
+
+
+class Daemon(KayobeAnsibleMixin, VaultMixin, Command):
+    """Run a daemon to accelerate execution of Kayobe Ansible playbooks.
+
+    The daemon imports Ansible once and then runs Kayobe playbooks on behalf of
+    other Kayobe commands using the same configuration and environment. It
+    runs in the foreground until interrupted. Commands fall back to running
+    ansible-playbook directly when the daemon is not running, or when their
+    Ansible environment does not match that of the daemon.
+    """
+
+    def get_parser(self, prog_name):
+        parser = super(Daemon, self).get_parser(prog_name)
+        group = parser.add_argument_group("Daemon")
+        group.add_argument("--socket",
+                           help="path to the daemon's Unix socket. Default "
+                                "is derived from the configuration path and "
+                                "environment, or may be set via $%s" %
+                                daemon.SOCKET_ENV)
+        return parser
+
+    def take_action(self, parsed_args):
+        self.app.LOG.debug("Starting Kayobe daemon")
+        self.flush_kayobe_playbooks()
+        ansible.start_daemon(parsed_args, socket_path=parsed_args.socket)
 
 
 class PlaybookRun(KayobeAnsibleMixin, VaultMixin, Command):
@@ -681,7 +742,7 @@ class SeedHypervisorHostConfigure(KayobeAnsibleMixin, VaultMixin, Command):
         # Allocate IP addresses.
         playbooks = _build_playbook_list("ip-allocation")
         self.run_kayobe_playbooks(parsed_args, playbooks,
-                                  limit="seed-hypervisor")
+                                  limit="seed-hypervisor", barrier=True)
 
         kwargs = {}
         if parsed_args.wipe_disks:
@@ -769,7 +830,7 @@ class SeedVMProvision(KollaAnsibleMixin, KayobeAnsibleMixin, VaultMixin,
         self.app.LOG.debug("Provisioning seed VM")
         self.run_kayobe_playbook(parsed_args,
                                  _get_playbook_path("ip-allocation"),
-                                 limit="seed")
+                                 limit="seed", barrier=True)
         self.run_kayobe_playbook(parsed_args,
                                  _get_playbook_path("seed-vm-provision"))
         # Now populate the Kolla Ansible inventory.
@@ -832,7 +893,8 @@ class SeedHostConfigure(KayobeAnsibleMixin, VaultMixin, Command):
 
         # Allocate IP addresses.
         playbooks = _build_playbook_list("ip-allocation")
-        self.run_kayobe_playbooks(parsed_args, playbooks, limit="seed")
+        self.run_kayobe_playbooks(parsed_args, playbooks, limit="seed",
+                                  barrier=True)
 
         # Run kayobe playbooks.
         extra_vars = {"kayobe_action": "deploy"}
@@ -1097,7 +1159,7 @@ class InfraVMProvision(KayobeAnsibleMixin, VaultMixin, Command):
         self.app.LOG.debug("Provisioning infra VMs")
         self.run_kayobe_playbook(parsed_args,
                                  _get_playbook_path("ip-allocation"),
-                                 limit="infra-vms")
+                                 limit="infra-vms", barrier=True)
 
         limit_arg = utils.intersect_limits(parsed_args.limit, "infra-vms")
         # We want the limit to affect one play only. To do this we use a
@@ -1169,7 +1231,8 @@ class InfraVMHostConfigure(KayobeAnsibleMixin, VaultMixin, Command):
 
         # Allocate IP addresses.
         playbooks = _build_playbook_list("ip-allocation")
-        self.run_kayobe_playbooks(parsed_args, playbooks, limit="infra-vms")
+        self.run_kayobe_playbooks(parsed_args, playbooks, limit="infra-vms",
+                                  barrier=True)
 
         # Kayobe playbooks.
         kwargs = {}
@@ -1227,6 +1290,49 @@ class InfraVMHostCommandRun(KayobeAnsibleMixin, VaultMixin, Command):
                                   extra_vars=extra_vars)
 
 
+class HooksList(KayobeAnsibleMixin, VaultMixin, Lister):
+    """List custom playbook hooks.
+
+    Lists the hooks that would be run before and after each command, in the
+    order in which they would be run, without running anything. Hooks matching
+    --skip-hooks are marked as skipped.
+    """
+
+    def get_parser(self, prog_name):
+        parser = super(HooksList, self).get_parser(prog_name)
+        group = parser.add_argument_group("Hooks")
+        group.add_argument("--command", dest="hook_command",
+                           help="name of a command to list hooks for, e.g. "
+                                "'overcloud host configure'")
+        return parser
+
+    def take_action(self, parsed_args):
+        self.app.LOG.debug("Listing hooks")
+        env_paths = hooks.get_env_paths(parsed_args.config_path,
+                                        parsed_args.environment)
+        index = hooks.HookIndex.load(env_paths)
+        if parsed_args.hook_command:
+            command_names = ["-".join(parsed_args.hook_command.split())]
+        else:
+            command_names = index.commands()
+        skip_hooks = parsed_args.skip_hooks
+        columns = ("Command", "Target", "Sequence", "Path", "Resolved Path",
+                   "Skipped")
+        data = []
+        for command_name in command_names:
+            for target in hooks.TARGETS:
+                for hook in index.get(command_name, target):
+                    if hook.sequence == hooks.DEFAULT_SEQUENCE_NUMBER:
+                        sequence = None
+                    else:
+                        sequence = hook.sequence
+                    skipped = (skip_hooks == "all" or bool(
+                        skip_hooks and re.search(skip_hooks, hook.realpath)))
+                    data.append((command_name, target, sequence, hook.path,
+                                 hook.realpath, skipped))
+        return columns, data
+
+
 class Inventory(VaultMixin, Command):
     """Wrapper for ansible-inventory showing Kayobe inventory."""
 
@@ -1324,11 +1430,12 @@ class OvercloudInventoryDiscover(KayobeAnsibleMixin, VaultMixin, Command):
         # are used to populate other inventories.
         self.run_kayobe_playbook(parsed_args,
                                  _get_playbook_path(
-                                     "overcloud-inventory-discover"))
+                                     "overcloud-inventory-discover"),
+                                 barrier=True)
         # If necessary, allocate IP addresses for the discovered hosts.
         self.run_kayobe_playbook(parsed_args,
                                  _get_playbook_path("ip-allocation"),
-                                 limit="overcloud")
+                                 limit="overcloud", barrier=True)
         # Now populate the Kolla Ansible inventory.
         self.generate_kolla_ansible_config(parsed_args, service_config=False)
 
@@ -1489,7 +1596,8 @@ class OvercloudHostConfigure(KayobeAnsibleMixin, VaultMixin, Command):
 
         # Allocate IP addresses.
         playbooks = _build_playbook_list("ip-allocation")
-        self.run_kayobe_playbooks(parsed_args, playbooks, limit="overcloud")
+        self.run_kayobe_playbooks(parsed_args, playbooks, limit="overcloud",
+                                  barrier=True)
 
         # Kayobe playbooks.
         kwargs = {}
@@ -1883,6 +1991,7 @@ class OvercloudServicePasswordsView(KayobeAnsibleMixin, VaultMixin, Command):
 
     def take_action(self, parsed_args):
         self.app.LOG.debug("Displaying Passwords")
+        self.flush_kayobe_playbooks()
         vault.view_passwords(parsed_args)
 
 
@@ -2433,6 +2542,7 @@ class EnvironmentCreate(KayobeAnsibleMixin, VaultMixin, Command):
                 sys.exit(1)
 
         try:
+            self.flush_kayobe_playbooks()
             environment.create_kayobe_environment(parsed_args)
         except Exception as e:
             self.app.LOG.error("Failed to create environment %s: %s",
@@ -0,0 +1,394 @@
+# Copyright (c) 2025 StackHPC Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Persistent daemon for running Kayobe Ansible playbooks.
+
+The daemon imports Ansible once, and then forks a worker for each playbook
+run requested by the Kayobe CLI over a Unix socket. The CLI passes its
+standard file descriptors to the worker, so output is identical to running
+ansible-playbook as a subprocess. If the daemon is not running, or it cannot
+service a request, the CLI falls back to running a subprocess.
+"""
+
+import hashlib
+import importlib
+import json
+import logging
+import os
+import signal
+import socket
+import struct
+import sys
+import tempfile
+
+from kayobe import hostvars
+
+LOG = logging.getLogger(__name__)
+
+SOCKET_ENV = "KAYOBE_DAEMON_SOCKET"
+
+# Maximum size of a single message read from the socket.
+_RECV_SIZE = 65536
+
+# Modules imported by the daemon before accepting requests. These dominate
+# the start up time of ansible-playbook.
+_PRELOAD_MODULES = [
+    "ansible.cli.playbook",
+    "ansible.executor.playbook_executor",
+    "ansible.executor.task_queue_manager",
+    "ansible.inventory.manager",
+    "ansible.parsing.dataloader",
+    "ansible.playbook",
+    "ansible.plugins.callback.default",
+    "ansible.plugins.connection.local",
+    "ansible.plugins.connection.ssh",
+    "ansible.plugins.inventory.ini",
+    "ansible.plugins.inventory.yaml",
+    "ansible.plugins.strategy.linear",
+    "ansible.template",
+    "ansible.vars.hostvars",
+    "ansible.vars.manager",
+    "netaddr",
+]
+
+
+class DaemonError(Exception):
+    """Error communicating with the Kayobe daemon."""
+
+
+def get_socket_path(config_path, environment=None):
+    """Return the path to the daemon socket for a Kayobe configuration.
+
+    The path may be overridden via the KAYOBE_DAEMON_SOCKET environment
+    variable. Otherwise it is derived from the configuration path and
+    environment, so that each has its own daemon.
+    """
+    socket_path = os.environ.get(SOCKET_ENV)
+    if socket_path:
+        return socket_path
+    key = "%s:%s" % (os.path.realpath(config_path), environment or "")
+    digest = hashlib.sha256(key.encode()).hexdigest()[:16]
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return os.path.join(runtime_dir, "kayobe-%s.sock" % digest)
+
+
+def _ansible_env(env):
+    """Return the Ansible configuration variables in an environment."""
+    return {k: v for k, v in env.items() if k.startswith("ANSIBLE_")}
+
+
+def _config_mtime(env):
+    """Return the modification time of the Ansible configuration file."""
+    path = env.get("ANSIBLE_CONFIG")
+    if not path:
+        return None
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def _send(sock, message):
+    sock.sendall(json.dumps(message).encode() + b"\n")
+
+
+def _recv(sock, buf):
+    """Receive a newline-delimited JSON message.
+
+    :param sock: a connected socket.
+    :param buf: a bytearray holding data received but not yet consumed.
+    :returns: the decoded message, or None if the peer closed the socket.
+    """
+    while b"\n" not in buf:
+        data = sock.recv(_RECV_SIZE)
+        if not data:
+            return None
+        buf.extend(data)
+    line, _, rest = bytes(buf).partition(b"\n")
+    buf[:] = rest
+    return json.loads(line)
+
+
+def run_playbook(socket_path, cmd, env, stdin=None, stdout=None,
+                 stderr=None):
+    """Run an ansible-playbook command via the daemon.
+
+    :param socket_path: path to the daemon socket.
+    :param cmd: ansible-playbook command line as a list.
+    :param env: environment for the command.
+    :param stdin: file descriptor for standard input. Default is 0.
+    :param stdout: file descriptor for standard output. Default is 1.
+    :param stderr: file descriptor for standard error. Default is 2.
+    :returns: the return code of the command, or None if the daemon is not
+        available or declined the request, in which case the caller should
+        run the command itself.
+    :raises: DaemonError if the worker exits without reporting a return code.
+    """
+    try:
+        st = os.stat(socket_path)
+    except OSError:
+        return None
+    if st.st_uid != os.getuid():
+        LOG.warning("Ignoring Kayobe daemon socket %s not owned by the "
+                    "current user", socket_path)
+        return None
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        try:
+            sock.connect(socket_path)
+        except OSError as e:
+            LOG.debug("Failed to connect to Kayobe daemon at %s: %s",
+                      socket_path, e)
+            return None
+        fds = [0 if stdin is None else stdin,
+               1 if stdout is None else stdout,
+               2 if stderr is None else stderr]
+        request = {"cmd": list(cmd), "env": dict(env), "cwd": os.getcwd()}
+        data = json.dumps(request).encode() + b"\n"
+        socket.send_fds(sock, [data], fds)
+
+        buf = bytearray()
+        reply = _recv(sock, buf)
+        if reply is None:
+            LOG.debug("Kayobe daemon closed the connection")
+            return None
+        if reply["status"] == "rejected":
+            LOG.debug("Kayobe daemon declined request: %s", reply["reason"])
+            return None
+        pid = reply["pid"]
+        LOG.debug("Running command via Kayobe daemon worker %d", pid)
+
+        # Ctrl-C is delivered to the CLI, which is in the foreground process
+        # group. Forward it to the worker so that Ansible can handle it.
+        def forward(signum, frame):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+        handlers = {s: signal.signal(s, forward)
+                    for s in (signal.SIGINT, signal.SIGTERM)}
+        try:
+            reply = _recv(sock, buf)
+        finally:
+            for s, handler in handlers.items():
+                signal.signal(s, handler)
+        if reply is None:
+            raise DaemonError("Kayobe daemon worker %d exited unexpectedly"
+                              % pid)
+        return reply["returncode"]
+    finally:
+        sock.close()
+
+
+class PlaybookDaemon(object):
+    """Serve ansible-playbook requests from a warm Python interpreter."""
+
+    def __init__(self, socket_path, env):
+        self.socket_path = socket_path
+        self.env = env
+        self.ansible_env = _ansible_env(env)
+        self.config_mtime = None
+        self.sock = None
+
+    def prepare(self):
+        """Import Ansible.
+
+        Ansible reads its configuration when first imported, so the daemon
+        must be started with the environment used to run playbooks.
+        """
+        self.config_mtime = _config_mtime(self.env)
+        for module in _PRELOAD_MODULES:
+            importlib.import_module(module)
+
+    def listen(self):
+        """Bind the daemon socket."""
+        try:
+            os.unlink(self.socket_path)
+        except FileNotFoundError:
+            pass
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o177)
+        try:
+            self.sock.bind(self.socket_path)
+        finally:
+            os.umask(old_umask)
+        self.sock.listen()
+
+    def serve_forever(self):
+        """Accept and service requests until interrupted."""
+        signal.signal(signal.SIGCHLD, self._reap)
+        try:
+            while True:
+                conn, _ = self.sock.accept()
+                try:
+                    self.handle(conn)
+                except Exception:
+                    LOG.exception("Failed to handle Kayobe daemon request")
+                finally:
+                    conn.close()
+        finally:
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+            self.close()
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+            try:
+                os.unlink(self.socket_path)
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def _reap(signum, frame):
+        while True:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+
+    def check_request(self, request):
+        """Return a reason why a request cannot be serviced, or None."""
+        if _ansible_env(request["env"]) != self.ansible_env:
+            return "Ansible environment differs from the daemon"
+        if _config_mtime(request["env"]) != self.config_mtime:
+            return "Ansible configuration file has changed"
+        if (os.path.basename(request["cmd"][0]) not in
+                ("ansible-playbook", hostvars.COMMAND)):
+            return "Unsupported command %s" % request["cmd"][0]
+        return None
+
+    def handle(self, conn):
+        """Handle a single request on a connected socket."""
+        creds = conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED,
+                                struct.calcsize("3i"))
+        _, uid, _ = struct.unpack("3i", creds)
+        if uid != os.getuid():
+            LOG.warning("Rejecting Kayobe daemon connection from uid %d", uid)
+            return
+
+        data, fds, _, _ = socket.recv_fds(conn, _RECV_SIZE, 3)
+        try:
+            buf = bytearray(data)
+            request = _recv(conn, buf)
+            if request is None:
+                return
+            if len(fds) != 3:
+                _send(conn, {"status": "rejected",
+                             "reason": "Expected 3 file descriptors"})
+                return
+            reason = self.check_request(request)
+            if reason:
+                _send(conn, {"status": "rejected", "reason": reason})
+                return
+            pid = os.fork()
+            if pid == 0:
+                self._run_worker(conn, request, fds)
+            LOG.info("Started worker %d for %s", pid,
+                     " ".join(request["cmd"]))
+        finally:
+            for fd in fds:
+                os.close(fd)
+
+    def _run_worker(self, conn, request, fds):
+        """Run a request in a forked worker process. Does not return."""
+        returncode = 1
+        try:
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+            self.sock.close()
+            for target, fd in enumerate(fds):
+                os.dup2(fd, target)
+            os.chdir(request["cwd"])
+            os.environ.clear()
+            os.environ.update(request["env"])
+            _send(conn, {"status": "started", "pid": os.getpid()})
+            returncode = execute(request["cmd"])
+        except BaseException:
+            LOG.exception("Kayobe daemon worker failed")
+        finally:
+            try:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                _send(conn, {"status": "finished", "returncode": returncode})
+            finally:
+                os._exit(0)
+
+
+def execute(cmd):
+    """Execute an ansible-playbook command line in this process.
+
+    :param cmd: ansible-playbook command line as a list. If the command is
+        kayobe-hostvars, host variables are evaluated instead of running the
+        playbook.
+    :returns: the return code of the command.
+    """
+    if os.path.basename(cmd[0]) == hostvars.COMMAND:
+        return hostvars.execute(cmd)
+
+    from ansible import cli
+    from ansible.cli.playbook import PlaybookCLI
+    import ansible.utils.color
+    from ansible.utils.display import Display
+
+    # Standard output may now refer to a different file. Reevaluate
+    # properties of the terminal determined when Ansible was imported.
+    sys.stdout.reconfigure(line_buffering=os.isatty(1))
+    importlib.reload(ansible.utils.color)
+    Display()._set_column_width()
+    try:
+        cli.check_blocking_io()
+        PlaybookCLI.cli_executor(cmd)
+    except SystemExit as e:
+        code = e.code
+    else:
+        code = 0
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code
+    # Mimic the interpreter's handling of a non-integer exit code.
+    print(code, file=sys.stderr)
+    return 1
+
+
+def start(socket_path, env):
+    """Replace the current process with a daemon.
+
+    A new interpreter is executed, since Ansible may already have been
+    imported with a different environment in this process.
+    """
+    argv = [sys.executable, "-m", "kayobe.daemon", socket_path]
+    os.execve(sys.executable, argv, env)
+
+
+def main(argv=sys.argv[1:]):
+    logging.basicConfig(level=logging.INFO,
+                        format="[%(levelname)s]: %(message)s")
+    socket_path = argv[0]
+    daemon = PlaybookDaemon(socket_path, dict(os.environ))
+    daemon.prepare()
+    daemon.listen()
+    LOG.info("Kayobe daemon listening on %s", socket_path)
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    sys.exit(main())
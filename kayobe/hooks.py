@@ -0,0 +1,232 @@
+# Copyright (c) 2026 StackHPC Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Discovery of custom playbook hooks.
+
+Hooks are playbooks in hooks/<command>/<target>.d/*.yml in the Kayobe
+configuration and each of its environments. The hooks of all commands are
+indexed in a single scan of these directories. The index is cached in memory
+and in the Kayobe cache directory, and is rebuilt when the modification time
+of any of the scanned directories changes.
+"""
+
+import collections
+import hashlib
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from kayobe import utils
+
+
+LOG = logging.getLogger(__name__)
+
+# Hook targets, in the order in which they are run.
+TARGETS = ("pre", "post")
+
+# This is set to an arbitrary large number to simplify the sorting logic
+DEFAULT_SEQUENCE_NUMBER = sys.maxsize
+
+# Directories modified within this many seconds of a scan may be modified
+# again without a change to their modification time, so are not cached.
+_RACY_INTERVAL_NS = 2 * 10 ** 9
+
+# A discovered hook. sequence is the sequence number prefix of the hook, name
+# is the remainder of its file name, path is its path within the
+# configuration, and realpath is its path with symlinks resolved.
+Hook = collections.namedtuple("Hook", ["sequence", "name", "path", "realpath"])
+
+
+def split_sequence_number(hook):
+    """Split a hook file name into its sequence number and remainder.
+
+    Hooks can be prefixed with a sequence number to adjust running order,
+    e.g 10-my-custom-playbook.yml. Hooks without a sequence number run last.
+    """
+    hook = os.path.basename(hook)
+    parts = hook.split("-", 1)
+    if len(parts) < 2:
+        return (DEFAULT_SEQUENCE_NUMBER, hook)
+    try:
+        return (int(parts[0]), parts[1])
+    except ValueError:
+        return (DEFAULT_SEQUENCE_NUMBER, hook)
+
+
+def get_env_paths(config_path, environment):
+    """Return a list of the paths searched for hooks, in override order."""
+    env_paths = [config_path]
+    environment_finder = utils.EnvironmentFinder(config_path, environment)
+    env_paths.extend(environment_finder.ordered_paths())
+    return env_paths
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _listdir(path):
+    try:
+        return os.listdir(path)
+    except OSError:
+        return []
+
+
+class HookIndex(object):
+    """Index of the hooks of all commands in a set of environment paths."""
+
+    # Indices built in this process, keyed by a tuple of environment paths.
+    _cache = {}
+
+    def __init__(self, env_paths, mtimes, hooks):
+        self.env_paths = list(env_paths)
+        # Map from each scanned directory to its modification time, or None
+        # if it did not exist.
+        self._mtimes = mtimes
+        # Map from command name to target to an ordered list of Hooks.
+        self._hooks = hooks
+
+    @classmethod
+    def build(cls, env_paths):
+        """Build an index by scanning the hook directories."""
+        mtimes = {}
+        # Map from command name to target to a dict mapping hook basenames to
+        # their paths. Hooks in later environments override earlier hooks
+        # with the same basename.
+        found = {}
+        for env_path in env_paths:
+            hooks_path = os.path.join(env_path, "hooks")
+            mtimes[hooks_path] = _mtime(hooks_path)
+            for command in sorted(_listdir(hooks_path)):
+                command_path = os.path.join(hooks_path, command)
+                if not os.path.isdir(command_path):
+                    continue
+                mtimes[command_path] = _mtime(command_path)
+                for target in TARGETS:
+                    path = os.path.join(command_path, "%s.d" % target)
+                    mtimes[path] = _mtime(path)
+                    for basename in _listdir(path):
+                        # Match the behaviour of glob, which ignores hidden
+                        # files.
+                        if (basename.startswith(".") or
+                                not basename.endswith(".yml")):
+                            continue
+                        found.setdefault(command, {}).setdefault(
+                            target, {})[basename] = os.path.join(path,
+                                                                 basename)
+        hooks = {}
+        for command, targets in found.items():
+            for target, paths in targets.items():
+                ordered = sorted(paths.items(),
+                                 key=lambda item: split_sequence_number(
+                                     item[0]))
+                hooks.setdefault(command, {})[target] = [
+                    # Resolve symlinks so that we can reference roles.
+                    Hook(*split_sequence_number(basename), path,
+                         os.path.realpath(path))
+                    for basename, path in ordered
+                ]
+        return cls(env_paths, mtimes, hooks)
+
+    @classmethod
+    def load(cls, env_paths):
+        """Return an up to date index for a set of environment paths.
+
+        Indices are reused from memory or the cache file if none of the
+        scanned directories has been modified, otherwise they are rebuilt.
+        """
+        key = tuple(env_paths)
+        index = cls._cache.get(key)
+        if index is None or not index.is_fresh():
+            index = cls._read_cache(env_paths)
+        if index is None or not index.is_fresh():
+            LOG.debug("Building hook index for %s", env_paths)
+            index = cls.build(env_paths)
+            if index.is_cacheable():
+                index._write_cache()
+                cls._cache[key] = index
+            else:
+                cls._cache.pop(key, None)
+        else:
+            cls._cache[key] = index
+        return index
+
+    @classmethod
+    def clear(cls):
+        """Forget all indices built in this process."""
+        cls._cache.clear()
+
+    def is_fresh(self):
+        """Return whether none of the scanned directories has changed."""
+        return all(_mtime(path) == mtime
+                   for path, mtime in self._mtimes.items())
+
+    def is_cacheable(self):
+        now = time.time_ns()
+        return all(mtime is None or now - mtime > _RACY_INTERVAL_NS
+                   for mtime in self._mtimes.values())
+
+    def commands(self):
+        """Return a sorted list of the names of commands with hooks."""
+        return sorted(self._hooks)
+
+    def get(self, command, target):
+        """Return an ordered list of the Hooks of a command and target.
+
+        :param command: name of the command, with words separated by dashes,
+            e.g. overcloud-host-configure.
+        :param target: one of TARGETS.
+        """
+        return list(self._hooks.get(command, {}).get(target, []))
+
+    @staticmethod
+    def _cache_path(env_paths):
+        key = json.dumps([os.path.realpath(path) for path in env_paths])
+        digest = hashlib.sha256(key.encode()).hexdigest()[:16]
+        return utils.get_cache_path("hooks", "%s.json" % digest)
+
+    @classmethod
+    def _read_cache(cls, env_paths):
+        try:
+            with open(cls._cache_path(env_paths)) as f:
+                entry = json.load(f)
+            if entry["env_paths"] != list(env_paths):
+                return None
+            hooks = {
+                command: {target: [Hook(*hook) for hook in hooks]
+                          for target, hooks in targets.items()}
+                for command, targets in entry["hooks"].items()
+            }
+            return cls(env_paths, entry["mtimes"], hooks)
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _write_cache(self):
+        path = self._cache_path(self.env_paths)
+        entry = {"env_paths": self.env_paths, "mtimes": self._mtimes,
+                 "hooks": self._hooks}
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, "w") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            LOG.debug("Failed to write hook index cache %s: %s", path, e)
@@ -0,0 +1,93 @@
+# Copyright (c) 2026 StackHPC Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Evaluate Kayobe host variables without running a playbook.
+
+This accepts the ansible-playbook command line used to run dump-config.yml,
+and writes the same files as that playbook. Ansible's inventory and variable
+managers are built directly, and only the requested variables of the
+requested hosts are templated, avoiding the overhead of the playbook executor,
+worker processes and connection plugins.
+
+Ansible reads its configuration when first imported, so this must be run in a
+process with the environment used to run playbooks: either a Kayobe daemon
+worker, or a new interpreter via python -m kayobe.hostvars.
+"""
+
+import os
+import sys
+
+# Name of the command used to request evaluation of host variables from the
+# Kayobe daemon.
+COMMAND = "kayobe-hostvars"
+
+
+def dump(cli):
+    """Dump host variables given a parsed ansible-playbook command line."""
+    from ansible import context
+    from ansible.plugins.loader import add_all_plugin_dirs
+    from ansible.vars.hostvars import HostVars
+
+    from kayobe.plugins.action import dump_hostvars
+
+    # Mimic the plugin and variable search paths of the playbook.
+    playbook_dir = os.path.dirname(os.path.abspath(context.CLIARGS['args'][0]))
+    add_all_plugin_dirs(playbook_dir)
+    loader, inventory, variable_manager = cli._play_prereqs()
+    loader.set_basedir(playbook_dir)
+
+    extra_vars = variable_manager.extra_vars
+    dump_path = extra_vars["dump_path"]
+    var_name = extra_vars.get("dump_var_name")
+    inventory.subset(context.CLIARGS['subset'])
+    hosts = inventory.get_hosts(extra_vars.get("dump_hosts", "all"))
+    hostvars = HostVars(inventory, variable_manager, loader)
+    os.makedirs(dump_path, exist_ok=True)
+    for host in hosts:
+        dest = os.path.join(dump_path, "%s.json" % host.name)
+        dump_hostvars.dump(hostvars, host.name, dest, var_name)
+
+
+def execute(cmd):
+    """Evaluate host variables in this process.
+
+    :param cmd: ansible-playbook command line for dump-config.yml as a list.
+        The first item is ignored.
+    :returns: the return code of the command.
+    """
+    from ansible import cli
+    from ansible.cli.playbook import PlaybookCLI
+    from ansible import errors as ansible_errors
+    from ansible.utils.display import Display
+
+    try:
+        cli.check_blocking_io()
+        playbook_cli = PlaybookCLI(["ansible-playbook"] + list(cmd[1:]))
+        # Parse arguments and initialise plugin loaders.
+        cli.CLI.run(playbook_cli)
+        dump(playbook_cli)
+    except ansible_errors.AnsibleError as e:
+        Display().error(e)
+        return 1
+    except SystemExit as e:
+        return e.code if isinstance(e.code, int) else 1
+    return 0
+
+
+def main(argv=sys.argv[1:]):
+    return execute([COMMAND] + argv)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
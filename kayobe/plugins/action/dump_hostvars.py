@@ -0,0 +1,121 @@
+# Copyright (c) 2026 StackHPC Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import collections.abc
+import datetime
+import json
+
+from ansible import errors as ansible_errors
+from ansible.parsing.vault import VaultHelper
+from ansible.plugins import action
+
+
+def sanitise(value):
+    """Return a copy of a variable with vault encrypted values masked."""
+    # Both encrypted values and decrypted values tagged with their ciphertext
+    # are masked.
+    if VaultHelper.get_ciphertext(value, with_tags=False) is not None:
+        return "******"
+    if isinstance(value, str):
+        return value
+    # Recursively sanitise dicts and lists.
+    if isinstance(value, collections.abc.Mapping):
+        return {k: sanitise(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [sanitise(v) for v in value]
+    return value
+
+
+def _json_default(value):
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    raise TypeError("Object of type %s is not JSON serializable" %
+                    type(value).__name__)
+
+
+# Marker for variables which are not defined, or which are templated to omit.
+_OMITTED = object()
+
+
+def _get(templated, raw, name):
+    """Return the sanitised value of a host variable."""
+    if name not in raw:
+        return _OMITTED
+    try:
+        return sanitise(templated[name])
+    except ansible_errors.AnsibleValueOmittedError:
+        return _OMITTED
+    except ansible_errors.AnsibleUndefinedVariable:
+        # Variables which reference undefined variables, such as facts which
+        # have not been gathered, are dumped untemplated as they were before
+        # ansible-core 2.19.
+        return sanitise(raw[name])
+
+
+def dump(hostvars, host, dest, var_name=None):
+    """Write the variables of a host to a JSON file.
+
+    :param hostvars: the hostvars variable, which templates the variables of
+        each host on access.
+    :param host: name of the host.
+    :param dest: path of the file to write.
+    :param var_name: optional name of a single variable to write.
+    """
+    templated = hostvars[host]
+    raw = hostvars.raw_get(host)
+    if var_name:
+        data = _get(templated, raw, var_name)
+        if data is _OMITTED:
+            raise ansible_errors.AnsibleActionFail(
+                "Variable %s is not defined" % var_name)
+    else:
+        data = {}
+        for name in raw:
+            value = _get(templated, raw, name)
+            if value is not _OMITTED:
+                data[name] = value
+
+    try:
+        with open(dest, 'w') as f:
+            json.dump(data, f, default=_json_default)
+    except TypeError as e:
+        raise ansible_errors.AnsibleActionFail(
+            "Failed to JSON encode variables: %s" % e)
+
+
+class ActionModule(action.ActionBase):
+    """Dump the variables of a host to a JSON file on the control host.
+
+    Variables are templated and written by the worker process running the
+    task, without executing a module. Vault encrypted values are masked. If
+    var_name is specified, only that variable is templated and written.
+    """
+
+    _requires_connection = False
+
+    def run(self, tmp=None, task_vars=None):
+        if task_vars is None:
+            task_vars = dict()
+        result = super(ActionModule, self).run(tmp, task_vars)
+        del tmp  # not used
+
+        dest = self._task.args.get('dest')
+        if not dest:
+            raise ansible_errors.AnsibleActionFail(
+                "Missing required argument: dest")
+        dump(task_vars['hostvars'], task_vars['inventory_hostname'], dest,
+             self._task.args.get('var_name'))
+        result['changed'] = True
+        result['dest'] = dest
+        return result
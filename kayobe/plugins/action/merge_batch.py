@@ -0,0 +1,197 @@
+# Copyright (c) 2026 StackHPC Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import grp
+import os
+import pwd
+import re
+import shutil
+import stat
+import tempfile
+
+from ansible import constants
+from ansible import errors as ansible_errors
+from ansible.plugins import action
+from ansible.utils.hashing import checksum as file_checksum
+from ansible.utils.hashing import checksum_s
+
+# Arguments of the copy action which may be checked against the state of an
+# existing file, without running the copy action.
+_CHECKED_ARGS = {"dest", "mode", "owner", "group"}
+
+
+def _mode_matches(mode, current):
+    """Return whether a file mode argument matches a file's mode.
+
+    :param mode: mode argument of the copy action.
+    :param current: octal string mode of the file.
+    """
+    if mode is None:
+        return True
+    if isinstance(mode, int):
+        return int(current, 8) == mode
+    if isinstance(mode, str) and re.match(r"^[0-7]{1,4}$", mode):
+        return int(current, 8) == int(mode, 8)
+    # Symbolic modes are not checked.
+    return False
+
+
+def _id_matches(name, current_name, current_id):
+    if name is None:
+        return True
+    return str(name) in (current_name, str(current_id))
+
+
+class BatchMergeActionBase(action.ActionBase):
+    """Base class for actions which merge sources into many files.
+
+    Each item in the files argument is a dict with keys sources, dest and
+    params. All files are rendered in-process, then compared with their
+    destination in a single pass, and only those which differ are
+    transferred using the copy action. Other arguments are defaults for the
+    params of each file.
+
+    Subclasses set RENDER to the function which renders a file.
+    """
+
+    TRANSFERS_FILES = True
+
+    # Function returning the content of a file, called with the action, the
+    # list of sources, a dict of merge arguments and the task variables.
+    RENDER = None
+
+    # Arguments consumed by RENDER which are not passed to the copy action.
+    MERGE_ARGS = frozenset()
+
+    def _local_stat(self, path):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return {"exists": False}
+        if not stat.S_ISREG(st.st_mode):
+            return {"exists": True, "isreg": False}
+        try:
+            pw_name = pwd.getpwuid(st.st_uid).pw_name
+        except KeyError:
+            pw_name = None
+        try:
+            gr_name = grp.getgrgid(st.st_gid).gr_name
+        except KeyError:
+            gr_name = None
+        return {
+            "exists": True,
+            "isreg": True,
+            "checksum": file_checksum(path),
+            "mode": "%04o" % stat.S_IMODE(st.st_mode),
+            "uid": st.st_uid,
+            "gid": st.st_gid,
+            "pw_name": pw_name,
+            "gr_name": gr_name,
+        }
+
+    def _stat(self, path, task_vars):
+        # Avoid executing the stat module for local files.
+        if (self._connection.transport == "local" and
+                not self._play_context.become):
+            return self._local_stat(path)
+        return self._execute_remote_stat(path, all_vars=task_vars,
+                                         follow=True)
+
+    def is_unchanged(self, content, params, task_vars):
+        """Return whether a destination file is already up to date."""
+        if set(params) - _CHECKED_ARGS:
+            return False
+        st = self._stat(params["dest"], task_vars)
+        return (st["exists"] and st.get("isreg", True) and
+                st["checksum"] == checksum_s(content) and
+                _mode_matches(params.get("mode"), st["mode"]) and
+                _id_matches(params.get("owner"), st["pw_name"], st["uid"]) and
+                _id_matches(params.get("group"), st["gr_name"], st["gid"]))
+
+    def _copy(self, src, params, task_vars):
+        new_task = self._task.copy()
+        new_task.args.clear()
+        new_task.args.update(params)
+        new_task.args['src'] = src
+        copy_action = self._shared_loader_obj.action_loader.get(
+            'copy',
+            task=new_task,
+            connection=self._connection,
+            play_context=self._play_context,
+            loader=self._loader,
+            templar=self._templar,
+            shared_loader_obj=self._shared_loader_obj)
+        return copy_action.run(task_vars=task_vars)
+
+    def run(self, tmp=None, task_vars=None):
+        if task_vars is None:
+            task_vars = dict()
+        # Bypass the run() method of single file merge actions, which may
+        # follow this class in the MRO.
+        result = action.ActionBase.run(self, tmp, task_vars)
+        del tmp  # not used
+
+        defaults = dict(self._task.args)
+        items = defaults.pop('files', None) or []
+        if not isinstance(items, list):
+            raise ansible_errors.AnsibleActionFail(
+                "Invalid argument: files must be a list")
+
+        # Render all files.
+        rendered = []
+        for item in items:
+            params = dict(defaults)
+            params.update(item.get('params') or {})
+            params['dest'] = item['dest']
+            merge_args = {key: params.pop(key) for key in list(params)
+                          if key in self.MERGE_ARGS}
+            sources = item['sources']
+            if not isinstance(sources, list):
+                sources = [sources]
+            content = self.RENDER(sources, merge_args, task_vars)
+            rendered.append((sources, params, content))
+
+        result['changed'] = False
+        result['files'] = []
+        diffs = []
+        local_tempdir = tempfile.mkdtemp(dir=constants.DEFAULT_LOCAL_TMP)
+        try:
+            for index, (sources, params, content) in enumerate(rendered):
+                file_result = {'dest': params['dest'], 'sources': sources,
+                               'changed': False}
+                result['files'].append(file_result)
+                if self.is_unchanged(content, params, task_vars):
+                    continue
+
+                result_file = os.path.join(local_tempdir, str(index))
+                with open(result_file, 'w') as f:
+                    f.write(content)
+                copy_result = self._copy(result_file, params, task_vars)
+                file_result['changed'] = bool(copy_result.get('changed'))
+                result['changed'] |= file_result['changed']
+                diff = copy_result.get('diff')
+                if isinstance(diff, list):
+                    diffs.extend(diff)
+                elif diff:
+                    diffs.append(diff)
+                if copy_result.get('failed'):
+                    result['failed'] = True
+                    result['msg'] = ("Failed to copy %s: %s" %
+                                     (params['dest'], copy_result.get('msg')))
+                    break
+        finally:
+            shutil.rmtree(local_tempdir)
+        if diffs:
+            result['diff'] = diffs
+        return result
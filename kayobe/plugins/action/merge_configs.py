@@ -153,36 +153,39 @@ class ActionModule(action.ActionBase):
 
     TRANSFERS_FILES = True
 
-    def read_config(self, source, config):
-        # Only use config if present
-        if os.access(source, os.R_OK):
-            with open(source, 'r') as f:
-                template_data = trust_as_template(f.read())
-
+    def __init__(self, *args, **kwargs):
+        super(ActionModule, self).__init__(*args, **kwargs)
+        self._templars = {}
+
+    def get_templar(self, source):
+        # Reuse a templar for sources in the same directory, since they have
+        # the same search path.
+        dirname = os.path.dirname(source)
+        if dirname not in self._templars:
             # set search path to mimic 'template' module behavior
             searchpath = [
                 self._loader._basedir,
                 os.path.join(self._loader._basedir, 'templates'),
-                os.path.dirname(source),
+                dirname,
             ]
+            self._templars[dirname] = self._templar.copy_with_new_env(
+                searchpath=searchpath)
+        return self._templars[dirname]
+
+    def read_config(self, source, config):
+        # Only use config if present
+        if os.access(source, os.R_OK):
+            with open(source, 'r') as f:
+                template_data = trust_as_template(f.read())
 
-            templar = self._templar.copy_with_new_env(searchpath=searchpath)
+            templar = self.get_templar(source)
             result = templar.template(template_data)
             fakefile = StringIO(result)
             config.parse(fakefile)
             fakefile.close()
 
-    def run(self, tmp=None, task_vars=None):
-
-        result = super(ActionModule, self).run(tmp, task_vars)
-        del tmp  # not used
-
-        sources = self._task.args.get('sources', None)
-        whitespace = self._task.args.get('whitespace', True)
-
-        if not isinstance(sources, list):
-            sources = [sources]
-
+    def merge(self, sources, whitespace=True):
+        """Return the result of merging a list of source files."""
         config = OverrideConfigParser(whitespace=whitespace)
 
         for source in sources:
@@ -194,6 +197,20 @@ class ActionModule(action.ActionBase):
         config.write(fakefile)
         full_source = fakefile.getvalue()
         fakefile.close()
+        return full_source
+
+    def run(self, tmp=None, task_vars=None):
+
+        result = super(ActionModule, self).run(tmp, task_vars)
+        del tmp  # not used
+
+        sources = self._task.args.get('sources', None)
+        whitespace = self._task.args.get('whitespace', True)
+
+        if not isinstance(sources, list):
+            sources = [sources]
+
+        full_source = self.merge(sources, whitespace)
 
         local_tempdir = tempfile.mkdtemp(dir=constants.DEFAULT_LOCAL_TMP)
 
@@ -0,0 +1,76 @@
+# Copyright (c) 2026 StackHPC Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from kayobe.plugins.action import merge_batch
+from kayobe.plugins.action import merge_configs
+
+DOCUMENTATION = '''
+---
+module: merge_configs_batch
+short_description: Merge many sets of ini-style configs
+description:
+     - Merges several sets of ini-style configs, each into one file, in a
+       single task. Files with unchanged content and attributes are not
+       transferred.
+options:
+  files:
+    description:
+      - A list of files to generate. Each item is a dict with keys
+        C(sources), a list of files to merge, C(dest), the destination file
+        name, and optionally C(params), a dict of arguments for the file
+        which override those of the task. Parameters may include
+        C(whitespace), and arguments of the copy module.
+    required: True
+    type: list
+  whitespace:
+    description:
+      - Whether whitespace characters should be used around equal signs
+    default: True
+    required: False
+    type: bool
+author: StackHPC
+'''
+
+EXAMPLES = '''
+Merge multiple sets of configs:
+
+- hosts: localhost
+  tasks:
+    - name: Merge configs
+      merge_configs_batch:
+        files:
+          - sources:
+              - "/tmp/nova_1.conf"
+              - "/tmp/nova_2.conf"
+            dest: "/etc/kolla/config/nova.conf"
+            params: {}
+          - sources:
+              - "/tmp/glance.conf"
+            dest: "/etc/kolla/config/glance.conf"
+            params:
+              whitespace: false
+        mode: "0640"
+'''
+
+
+def render(action, sources, merge_args, task_vars):
+    """Return the result of merging a list of ini-style configs."""
+    return action.merge(sources, **merge_args)
+
+
+class ActionModule(merge_batch.BatchMergeActionBase,
+                   merge_configs.ActionModule):
+
+    RENDER = render
+    MERGE_ARGS = frozenset(['whitespace'])
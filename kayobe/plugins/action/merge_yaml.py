@@ -92,25 +92,46 @@ class ActionModule(action.ActionBase):
 
     TRANSFERS_FILES = True
 
-    def read_config(self, source):
-        result = None
-        # Only use config if present
-        if source and os.access(source, os.R_OK):
-            with open(source, 'r') as f:
-                template_data = trust_as_template(f.read())
-
+    def __init__(self, *args, **kwargs):
+        super(ActionModule, self).__init__(*args, **kwargs)
+        self._templars = {}
+
+    def get_templar(self, source):
+        # Reuse a templar for sources in the same directory, since they have
+        # the same search path.
+        dirname = os.path.dirname(source)
+        if dirname not in self._templars:
             # set search path to mimic 'template' module behavior
             searchpath = [
                 self._loader._basedir,
                 os.path.join(self._loader._basedir, 'templates'),
-                os.path.dirname(source),
+                dirname,
             ]
+            self._templars[dirname] = self._templar.copy_with_new_env(
+                searchpath=searchpath)
+        return self._templars[dirname]
+
+    def read_config(self, source, variables):
+        result = None
+        # Only use config if present
+        if source and os.access(source, os.R_OK):
+            with open(source, 'r') as f:
+                template_data = trust_as_template(f.read())
 
-            templar = self._templar.copy_with_new_env(searchpath=searchpath)
+            templar = self.get_templar(source)
+            templar.available_variables = variables
             template_data = templar.template(template_data)
             result = yaml.safe_load(template_data)
         return result or {}
 
+    def merge(self, sources, variables, extend_lists=False, yaml_width=None):
+        """Return the result of merging a list of source files."""
+        output = {}
+        for source in sources:
+            Utils.update_nested_conf(
+                output, self.read_config(source, variables), extend_lists)
+        return yaml.dump(output, default_flow_style=False, width=yaml_width)
+
     def run(self, tmp=None, task_vars=None):
         if task_vars is None:
             task_vars = dict()
@@ -119,32 +140,24 @@ class ActionModule(action.ActionBase):
 
         # save template args.
         extra_vars = self._task.args.get('vars', list())
-        old_vars = self._templar.available_variables
 
         temp_vars = task_vars.copy()
         temp_vars.update(extra_vars)
-        self._templar.available_variables = temp_vars
 
-        output = {}
         sources = self._task.args.get('sources', None)
         extend_lists = self._task.args.get('extend_lists', False)
         yaml_width = self._task.args.get('yaml_width', None)
         if not isinstance(sources, list):
             sources = [sources]
-        for source in sources:
-            Utils.update_nested_conf(
-                output, self.read_config(source), extend_lists)
-
-        # restore original vars
-        self._templar.available_variables = old_vars
+        full_source = self.merge(sources, temp_vars, extend_lists,
+                                 yaml_width)
 
         local_tempdir = tempfile.mkdtemp(dir=constants.DEFAULT_LOCAL_TMP)
 
         try:
             result_file = os.path.join(local_tempdir, 'source')
             with open(result_file, 'w') as f:
-                f.write(yaml.dump(output, default_flow_style=False,
-                                  width=yaml_width))
+                f.write(full_source)
 
             new_task = self._task.copy()
             new_task.args.pop('sources', None)
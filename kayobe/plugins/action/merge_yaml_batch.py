@@ -0,0 +1,86 @@
+# Copyright (c) 2026 StackHPC Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from kayobe.plugins.action import merge_batch
+from kayobe.plugins.action import merge_yaml
+
+DOCUMENTATION = '''
+---
+module: merge_yaml_batch
+short_description: Merge many sets of yaml-style configs
+description:
+     - Merges several sets of yaml files, each into one file, in a single
+       task. Files with unchanged content and attributes are not
+       transferred.
+options:
+  files:
+    description:
+      - A list of files to generate. Each item is a dict with keys
+        C(sources), a list of files to merge, C(dest), the destination file
+        name, and optionally C(params), a dict of arguments for the file
+        which override those of the task. Parameters may include
+        C(extend_lists), C(yaml_width), C(vars), and arguments of the copy
+        module.
+    required: True
+    type: list
+  extend_lists:
+    description:
+      - Whether to combine lists with equivalent keys rather than replace
+        them. See the merge_yaml module.
+    default: False
+    required: False
+    type: bool
+  yaml_width:
+    description:
+      - The maximum width of the YAML document.
+    default: None
+    required: False
+    type: int
+author: StackHPC
+'''
+
+EXAMPLES = '''
+Merge multiple sets of yaml files:
+
+- hosts: localhost
+  tasks:
+    - name: Merge yaml files
+      merge_yaml_batch:
+        files:
+          - sources:
+              - "/tmp/default.yml"
+              - "/tmp/override.yml"
+            dest: "/tmp/out.yml"
+            params:
+              yaml_width: 131072
+        mode: "0640"
+'''
+
+
+def render(action, sources, merge_args, task_vars):
+    """Return the result of merging a list of yaml files.
+
+    Sources are templated using the task variables, updated with the vars
+    argument.
+    """
+    variables = task_vars.copy()
+    variables.update(merge_args.pop('vars', None) or {})
+    return action.merge(sources, variables, **merge_args)
+
+
+class ActionModule(merge_batch.BatchMergeActionBase,
+                   merge_yaml.ActionModule):
+
+    RENDER = render
+    MERGE_ARGS = frozenset(['extend_lists', 'yaml_width', 'vars'])
@@ -0,0 +1,102 @@
+# Copyright (c) 2026 StackHPC Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Filters for planning and reporting custom container image pulls."""
+
+from ansible import errors
+
+
+def container_image_refs(containers):
+    """Return a sorted list of the unique image references of containers.
+
+    :param containers: dict mapping container names to their configuration,
+        in the format of manage_custom_containers.
+    """
+    refs = set()
+    for name, config in (containers or {}).items():
+        if not config.get("image"):
+            raise errors.AnsibleFilterError(
+                "Container %s does not specify an image" % name)
+        refs.add("%s:%s" % (config["image"], config.get("tag") or "latest"))
+    return sorted(refs)
+
+
+def container_image_pull_plan(host_images):
+    """Summarise the images to be pulled by a set of hosts.
+
+    :param host_images: dict mapping each host to a list of image references.
+    :returns: a dict with items 'hosts', the number of hosts, 'images', a dict
+        mapping each unique image reference to the number of hosts pulling
+        it, and 'pulls', the total number of pulls.
+    """
+    images = {}
+    for refs in host_images.values():
+        for ref in set(refs or []):
+            images[ref] = images.get(ref, 0) + 1
+    return {
+        "hosts": len(host_images),
+        "images": dict(sorted(images.items())),
+        "pulls": sum(images.values()),
+    }
+
+
+def container_image_pull_report(host_results):
+    """Aggregate the results of container_image_pull on a set of hosts.
+
+    :param host_results: dict mapping each host to the registered result of
+        the container_image_pull module.
+    :returns: a dict with counts of images pulled, changed and failed, a
+        sorted list of failures, the total size of changed images in bytes,
+        the elapsed time in seconds from the first pull starting to the last
+        finishing, and the resulting throughput.
+    """
+    pulled = changed = size = 0
+    failed = []
+    starts = []
+    ends = []
+    for host, result in sorted(host_results.items()):
+        if not result or result.get("skipped"):
+            continue
+        if "start" in result:
+            starts.append(result["start"])
+            ends.append(result["end"])
+        for image in result.get("images", []):
+            pulled += 1
+            if image.get("failed"):
+                failed.append({"host": host, "image": image["image"],
+                               "msg": image.get("msg")})
+            elif image.get("changed"):
+                changed += 1
+                size += image.get("size", 0)
+        if result.get("failed") and not result.get("images"):
+            failed.append({"host": host, "image": None,
+                           "msg": result.get("msg")})
+    seconds = round(max(ends) - min(starts), 3) if starts else 0
+    return {
+        "pulled": pulled,
+        "changed": changed,
+        "failed": failed,
+        "bytes": size,
+        "seconds": seconds,
+        "images_per_second": round(pulled / seconds, 2) if seconds else 0,
+        "mb_per_second": round(size / seconds / 10 ** 6, 2) if seconds else 0,
+    }
+
+
+def get_filters():
+    return {
+        "container_image_refs": container_image_refs,
+        "container_image_pull_plan": container_image_pull_plan,
+        "container_image_pull_report": container_image_pull_report,
+    }
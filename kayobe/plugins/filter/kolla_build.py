@@ -0,0 +1,194 @@
+# Copyright (c) 2026 StackHPC Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Filters for scheduling Kolla container image builds."""
+
+import ast
+import json
+
+from ansible import errors
+
+
+def _load(value):
+    """Load the output of kolla-build as JSON or a Python literal."""
+    if not isinstance(value, str):
+        return value
+    start = value.find("{")
+    if start < 0:
+        # E.g. 'Nothing matched'.
+        return {}
+    value = value[start:]
+    try:
+        return json.loads(value)
+    except ValueError:
+        pass
+    try:
+        return ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        raise errors.AnsibleFilterError(
+            "Failed to parse kolla-build output: %s" % value)
+
+
+def _get_parents(dependencies):
+    """Return a dict mapping image names to the names of their parents.
+
+    :param dependencies: dependency tree output by kolla-build
+        --list-dependencies. Each node is either the name of an image without
+        children, or a dict mapping the name of an image to a list of nodes.
+    """
+    parents = {}
+
+    def walk(node, parent):
+        if isinstance(node, str):
+            parents[node] = parent
+            return
+        for name, children in node.items():
+            parents[name] = parent
+            for child in children or []:
+                walk(child, name)
+
+    walk(_load(dependencies), None)
+    return parents
+
+
+def _get_chains(parents):
+    """Split a dependency tree into a trunk and chains of images.
+
+    The trunk contains images with more than one child, and their ancestors.
+    Each other image belongs to exactly one chain, a list of images ordered
+    from parent to child, where only the first image has a parent in the
+    trunk. Chains may therefore be built concurrently once the trunk is built.
+
+    :returns: a tuple of a set of names of trunk images and a list of chains.
+    """
+    children = {}
+    for name, parent in parents.items():
+        children.setdefault(parent, []).append(name)
+    trunk = set()
+    for name in parents:
+        if len(children.get(name, [])) > 1:
+            while name is not None and name not in trunk:
+                trunk.add(name)
+                name = parents[name]
+    chains = []
+    for name, parent in sorted(parents.items()):
+        if name in trunk or (parent is not None and parent not in trunk):
+            continue
+        chain = [name]
+        while children.get(chain[-1]):
+            chain.append(children[chain[-1]][0])
+        chains.append(chain)
+    return trunk, chains
+
+
+def _get_ancestors(parents, names):
+    ancestors = set()
+    for name in names:
+        name = parents[name]
+        while name is not None and name not in ancestors:
+            ancestors.add(name)
+            name = parents[name]
+    return ancestors
+
+
+def kolla_build_schedule(dependencies, hosts, concurrency=1):
+    """Schedule Kolla container image builds across hosts.
+
+    Chains of images which do not share a parent outside of the trunk are
+    assigned to build slots, longest first, on the least loaded slot.
+    Consecutive slots are on different hosts, so that work is spread across
+    hosts before running concurrent builds on a single host.
+
+    :param dependencies: dependency tree output by kolla-build
+        --list-dependencies, as a string or parsed.
+    :param hosts: list of names of hosts on which to build images.
+    :param concurrency: number of concurrent builds per host.
+    :returns: a dict mapping each host to a dict with items 'shared', a list
+        of names of trunk images to build before all other images, and
+        'slots', a list of lists of names of images to build concurrently.
+    """
+    concurrency = int(concurrency)
+    if not hosts or concurrency < 1:
+        raise errors.AnsibleFilterError(
+            "At least one host and build slot is required")
+    parents = _get_parents(dependencies)
+    _, chains = _get_chains(parents)
+    slots = [(host, index) for index in range(concurrency) for host in hosts]
+    assigned = {slot: [] for slot in slots}
+    loads = {slot: 0 for slot in slots}
+    heads = {host: [] for host in hosts}
+    for chain in sorted(chains, key=lambda chain: (-len(chain), chain[0])):
+        slot = min(slots, key=lambda slot: loads[slot])
+        assigned[slot].extend(chain)
+        loads[slot] += len(chain)
+        heads[slot[0]].append(chain[0])
+
+    schedule = {}
+    for host in hosts:
+        host_slots = [assigned[(host, index)] for index in range(concurrency)]
+        host_slots = [slot for slot in host_slots if slot]
+        shared = _get_ancestors(parents, heads[host])
+        schedule[host] = {
+            # Order trunk images by depth for readability. kolla-build
+            # resolves the build order.
+            "shared": sorted(shared,
+                             key=lambda name: (len(_get_ancestors(parents,
+                                                                  [name])),
+                                               name)),
+            "slots": host_slots,
+        }
+    return schedule
+
+
+def kolla_build_report(summaries):
+    """Aggregate the results of Kolla container image builds.
+
+    :param summaries: dict mapping each host to a list of JSON summaries
+        output by kolla-build --format json, as strings or parsed.
+    :returns: a dict with items 'built', a sorted list of names of images
+        which were built, 'failed', a sorted list of dicts describing images
+        which failed to build or push, and 'hosts', a dict mapping each host to
+        counts of images built and failed.
+    """
+    built = set()
+    failed = []
+    hosts = {}
+    for host, host_summaries in sorted(summaries.items()):
+        counts = hosts[host] = {"built": 0, "failed": 0}
+        for summary in host_summaries or []:
+            summary = _load(summary or {})
+            for image in summary.get("built", []):
+                name = image["name"] if isinstance(image, dict) else image
+                built.add(name)
+                counts["built"] += 1
+            for image in summary.get("failed", []):
+                if isinstance(image, dict):
+                    name, status = image["name"], image.get("status")
+                else:
+                    name, status = image, None
+                failed.append({"name": name, "status": status, "host": host})
+                counts["failed"] += 1
+    return {
+        "built": sorted(built),
+        "failed": sorted(failed, key=lambda image: (image["name"],
+                                                    image["host"])),
+        "hosts": hosts,
+    }
+
+
+def get_filters():
+    return {
+        "kolla_build_schedule": kolla_build_schedule,
+        "kolla_build_report": kolla_build_report,
+    }
@@ -87,16 +87,17 @@ def _format_vlan_qos_map(qos_map):
     return ' '.join(f"{e['from']}-{e['to']}" for e in qos_map)
 
 
-def _vlan_netdev(context, name, inventory_hostname):
+def _vlan_netdev(context, network, inventory_hostname):
     """Return a networkd NetDev configuration for a VLAN interface.
 
     :param context: a Jinja2 Context object.
-    :param name: name of the network.
+    :param network: a NetworkRecord for the network.
     :param inventory_hostname: Ansible inventory hostname.
     """
-    device = networks.net_interface(context, name, inventory_hostname)
-    mtu = networks.net_mtu(context, name, inventory_hostname)
-    vlan = networks.net_vlan(context, name, inventory_hostname)
+    name = network.name
+    device = network.device
+    mtu = network.mtu
+    vlan = network.vlan
     ingress_qos_map = networks.net_ingress_qos_map(
         context, name, inventory_hostname
     )
@@ -122,16 +123,16 @@ def _vlan_netdev(context, name, inventory_hostname):
     return _filter_options(config)
 
 
-def _bridge_netdev(context, name, inventory_hostname):
+def _bridge_netdev(context, network, inventory_hostname):
     """Return a networkd NetDev configuration for a bridge.
 
     :param context: a Jinja2 Context object.
-    :param name: name of the network.
+    :param network: a NetworkRecord for the network.
     :param inventory_hostname: Ansible inventory hostname.
     """
-    device = networks.net_interface(context, name, inventory_hostname)
-    mtu = networks.net_mtu(context, name, inventory_hostname)
-    stp = networks.net_bridge_stp(context, name, inventory_hostname)
+    device = network.device
+    mtu = network.mtu
+    stp = networks.net_bridge_stp(context, network.name, inventory_hostname)
     config = [
         {
             'NetDev': [
@@ -146,15 +147,16 @@ def _bridge_netdev(context, name, inventory_hostname):
     return _filter_options(config)
 
 
-def _bond_netdev(context, name, inventory_hostname):
+def _bond_netdev(context, network, inventory_hostname):
     """Return a networkd NetDev configuration for a bond.
 
     :param context: a Jinja2 Context object.
-    :param name: name of the network.
+    :param network: a NetworkRecord for the network.
     :param inventory_hostname: Ansible inventory hostname.
     """
-    device = networks.net_interface(context, name, inventory_hostname)
-    mtu = networks.net_mtu(context, name, inventory_hostname)
+    name = network.name
+    device = network.device
+    mtu = network.mtu
     mode = networks.net_bond_mode(context, name, inventory_hostname)
     ad_select = networks.net_bond_ad_select(context, name, inventory_hostname)
     miimon = networks.net_bond_miimon(context, name, inventory_hostname)
@@ -258,11 +260,12 @@ def _network_rules(rules, route_tables):
     ]
 
 
-def _network(context, name, inventory_hostname, bridge, bond, vlan_interfaces):
+def _network(context, network, inventory_hostname, bridge, bond,
+             vlan_interfaces):
     """Return a networkd network for an interface.
 
     :param context: a Jinja2 Context object.
-    :param name: name of the network.
+    :param network: a NetworkRecord for the network.
     :param inventory_hostname: Ansible inventory hostname.
     :param bridge: Name of a bridge into which the interface is plugged, or
                    None.
@@ -271,7 +274,8 @@ def _network(context, name, inventory_hostname, bridge, bond, vlan_interfaces):
     """
     # FIXME(mgoddard): Currently does not support: ethtool_opts, zone,
     # allowed_addresses.
-    device = networks.net_interface(context, name, inventory_hostname)
+    name = network.name
+    device = network.device
     ip = networks.net_ip(context, name, inventory_hostname)
     cidr = networks.net_cidr(context, name, inventory_hostname)
     gateway = networks.net_gateway(context, name, inventory_hostname)
@@ -285,7 +289,7 @@ def _network(context, name, inventory_hostname, bridge, bond, vlan_interfaces):
                 (name))
         ip = "%s/%s" % (ip, ipaddress.ip_network(cidr).prefixlen)
 
-    mtu = networks.net_mtu(context, name, inventory_hostname)
+    mtu = network.mtu
     routes = networks.net_routes(context, name, inventory_hostname)
     rules = networks.net_rules(context, name, inventory_hostname)
     bootproto = networks.net_bootproto(context, name, inventory_hostname)
@@ -361,19 +365,14 @@ def _vlan_parent_network(device, mtu, vlan_interfaces):
     return _filter_options(config)
 
 
-def _bridge_port_network(context, name, port, inventory_hostname,
-                         vlan_interfaces):
+def _bridge_port_network(port, bridge, mtu, vlan_interfaces):
     """Return a networkd network configuration for a bridge port.
 
-    :param context: a Jinja2 Context object.
-    :param name: name of the network.
     :param port: name of the bridge port interface.
-    :param inventory_hostname: Ansible inventory hostname.
+    :param bridge: name of the bridge interface.
+    :param mtu: Bridge MTU.
     :param vlan_interfaces: List of VLAN subinterfaces of the interface.
     """
-    bridge = networks.get_and_validate_interface(context, name,
-                                                 inventory_hostname)
-    mtu = networks.net_mtu(context, name, inventory_hostname)
     config = [
         {
             'Match': [
@@ -397,19 +396,14 @@ def _bridge_port_network(context, name, port, inventory_hostname,
     return _filter_options(config)
 
 
-def _bond_member_network(context, name, member, inventory_hostname,
-                         vlan_interfaces):
+def _bond_member_network(member, bond, mtu, vlan_interfaces):
     """Return a networkd network configuration for a bond member.
 
-    :param context: a Jinja2 Context object.
-    :param name: name of the network.
     :param member: name of the bond member interface.
-    :param inventory_hostname: Ansible inventory hostname.
+    :param bond: name of the bond interface.
+    :param mtu: Bond MTU.
     :param vlan_interfaces: List of VLAN subinterfaces of the interface.
     """
-    bond = networks.get_and_validate_interface(context, name,
-                                               inventory_hostname)
-    mtu = networks.net_mtu(context, name, inventory_hostname)
     config = [
         {
             'Match': [
@@ -493,17 +487,18 @@ def _veth_peer_network(context, veth, inventory_hostname):
     return _filter_options(config)
 
 
-def _ether_link(context, name, inventory_hostname):
+def _ether_link(context, network, inventory_hostname):
     """Return a networkd link configuration for a ether.
 
     :param context: a Jinja2 Context object.
-    :param name: name of the network.
+    :param network: a NetworkRecord for the network.
     :param inventory_hostname: Ansible inventory hostname.
     """
     config = []
 
-    device = networks.net_interface(context, name, inventory_hostname)
-    macaddress = networks.net_macaddress(context, name, inventory_hostname)
+    device = network.device
+    macaddress = networks.net_macaddress(context, network.name,
+                                         inventory_hostname)
 
     if macaddress is not None:
         config = [
@@ -554,37 +549,34 @@ def networkd_netdevs(context, names, inventory_hostname=None):
     :param inventory_hostname: Ansible inventory hostname.
     :returns: a dict representation of networkd NetDev configuration.
     """
+    model = networks.get_host_network_model(context, names,
+                                            inventory_hostname)
+
     # Prefix for configuration file names.
     prefix = utils.get_hostvar(context, "networkd_prefix", inventory_hostname)
 
     result = {}
 
     # VLANs.
-    for name in networks.net_select_vlan_interfaces(context, names,
-                                                    inventory_hostname):
-        device = networks.get_and_validate_interface(context, name,
-                                                     inventory_hostname)
-        netdev = _vlan_netdev(context, name, inventory_hostname)
+    for network in model.vlan_interfaces:
+        device = model.validated_device(network)
+        netdev = _vlan_netdev(context, network, inventory_hostname)
         _add_to_result(result, prefix, device, netdev)
 
     # Bridges.
-    for name in networks.net_select_bridges(context, names,
-                                            inventory_hostname):
-        device = networks.get_and_validate_interface(context, name,
-                                                     inventory_hostname)
-        netdev = _bridge_netdev(context, name, inventory_hostname)
+    for network in model.bridges:
+        device = model.validated_device(network)
+        netdev = _bridge_netdev(context, network, inventory_hostname)
         _add_to_result(result, prefix, device, netdev)
 
     # Bonds.
-    for name in networks.net_select_bonds(context, names, inventory_hostname):
-        device = networks.get_and_validate_interface(context, name,
-                                                     inventory_hostname)
-        netdev = _bond_netdev(context, name, inventory_hostname)
+    for network in model.bonds:
+        device = model.validated_device(network)
+        netdev = _bond_netdev(context, network, inventory_hostname)
         _add_to_result(result, prefix, device, netdev)
 
     # Virtual Ethernet pairs.
-    veths = networks.get_ovs_veths(context, names, inventory_hostname)
-    for veth in veths:
+    for veth in model.veths(context):
         netdev = _veth_netdev(context, veth, inventory_hostname)
         device = veth['name']
         _add_to_result(result, prefix, device, netdev)
@@ -604,16 +596,18 @@ def networkd_links(context, names, inventory_hostname=None):
     :param inventory_hostname: Ansible inventory hostname.
     :returns: a dict representation of networkd link configuration.
     """
+    model = networks.get_host_network_model(context, names,
+                                            inventory_hostname)
+
     # Prefix for configuration file names.
     prefix = utils.get_hostvar(context, "networkd_prefix", inventory_hostname)
 
     result = {}
 
     # only ethers
-    for name in networks.net_select_ethers(context, names, inventory_hostname):
-        device = networks.get_and_validate_interface(context, name,
-                                                     inventory_hostname)
-        ether_link = _ether_link(context, name, inventory_hostname)
+    for network in model.ethers:
+        device = model.validated_device(network)
+        ether_link = _ether_link(context, network, inventory_hostname)
         if ether_link:
             _add_to_result(result, prefix, device, ether_link)
 
@@ -636,44 +630,30 @@ def networkd_networks(context, names, inventory_hostname=None):
     # systemd-networkd: rules, route options, ethtool_opts, zone,
     # allowed addresses
 
+    model = networks.get_host_network_model(context, names,
+                                            inventory_hostname)
+
     # Build up some useful mappings.
     bridge_port_to_bridge = {}
     bond_member_to_bond = {}
-    interface_to_vlans = {}
 
     # List of all interfaces.
-    interfaces = [
-        networks.net_interface(context, name, inventory_hostname)
-        for name in names
-    ]
+    interfaces = [network.device for network in model.networks]
 
     # Map bridge ports to bridges.
-    for name in networks.net_select_bridges(context, names,
-                                            inventory_hostname):
-        device = networks.get_and_validate_interface(context, name,
-                                                     inventory_hostname)
-        for port in networks.net_bridge_ports(context, name,
-                                              inventory_hostname):
+    for network in model.bridges:
+        device = model.validated_device(network)
+        for port in network.bridge_ports:
             bridge_port_to_bridge[port] = device
 
     # Map bond members to bonds.
-    for name in networks.net_select_bonds(context, names, inventory_hostname):
-        device = networks.get_and_validate_interface(context, name,
-                                                     inventory_hostname)
-        for member in networks.net_bond_slaves(context, name,
-                                               inventory_hostname):
+    for network in model.bonds:
+        device = model.validated_device(network)
+        for member in network.bond_slaves:
             bond_member_to_bond[member] = device
 
     # Map interfaces to lists of VLAN subinterfaces.
-    for name in networks.net_select_vlans(context, names, inventory_hostname):
-        device = networks.get_and_validate_interface(context, name,
-                                                     inventory_hostname)
-        vlan = networks.net_vlan(context, name, inventory_hostname)
-        mtu = networks.net_mtu(context, name, inventory_hostname)
-        parent = networks.get_vlan_parent(
-            context, name, device, vlan, inventory_hostname)
-        vlan_interfaces = interface_to_vlans.setdefault(parent, [])
-        vlan_interfaces.append({"device": device, "mtu": mtu})
+    interface_to_vlans = model.interface_to_vlans()
 
     # Prefix for configuration file names.
     prefix = utils.get_hostvar(context, "networkd_prefix", inventory_hostname)
@@ -681,14 +661,13 @@ def networkd_networks(context, names, inventory_hostname=None):
     result = {}
 
     # Configured networks.
-    for name in names:
-        device = networks.get_and_validate_interface(context, name,
-                                                     inventory_hostname)
+    for network in model.networks:
+        device = model.validated_device(network)
         bridge = bridge_port_to_bridge.get(device)
         bond = bond_member_to_bond.get(device)
         vlan_interfaces = interface_to_vlans.get(device, [])
-        net = _network(context, name, inventory_hostname, bridge, bond,
-                       [vlan["device"] for vlan in vlan_interfaces])
+        net = _network(context, network, inventory_hostname, bridge, bond,
+                       [vlan.device for vlan in vlan_interfaces])
         _add_to_result(result, prefix, device, net)
 
     # VLAN parent interfaces that are not in configured networks, bridge ports
@@ -699,44 +678,34 @@ def networkd_networks(context, names, inventory_hostname=None):
                             set(bond_member_to_bond))
     for device in implied_vlan_parents:
         vlan_interfaces = interface_to_vlans[device]
-        vlan_mtus = [vlan["mtu"] for vlan in vlan_interfaces if vlan["mtu"]]
+        vlan_mtus = [vlan.mtu for vlan in vlan_interfaces if vlan.mtu]
         mtu = max(vlan_mtus) if vlan_mtus else None
         net = _vlan_parent_network(device, mtu,
-                                   [vlan["device"]
-                                    for vlan in vlan_interfaces])
+                                   [vlan.device for vlan in vlan_interfaces])
         _add_to_result(result, prefix, device, net)
 
     # Bridge ports that are not in configured networks.
-    for name in networks.net_select_bridges(context, names,
-                                            inventory_hostname):
-        device = networks.get_and_validate_interface(context, name,
-                                                     inventory_hostname)
-        bridge_ports = networks.net_bridge_ports(context, name,
-                                                 inventory_hostname)
-        for port in set(bridge_ports) - set(interfaces):
+    for network in model.bridges:
+        device = model.validated_device(network)
+        for port in set(network.bridge_ports) - set(interfaces):
             vlan_interfaces = interface_to_vlans.get(port, [])
-            net = _bridge_port_network(context, name, port, inventory_hostname,
-                                       [vlan["device"]
+            net = _bridge_port_network(port, device, network.mtu,
+                                       [vlan.device
                                         for vlan in vlan_interfaces])
             _add_to_result(result, prefix, port, net)
 
     # Bond members that are not in configured networks.
-    for name in networks.net_select_bonds(context, names, inventory_hostname):
-        device = networks.get_and_validate_interface(context, name,
-                                                     inventory_hostname)
-        bond_members = networks.net_bond_slaves(context, name,
-                                                inventory_hostname)
-        for member in set(bond_members) - set(interfaces):
+    for network in model.bonds:
+        device = model.validated_device(network)
+        for member in set(network.bond_slaves) - set(interfaces):
             vlan_interfaces = interface_to_vlans.get(member, [])
-            net = _bond_member_network(context, name, member,
-                                       inventory_hostname,
-                                       [vlan["device"]
+            net = _bond_member_network(member, device, network.mtu,
+                                       [vlan.device
                                         for vlan in vlan_interfaces])
             _add_to_result(result, prefix, member, net)
 
     # Virtual Ethernet pairs for Open vSwitch.
-    veths = networks.get_ovs_veths(context, names, inventory_hostname)
-    for veth in veths:
+    for veth in model.veths(context):
         net = _veth_network(context, veth, inventory_hostname)
         device = veth['name']
         _add_to_result(result, prefix, device, net)
@@ -82,60 +82,8 @@ def get_ovs_veths(context, names, inventory_hostname):
     :returns: a list of dicts describing veth pairs. Each dict has keys 'name',
               'peer', 'bridge', and 'mtu'.
     """
-    # The following networks need to be plugged into Open vSwitch:
-    # * workload provisioning network
-    # * workload cleaning network
-    # * neutron external networks
-    ironic_networks = [
-        utils.get_hostvar(context, 'provision_wl_net_name',
-                          inventory_hostname),
-        utils.get_hostvar(context, 'cleaning_net_name', inventory_hostname),
-    ]
-    external_networks = utils.get_hostvar(context, 'external_net_names',
-                                          inventory_hostname)
-    veth_networks = ironic_networks + (external_networks or [])
-
-    # Make a list of all bridge interfaces.
-    bridges = net_select_bridges(context, names, inventory_hostname)
-    bridge_interfaces = [net_interface(context, bridge, inventory_hostname)
-                         for bridge in bridges]
-
-    # Dict mapping bridge interfaces to the MTU of a connected veth pair.
-    veth_mtu_map = {}
-    for name in veth_networks:
-        if name not in names:
-            continue
-        device = get_and_validate_interface(context, name, inventory_hostname)
-        # When these networks are VLANs, we need to use the underlying tagged
-        # interface rather than the untagged interface. We therefore strip the
-        # .<vlan> suffix of the interface name. We use a union here as a single
-        # tagged interface may be shared between these networks.
-        vlan = net_vlan(context, name, inventory_hostname)
-        if vlan:
-            parent_or_device = get_vlan_parent(
-                context, name, device, vlan, inventory_hostname)
-        else:
-            parent_or_device = device
-        if parent_or_device in bridge_interfaces:
-            # Determine the MTU as the maximum of all subinterface MTUs. Only
-            # interfaces with an explicit MTU set will be taken account of. If
-            # no interface has an explicit MTU set, then the corresponding veth
-            # will not either.
-            # Allow for the case where an MTU is not specified.
-            mtu = net_mtu(context, name, inventory_hostname)
-            veth_mtu_map.setdefault(parent_or_device, mtu)
-            if (veth_mtu_map.get(parent_or_device) or 0) < (mtu or 0):
-                veth_mtu_map[parent_or_device] = mtu
-
-    return [
-        {
-            'name': _get_veth_interface(context, bridge, inventory_hostname),
-            'peer': _get_veth_peer(context, bridge, inventory_hostname),
-            'bridge': bridge,
-            'mtu': mtu
-        }
-        for bridge, mtu in veth_mtu_map.items()
-    ]
+    model = get_host_network_model(context, names, inventory_hostname)
+    return model.veths(context)
 
 
 def get_vlan_parent(context, name, device, vlan, inventory_hostname):
@@ -428,12 +376,8 @@ def net_interface_obj(context, name, inventory_hostname=None, names=None):
     if names is not None and net_is_vlan_interface(context, name,
                                                    inventory_hostname):
         # Make a mapping of bridge interfaces and their MTUs
-        bridge_mtus = {}
-        for bridge in net_select_bridges(context, names, inventory_hostname):
-            bridge_interface = net_interface(context, bridge,
-                                             inventory_hostname)
-            bridge_mtus[bridge_interface] = net_mtu(context, bridge,
-                                                    inventory_hostname)
+        model = get_host_network_model(context, names, inventory_hostname)
+        bridge_mtus = model.bridge_mtus()
 
         # Get parent and check for its MTU if it is a bridge
         parent_or_device = get_vlan_parent(
@@ -793,6 +737,369 @@ def net_physical_interface(context, name, inventory_hostname=None):
         return [net_attr(context, name, 'interface', inventory_hostname)]
 
 
+@jinja2.pass_context
+def net_membership_index(context, hosts):
+    """Return an index of the hosts on each network.
+
+    This should be built once per play, e.g. using set_fact with run_once,
+    and passed to net_peers for each host.
+
+    :param context: a Jinja2 Context object.
+    :param hosts: list of Ansible inventory hostnames.
+    :returns: a dict mapping network names to dicts with items 'hosts', a
+        sorted list of hosts with an IP address on the network, 'ips', a dict
+        mapping those hosts to their IP addresses, and 'positions', a dict
+        mapping those hosts to their position in 'hosts'.
+    """
+    ips = {}
+    for host in hosts:
+        names = utils.get_hostvar(context, 'network_interfaces', host) or []
+        for name in names:
+            ip = net_ip(context, name, host)
+            if ip:
+                ips.setdefault(name, {})[host] = ip
+    index = {}
+    for name, members in ips.items():
+        sorted_hosts = sorted(members)
+        index[name] = {
+            'hosts': sorted_hosts,
+            'ips': members,
+            'positions': {host: i for i, host in enumerate(sorted_hosts)},
+        }
+    return index
+
+
+def net_peers(index, inventory_hostname, names, count=1):
+    """Return a deterministic sample of peers of a host on each network.
+
+    The peers of a host on a network are the next hosts after it in the
+    sorted list of hosts on the network, wrapping around at the end. Every
+    host is therefore a peer of count other hosts.
+
+    :param index: network membership index returned by net_membership_index.
+    :param inventory_hostname: Ansible inventory hostname.
+    :param names: list of names of networks.
+    :param count: maximum number of peers per network.
+    :returns: a list of dicts with items 'network', 'host' and 'ip'.
+    """
+    peers = []
+    for name in names:
+        network = index.get(name)
+        if not network or inventory_hostname not in network['positions']:
+            continue
+        hosts = network['hosts']
+        position = network['positions'][inventory_hostname]
+        for offset in range(1, min(int(count), len(hosts) - 1) + 1):
+            host = hosts[(position + offset) % len(hosts)]
+            peers.append({'network': name, 'host': host,
+                          'ip': network['ips'][host]})
+    return peers
+
+
+@jinja2.pass_context
+def net_connectivity_targets(context, index, names, count=1,
+                             inventory_hostname=None):
+    """Return the targets of connectivity checks of a host on each network.
+
+    The targets on each network on which the host has an IP address are the
+    network's gateway, if it has one, and the peers of the host returned by
+    net_peers.
+
+    :param context: a Jinja2 Context object.
+    :param index: network membership index returned by net_membership_index.
+    :param names: list of names of networks.
+    :param count: maximum number of peers per network.
+    :param inventory_hostname: Ansible inventory hostname.
+    :returns: a list of dicts with items 'type' (one of 'gateway' or 'host'),
+        'network', 'destination', 'address' and 'mtu'.
+    """
+    if inventory_hostname is None:
+        inventory_hostname = utils.get_hostvar(context, "inventory_hostname")
+    targets = []
+    for name in names:
+        if not net_ip(context, name, inventory_hostname):
+            continue
+        mtu = net_mtu(context, name, inventory_hostname)
+        gateway = net_gateway(context, name, inventory_hostname)
+        if gateway:
+            targets.append({'type': 'gateway', 'network': name,
+                            'destination': 'gateway', 'address': gateway,
+                            'mtu': mtu})
+        for peer in net_peers(index, inventory_hostname, [name], count):
+            targets.append({'type': 'host', 'network': name,
+                            'destination': peer['host'],
+                            'address': peer['ip'], 'mtu': mtu})
+    return targets
+
+
+def net_connectivity_matrix(results):
+    """Aggregate the results of connectivity checks between hosts.
+
+    :param results: a dict mapping each source host to its registered
+        network_connectivity_check result.
+    :returns: a dict with items 'matrix', a dict mapping network names to
+        source hosts to destination hosts to whether the check succeeded,
+        'networks', a dict mapping network names to the number of checks
+        'checked' and 'failed', the mean percentage packet 'loss', and the
+        mean round trip time 'rtt_avg', 'checked', the number of checks, and
+        'failed', a sorted list of dicts describing failed checks.
+    """
+    matrix = {}
+    networks = {}
+    failed = []
+    checked = 0
+    for source, result in sorted(results.items()):
+        for check in (result or {}).get('checks', []):
+            checked += 1
+            network = check.get('network') or check.get('type') or ''
+            destination = check.get('destination') or check['address']
+            if check.get('type') == 'host':
+                matrix.setdefault(network, {}).setdefault(
+                    source, {})[destination] = not check['failed']
+            stats = networks.setdefault(network, {'checked': 0, 'failed': 0,
+                                                  'loss': [], 'rtt_avg': []})
+            stats['checked'] += 1
+            stats['loss'].append(check.get('loss', 0.0))
+            if check.get('rtt_avg') is not None:
+                stats['rtt_avg'].append(check['rtt_avg'])
+            if check['failed']:
+                stats['failed'] += 1
+                failed.append({'type': check.get('type'),
+                               'network': network, 'source': source,
+                               'destination': destination,
+                               'address': check['address'],
+                               'msg': check.get('msg')})
+    for stats in networks.values():
+        stats['loss'] = round(sum(stats['loss']) / len(stats['loss']), 3)
+        rtts = stats['rtt_avg']
+        stats['rtt_avg'] = round(sum(rtts) / len(rtts), 3) if rtts else None
+    return {
+        'matrix': matrix,
+        'networks': networks,
+        'checked': checked,
+        'failed': sorted(failed, key=lambda check: (check['network'],
+                                                    check['source'],
+                                                    check['destination'])),
+    }
+
+
+# Regular expression matching conventional VLAN interface names, ending with a
+# period and a numerical extension to an interface name.
+VLAN_INTERFACE_RE = re.compile(r"^[a-zA-Z0-9_\-]+\.[1-9][\d]{0,3}$")
+
+
+class NetworkRecord(object):
+    """Interface attributes of a network on a host.
+
+    :param context: a Jinja2 Context object.
+    :param name: name of the network.
+    :param inventory_hostname: Ansible inventory hostname.
+    """
+
+    __slots__ = ('name', 'device', 'type', 'vlan', 'parent', 'mtu',
+                 'bridge_ports', 'bond_slaves', 'is_vlan_interface',
+                 'vlan_parent')
+
+    def __init__(self, context, name, inventory_hostname):
+        self.name = name
+        self.device = net_interface(context, name, inventory_hostname)
+        self.type = _net_interface_type(context, name, inventory_hostname)
+        self.vlan = net_vlan(context, name, inventory_hostname)
+        self.parent = net_parent(context, name, inventory_hostname)
+        self.mtu = net_mtu(context, name, inventory_hostname)
+        self.bridge_ports = net_bridge_ports(context, name,
+                                             inventory_hostname)
+        self.bond_slaves = net_bond_slaves(context, name, inventory_hostname)
+        # Whether the network is a VLAN subinterface, or None if the network
+        # has no interface from which to determine this.
+        if self.parent and self.vlan:
+            self.is_vlan_interface = True
+        elif self.device:
+            self.is_vlan_interface = bool(
+                VLAN_INTERFACE_RE.match(self.device))
+        else:
+            self.is_vlan_interface = None
+        # Parent interface of a VLAN.
+        if self.vlan is not None and self.device:
+            self.vlan_parent = (self.parent or
+                                re.sub(r'\.{}$'.format(self.vlan), '',
+                                       self.device))
+        else:
+            self.vlan_parent = None
+
+
+class HostNetworkModel(object):
+    """Model of the network interfaces of a host.
+
+    The model is built once from a list of network names, and is shared by the
+    filters which generate network configuration for the host, so that
+    interface types, VLAN parents, bridge ports, bond members and veth pairs
+    are derived once and consistently. Use get_host_network_model() to get a
+    model that is cached for the current templating pass.
+
+    :param context: a Jinja2 Context object.
+    :param names: list of names of networks.
+    :param inventory_hostname: Ansible inventory hostname.
+    """
+
+    __slots__ = ('names', 'inventory_hostname', 'networks', '_veths')
+
+    def __init__(self, context, names, inventory_hostname):
+        self.names = names
+        self.inventory_hostname = inventory_hostname
+        self.networks = [NetworkRecord(context, name, inventory_hostname)
+                         for name in names]
+        self._veths = None
+
+    def validated_device(self, network):
+        """Return the interface of a network, which must be defined.
+
+        :param network: a NetworkRecord.
+        :raises: ansible.errors.AnsibleFilterError
+        """
+        if not network.device:
+            raise errors.AnsibleFilterError(
+                "Network interface for network '%s' on host '%s' not found" %
+                (network.name, self.inventory_hostname))
+        return network.device
+
+    @property
+    def ethers(self):
+        return [network for network in self.networks
+                if network.type == 'ether']
+
+    @property
+    def bridges(self):
+        return [network for network in self.networks
+                if network.type == 'bridge']
+
+    @property
+    def bonds(self):
+        return [network for network in self.networks
+                if network.type == 'bond']
+
+    @property
+    def vlans(self):
+        return [network for network in self.networks
+                if network.vlan is not None]
+
+    @property
+    def vlan_interfaces(self):
+        """Return networks which are VLAN subinterfaces.
+
+        :raises: ansible.errors.AnsibleFilterError if it cannot be determined
+                 whether a network is a VLAN subinterface.
+        """
+        for network in self.networks:
+            if network.is_vlan_interface is None:
+                self.validated_device(network)
+        return [network for network in self.networks
+                if network.is_vlan_interface]
+
+    def bridge_mtus(self):
+        """Return a dict mapping bridge interfaces to their MTUs."""
+        return {network.device: network.mtu for network in self.bridges}
+
+    def interface_to_vlans(self):
+        """Return a dict mapping interfaces to lists of VLAN networks.
+
+        :raises: ansible.errors.AnsibleFilterError
+        """
+        result = {}
+        for network in self.vlans:
+            self.validated_device(network)
+            result.setdefault(network.vlan_parent, []).append(network)
+        return result
+
+    def veths(self, context):
+        """Return a list of dicts describing veth pairs to plug into OVS.
+
+        :param context: a Jinja2 Context object.
+        :returns: a list of dicts describing veth pairs. Each dict has keys
+                  'name', 'peer', 'bridge', and 'mtu'.
+        :raises: ansible.errors.AnsibleFilterError
+        """
+        if self._veths is None:
+            self._veths = self._get_veths(context)
+        return self._veths
+
+    def _get_veths(self, context):
+        inventory_hostname = self.inventory_hostname
+        # The following networks need to be plugged into Open vSwitch:
+        # * workload provisioning network
+        # * workload cleaning network
+        # * neutron external networks
+        ironic_networks = [
+            utils.get_hostvar(context, 'provision_wl_net_name',
+                              inventory_hostname),
+            utils.get_hostvar(context, 'cleaning_net_name',
+                              inventory_hostname),
+        ]
+        external_networks = utils.get_hostvar(context, 'external_net_names',
+                                              inventory_hostname)
+        veth_networks = ironic_networks + (external_networks or [])
+        networks_by_name = {network.name: network
+                            for network in self.networks}
+
+        # Make a list of all bridge interfaces.
+        bridge_interfaces = [network.device for network in self.bridges]
+
+        # Dict mapping bridge interfaces to the MTU of a connected veth pair.
+        veth_mtu_map = {}
+        for name in veth_networks:
+            network = networks_by_name.get(name)
+            if network is None:
+                continue
+            device = self.validated_device(network)
+            # When these networks are VLANs, we need to use the underlying
+            # tagged interface rather than the untagged interface. We use a
+            # union here as a single tagged interface may be shared between
+            # these networks.
+            if network.vlan:
+                parent_or_device = network.vlan_parent
+            else:
+                parent_or_device = device
+            if parent_or_device in bridge_interfaces:
+                # Determine the MTU as the maximum of all subinterface MTUs.
+                # Only interfaces with an explicit MTU set will be taken
+                # account of. If no interface has an explicit MTU set, then
+                # the corresponding veth will not either.
+                mtu = network.mtu
+                veth_mtu_map.setdefault(parent_or_device, mtu)
+                if (veth_mtu_map.get(parent_or_device) or 0) < (mtu or 0):
+                    veth_mtu_map[parent_or_device] = mtu
+
+        return [
+            {
+                'name': _get_veth_interface(context, bridge,
+                                            inventory_hostname),
+                'peer': _get_veth_peer(context, bridge, inventory_hostname),
+                'bridge': bridge,
+                'mtu': mtu
+            }
+            for bridge, mtu in veth_mtu_map.items()
+        ]
+
+
+def get_host_network_model(context, names, inventory_hostname=None):
+    """Return a HostNetworkModel for a list of networks on a host.
+
+    The model is cached for the lifetime of the Jinja2 Context.
+
+    :param context: a Jinja2 Context object.
+    :param names: list of names of networks.
+    :param inventory_hostname: Ansible inventory hostname.
+    :returns: a HostNetworkModel.
+    """
+    cache = utils.get_context_cache(context)
+    key = ("host_network_model", tuple(names), inventory_hostname)
+    model = cache.get(key)
+    if model is None:
+        model = cache[key] = HostNetworkModel(context, list(names),
+                                              inventory_hostname)
+    return model
+
+
 def get_filters():
     return {
         'net_attr': net_attr,
@@ -847,4 +1154,8 @@ def get_filters():
         'net_libvirt_vm_network': net_libvirt_vm_network,
         'net_ovs_veths': net_ovs_veths,
         'net_physical_interface': net_physical_interface,
+        'net_membership_index': net_membership_index,
+        'net_peers': net_peers,
+        'net_connectivity_targets': net_connectivity_targets,
+        'net_connectivity_matrix': net_connectivity_matrix,
     }
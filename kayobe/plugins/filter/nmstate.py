@@ -368,6 +368,8 @@ def _get_vlan_qos_map(context, name, inventory_hostname, direction):
 
 @jinja2.pass_context
 def nmstate_config(context, names, inventory_hostname=None):
+    model = networks.get_host_network_model(context, names,
+                                            inventory_hostname)
     interfaces = {}
     routes = []
     rules = []
@@ -385,14 +387,15 @@ def nmstate_config(context, names, inventory_hostname=None):
             interfaces[name] = {"name": name, "state": "up"}
         return interfaces[name]
 
-    for name in names:
-        iface_name = networks.net_interface(context, name, inventory_hostname)
+    for network in model.networks:
+        name = network.name
+        iface_name = network.device
         if not iface_name:
             continue
 
         iface = get_iface(iface_name)
 
-        mtu = networks.net_mtu(context, name, inventory_hostname)
+        mtu = network.mtu
         if mtu:
             iface["mtu"] = mtu
 
@@ -495,10 +498,9 @@ def nmstate_config(context, names, inventory_hostname=None):
             rules.append(rule_config)
 
         # Specific Interface Types
-        if networks.net_is_bridge(context, name, inventory_hostname):
+        if network.type == "bridge":
             iface["type"] = "linux-bridge"
-            br_ports = networks.net_bridge_ports(
-                context, name, inventory_hostname)
+            br_ports = network.bridge_ports
             stp = networks.net_bridge_stp(
                 context, name, inventory_hostname)
 
@@ -529,10 +531,9 @@ def nmstate_config(context, names, inventory_hostname=None):
                     port_iface["type"] = (
                         port_type if port_type else _default_iface_type(port))
 
-        elif networks.net_is_bond(context, name, inventory_hostname):
+        elif network.type == "bond":
             iface["type"] = "bond"
-            slaves = networks.net_bond_slaves(
-                context, name, inventory_hostname)
+            slaves = network.bond_slaves
             mode = networks.net_bond_mode(context, name, inventory_hostname)
             link_agg_config = {"port": slaves or []}
             if mode is not None:
@@ -563,13 +564,10 @@ def nmstate_config(context, names, inventory_hostname=None):
                         slave_type
                         if slave_type else _default_iface_type(slave))
 
-        elif networks.net_is_vlan_interface(
-                context, name, inventory_hostname):
+        elif network.is_vlan_interface:
             iface["type"] = "vlan"
-            vlan_id = networks.net_vlan(
-                context, name, inventory_hostname)
-            parent = networks.net_parent(
-                context, name, inventory_hostname)
+            vlan_id = network.vlan
+            parent = network.parent
 
             # Derive VLAN ID from interface name if not explicitly
             # set
@@ -591,13 +589,7 @@ def nmstate_config(context, names, inventory_hostname=None):
             # NOTE(bbezak): Do not pass MTU for VLAN interfaces on bridges when
             # it is identical to the parent bridge, to work around a
             # NetworkManager bug.
-            bridge_mtus = {}
-            for bridge in networks.net_select_bridges(
-                    context, names, inventory_hostname):
-                bridge_interface = networks.net_interface(
-                    context, bridge, inventory_hostname)
-                bridge_mtus[bridge_interface] = networks.net_mtu(
-                    context, bridge, inventory_hostname)
+            bridge_mtus = model.bridge_mtus()
 
             if parent in bridge_mtus:
                 parent_mtu = bridge_mtus[parent]
@@ -646,7 +638,7 @@ def nmstate_config(context, names, inventory_hostname=None):
 
     # Configure virtual Ethernet patch links to connect Linux bridges that
     # carry provision/cleaning/external networks into OVS.
-    for veth in networks.get_ovs_veths(context, names, inventory_hostname):
+    for veth in model.veths(context):
         bridge_name = veth["bridge"]
         phy_name = veth["name"]
         peer_name = veth["peer"]
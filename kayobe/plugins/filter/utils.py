@@ -12,10 +12,44 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import weakref
+
 from ansible import errors
 
+# Cache of values derived from host variables. Maps Jinja2 Context objects to
+# a dict of cached values. A new Context is created for each templating pass,
+# so variables are resolved at most once per pass, and changes made by tasks
+# such as set_fact are seen by the next pass.
+_context_cache = weakref.WeakKeyDictionary()
+
+
+def get_context_cache(context):
+    """Return a dict for caching values derived from a Jinja2 Context.
+
+    :param context: Jinja2 Context object.
+    :returns: a dict which lives as long as the Context.
+    """
+    return _context_cache.setdefault(context, {})
+
+
+def clear_context_cache(context):
+    """Clear the cache of values derived from a Jinja2 Context.
+
+    This should be used by code which changes host variables within a
+    templating pass.
+
+    :param context: Jinja2 Context object.
+    """
+    _context_cache.pop(context, None)
+
 
 def get_hostvar(context, var_name, inventory_hostname=None):
+    cache = get_context_cache(context)
+    key = ("hostvar", inventory_hostname, var_name)
+    try:
+        return cache[key]
+    except KeyError:
+        pass
     if inventory_hostname is None:
         namespace = context
     else:
@@ -23,7 +57,8 @@ def get_hostvar(context, var_name, inventory_hostname=None):
             raise errors.AnsibleFilterError(
                 "Inventory hostname '%s' not in hostvars" % inventory_hostname)
         namespace = context["hostvars"][inventory_hostname]
-    return namespace.get(var_name)
+    value = cache[key] = namespace.get(var_name)
+    return value
 
 
 def call_bool_filter(context, value):
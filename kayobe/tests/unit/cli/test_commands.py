@@ -12,8 +12,11 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
-import glob
+import io
+import json
 import os
+import shutil
+import tempfile
 import unittest
 from unittest import mock
 
@@ -22,6 +25,8 @@ import cliff.commandmanager
 
 from kayobe import ansible
 from kayobe.cli import commands
+from kayobe import hooks
+from kayobe import kolla_ansible
 from kayobe import utils
 
 
@@ -223,6 +228,52 @@ class TestCase(unittest.TestCase):
         ]
         self.assertListEqual(expected_calls, mock_kolla_run.call_args_list)
 
+    @mock.patch.object(commands.KayobeAnsibleMixin,
+                       "iter_kayobe_config_dump")
+    def test_configuration_dump(self, mock_dump):
+        command = commands.ConfigurationDump(TestApp(), [])
+        parser = command.get_parser("test")
+        parsed_args = parser.parse_args(["--hosts", "controllers",
+                                         "--var-name", "var1"])
+        hostvars = {
+            "host1": {"var1": {"b": [1, "x\ny"], "a": None}},
+            "host2": {"var1": {}},
+        }
+        mock_dump.return_value = iter(sorted(hostvars.items()))
+        with mock.patch("sys.stdout", new_callable=io.StringIO) as stdout:
+            result = command.run(parsed_args)
+        self.assertEqual(0, result)
+        self.assertEqual(json.dumps(hostvars, sort_keys=True, indent=4),
+                         stdout.getvalue())
+        mock_dump.assert_called_once_with(mock.ANY, hosts="controllers",
+                                          facts=False, var_name="var1")
+
+    @mock.patch.object(commands.KayobeAnsibleMixin,
+                       "iter_kayobe_config_dump")
+    def test_configuration_dump_no_hosts(self, mock_dump):
+        command = commands.ConfigurationDump(TestApp(), [])
+        parser = command.get_parser("test")
+        parsed_args = parser.parse_args([])
+        mock_dump.return_value = iter([])
+        with mock.patch("sys.stdout", new_callable=io.StringIO) as stdout:
+            result = command.run(parsed_args)
+        self.assertEqual(0, result)
+        self.assertEqual("{}", stdout.getvalue())
+
+    @mock.patch.object(commands.KayobeAnsibleMixin,
+                       "run_kayobe_config_dump")
+    def test_configuration_dump_host(self, mock_dump):
+        command = commands.ConfigurationDump(TestApp(), [])
+        parser = command.get_parser("test")
+        parsed_args = parser.parse_args(["--host", "host1"])
+        mock_dump.return_value = {"var1": ["value1"]}
+        with mock.patch("sys.stdout", new_callable=io.StringIO) as stdout:
+            result = command.run(parsed_args)
+        self.assertEqual(0, result)
+        self.assertEqual(json.dumps({"var1": ["value1"]}, sort_keys=True,
+                                    indent=4),
+                         stdout.getvalue())
+
     @mock.patch.object(commands.KayobeAnsibleMixin,
                        "run_kayobe_playbooks")
     def test_control_host_configure(self, mock_run):
@@ -238,6 +289,7 @@ class TestCase(unittest.TestCase):
                 mock.ANY,
                 [utils.get_data_files_path("ansible", "ip-allocation.yml")],
                 limit="ansible-control",
+                barrier=True,
             ),
             mock.call(
                 mock.ANY,
@@ -265,6 +317,7 @@ class TestCase(unittest.TestCase):
                 mock.ANY,
                 [utils.get_data_files_path("ansible", "ip-allocation.yml")],
                 limit="ansible-control",
+                barrier=True,
             ),
             mock.call(
                 mock.ANY,
@@ -361,6 +414,89 @@ class TestCase(unittest.TestCase):
         ]
         self.assertListEqual(expected_calls, mock_run.call_args_list)
 
+    @mock.patch.object(ansible, "install_galaxy_roles", autospec=True)
+    @mock.patch.object(ansible, "install_galaxy_collections", autospec=True)
+    @mock.patch.object(ansible, "prune_galaxy_roles", autospec=True)
+    @mock.patch.object(ansible, "_get_vars_files", lambda paths: [])
+    @mock.patch.object(ansible, "run_playbooks")
+    def test_control_host_upgrade_merged(self, mock_run, mock_prune,
+                                         mock_install_roles,
+                                         mock_install_collections):
+        command = commands.ControlHostUpgrade(TestApp(), [])
+        command.app.options = mock.Mock(verbose_level=1)
+        parser = command.get_parser("test")
+        parsed_args = parser.parse_args([])
+        result = command.run(parsed_args)
+        self.assertEqual(0, result)
+        expected_calls = [
+            mock.call(
+                parsed_args,
+                [utils.get_data_files_path("ansible", "install.yml"),
+                 utils.get_data_files_path("ansible", "bootstrap.yml")],
+                ignore_limit=True,
+                verbose_level=0,
+            ),
+        ]
+        self.assertListEqual(expected_calls, mock_run.call_args_list)
+
+    @mock.patch.object(ansible, "_get_vars_files", lambda paths: [])
+    @mock.patch.object(ansible, "run_playbooks")
+    def test_control_host_configure_merged(self, mock_run):
+        command = commands.ControlHostConfigure(TestApp(), [])
+        command.app.options = mock.Mock(verbose_level=1)
+        parser = command.get_parser("test")
+        parsed_args = parser.parse_args([])
+        result = command.run(parsed_args)
+        self.assertEqual(0, result)
+        # Allocated IP addresses are only loaded by a new invocation.
+        expected_calls = [
+            mock.call(
+                parsed_args,
+                [utils.get_data_files_path("ansible", "ip-allocation.yml")],
+                limit="ansible-control",
+                verbose_level=0,
+            ),
+            mock.call(
+                parsed_args,
+                [utils.get_data_files_path("ansible",
+                                           "control-host-configure.yml")],
+                limit="ansible-control",
+                verbose_level=0,
+            ),
+        ]
+        self.assertListEqual(expected_calls, mock_run.call_args_list)
+
+    @mock.patch.object(ansible, "_get_vars_files", lambda paths: [])
+    @mock.patch.object(kolla_ansible, "run_seed")
+    @mock.patch.object(ansible, "run_playbooks")
+    def test_seed_service_deploy_merged(self, mock_run, mock_kolla_run):
+        manager = mock.Mock()
+        manager.attach_mock(mock_run, "run_playbooks")
+        manager.attach_mock(mock_kolla_run, "run_seed")
+        command = commands.SeedServiceDeploy(TestApp(), [])
+        command.app.options = mock.Mock(verbose_level=1)
+        parser = command.get_parser("test")
+        parsed_args = parser.parse_args([])
+        result = command.run(parsed_args)
+        self.assertEqual(0, result)
+        # Deferred Kayobe playbooks must run before Kolla Ansible.
+        calls = [(name, args[1]) for name, args, _ in manager.mock_calls]
+        expected_calls = [
+            ("run_playbooks",
+             [utils.get_data_files_path("ansible", "manage-containers.yml")]),
+            ("run_playbooks",
+             [utils.get_data_files_path("ansible", "kolla-ansible.yml")]),
+            ("run_playbooks",
+             [utils.get_data_files_path("ansible", "kolla-bifrost.yml")]),
+            ("run_seed", "deploy-bifrost"),
+            ("run_playbooks",
+             [utils.get_data_files_path("ansible", "seed-credentials.yml"),
+              utils.get_data_files_path("ansible",
+                                        "seed-introspection-rules.yml"),
+              utils.get_data_files_path("ansible", "dell-switch-bmp.yml")]),
+        ]
+        self.assertListEqual(expected_calls, calls)
+
     @mock.patch.object(commands.KayobeAnsibleMixin,
                        "run_kayobe_playbook")
     def test_physical_network_configure(self, mock_run):
@@ -530,6 +666,7 @@ class TestCase(unittest.TestCase):
                 mock.ANY,
                 [utils.get_data_files_path("ansible", "ip-allocation.yml")],
                 limit="seed-hypervisor",
+                barrier=True,
             ),
             mock.call(
                 mock.ANY,
@@ -557,6 +694,7 @@ class TestCase(unittest.TestCase):
                 mock.ANY,
                 [utils.get_data_files_path("ansible", "ip-allocation.yml")],
                 limit="seed-hypervisor",
+                barrier=True,
             ),
             mock.call(
                 mock.ANY,
@@ -711,6 +849,7 @@ class TestCase(unittest.TestCase):
                 mock.ANY,
                 [utils.get_data_files_path("ansible", "ip-allocation.yml")],
                 limit="seed",
+                barrier=True,
             ),
             mock.call(
                 mock.ANY,
@@ -739,6 +878,7 @@ class TestCase(unittest.TestCase):
                 mock.ANY,
                 [utils.get_data_files_path("ansible", "ip-allocation.yml")],
                 limit="seed",
+                barrier=True,
             ),
             mock.call(
                 mock.ANY,
@@ -1141,7 +1281,8 @@ class TestCase(unittest.TestCase):
                 mock.ANY,
                 utils.get_data_files_path(
                     "ansible", "ip-allocation.yml"),
-                limit="infra-vms"
+                limit="infra-vms",
+                barrier=True,
             ),
             mock.call(
                 mock.ANY,
@@ -1189,6 +1330,7 @@ class TestCase(unittest.TestCase):
                 mock.ANY,
                 [utils.get_data_files_path("ansible", "ip-allocation.yml")],
                 limit="infra-vms",
+                barrier=True,
             ),
             mock.call(
                 mock.ANY,
@@ -1216,6 +1358,7 @@ class TestCase(unittest.TestCase):
                 mock.ANY,
                 [utils.get_data_files_path("ansible", "ip-allocation.yml")],
                 limit="infra-vms",
+                barrier=True,
             ),
             mock.call(
                 mock.ANY,
@@ -1342,11 +1485,13 @@ class TestCase(unittest.TestCase):
                 mock.ANY,
                 utils.get_data_files_path(
                     "ansible", "overcloud-inventory-discover.yml"),
+                barrier=True,
             ),
             mock.call(
                 mock.ANY,
                 utils.get_data_files_path("ansible", "ip-allocation.yml"),
                 limit="overcloud",
+                barrier=True,
             ),
         ]
         self.assertListEqual(expected_calls, mock_run_one.call_args_list)
@@ -1507,6 +1652,7 @@ class TestCase(unittest.TestCase):
                 mock.ANY,
                 [utils.get_data_files_path("ansible", "ip-allocation.yml")],
                 limit="overcloud",
+                barrier=True,
             ),
             mock.call(
                 mock.ANY,
@@ -1534,6 +1680,7 @@ class TestCase(unittest.TestCase):
                 mock.ANY,
                 [utils.get_data_files_path("ansible", "ip-allocation.yml")],
                 limit="overcloud",
+                barrier=True,
             ),
             mock.call(
                 mock.ANY,
@@ -2675,170 +2822,161 @@ class TestHookDispatcher(unittest.TestCase):
 
     maxDiff = None
 
-    @mock.patch.object(os.path, 'realpath')
-    def test_hook_ordering(self, mock_realpath):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.addCleanup(hooks.HookIndex.clear)
+        patcher = mock.patch.dict(
+            os.environ, {"XDG_CACHE_HOME": os.path.join(self.tmpdir, "cache")})
+        patcher.start()
+        self.addCleanup(patcher.stop)
         mock_command = mock.MagicMock()
-        dispatcher = commands.HookDispatcher(command=mock_command)
-        dispatcher._find_hooks = mock.MagicMock()
+        mock_command.cmd_name = "overcloud host configure"
+        self.dispatcher = commands.HookDispatcher(command=mock_command)
+
+    def _create_hooks(self, env_path, names, target="pre",
+                      command="overcloud-host-configure"):
+        path = os.path.join(self.tmpdir, env_path, "hooks", command,
+                            "%s.d" % target)
+        os.makedirs(path, exist_ok=True)
+        for name in names:
+            with open(os.path.join(path, name), "w"):
+                pass
+        return path
+
+    def _paths(self, *env_paths):
+        return [os.path.join(self.tmpdir, env_path) for env_path in env_paths]
+
+    def test_hook_ordering(self):
         # Include multiple hook directories to show that they don't influence
         # the order.
-        dispatcher._find_hooks.return_value = [
-            "config/path/10-hook.yml",
-            "config/path/5-hook.yml",
-            "config/path/z-test-alphabetical.yml",
-            "env/path/10-before-hook.yml",
-            "env/path/5-multiple-dashes-in-name.yml",
-            "env/path/no-prefix.yml"
-        ]
+        config_hooks = self._create_hooks(
+            "config", ["10-hook.yml", "5-hook.yml",
+                       "z-test-alphabetical.yml"])
+        env_hooks = self._create_hooks(
+            "env", ["10-before-hook.yml", "5-multiple-dashes-in-name.yml",
+                    "no-prefix.yml"])
         expected_result = [
-            "config/path/5-hook.yml",
-            "env/path/5-multiple-dashes-in-name.yml",
-            "env/path/10-before-hook.yml",
-            "config/path/10-hook.yml",
-            "env/path/no-prefix.yml",
-            "config/path/z-test-alphabetical.yml",
-        ]
-        mock_realpath.side_effect = lambda x: x
-        actual = dispatcher.hooks(["config/path", "env/path"], "pre", None)
-        self.assertListEqual(actual, expected_result)
-
-    @mock.patch('kayobe.cli.commands.os.path')
-    def test_hook_filter_all(self, mock_path):
-        mock_command = mock.MagicMock()
-        dispatcher = commands.HookDispatcher(command=mock_command)
-        dispatcher._find_hooks = mock.MagicMock()
-        dispatcher._find_hooks.return_value = [
-            "5-hook.yml",
-            "5-multiple-dashes-in-name.yml",
-            "10-before-hook.yml",
-            "10-hook.yml",
-            "no-prefix.yml",
-            "z-test-alphabetical.yml",
-        ]
-        mock_path.realpath.side_effect = lambda x: x
-        actual = dispatcher.hooks(["config/path"], "pre", "all")
-        self.assertListEqual(actual, [])
-
-    @mock.patch('kayobe.cli.commands.os.path')
-    def test_hook_filter_one(self, mock_path):
-        mock_command = mock.MagicMock()
-        dispatcher = commands.HookDispatcher(command=mock_command)
-        dispatcher._find_hooks = mock.MagicMock()
-        dispatcher._find_hooks.return_value = [
-            "5-hook.yml",
-            "5-multiple-dashes-in-name.yml",
-            "10-before-hook.yml",
-            "10-hook.yml",
-            "no-prefix.yml",
-            "z-test-alphabetical.yml",
-        ]
+            os.path.join(config_hooks, "5-hook.yml"),
+            os.path.join(env_hooks, "5-multiple-dashes-in-name.yml"),
+            os.path.join(env_hooks, "10-before-hook.yml"),
+            os.path.join(config_hooks, "10-hook.yml"),
+            os.path.join(env_hooks, "no-prefix.yml"),
+            os.path.join(config_hooks, "z-test-alphabetical.yml"),
+        ]
+        actual = self.dispatcher.hooks(self._paths("config", "env"), "pre",
+                                       None)
+        self.assertListEqual(expected_result, actual)
+
+    def test_hook_symlinks(self):
+        playbook = os.path.join(self.tmpdir, "config", "ansible", "foo.yml")
+        os.makedirs(os.path.dirname(playbook))
+        with open(playbook, "w"):
+            pass
+        path = self._create_hooks("config", [])
+        os.symlink(playbook, os.path.join(path, "10-foo.yml"))
+        actual = self.dispatcher.hooks(self._paths("config"), "pre", None)
+        self.assertListEqual([playbook], actual)
+
+    def test_hook_filter_all(self):
+        self._create_hooks("config", ["5-hook.yml", "10-hook.yml"])
+        actual = self.dispatcher.hooks(self._paths("config"), "pre", "all")
+        self.assertListEqual([], actual)
+
+    def test_hook_filter_one(self):
+        path = self._create_hooks(
+            "config", ["5-hook.yml", "5-multiple-dashes-in-name.yml",
+                       "10-before-hook.yml", "10-hook.yml", "no-prefix.yml",
+                       "z-test-alphabetical.yml"])
         expected_result = [
-            "5-hook.yml",
-            "10-before-hook.yml",
-            "10-hook.yml",
-            "no-prefix.yml",
-            "z-test-alphabetical.yml",
-        ]
-        mock_path.realpath.side_effect = lambda x: x
-        actual = dispatcher.hooks(["config/path"], "pre",
-                                  "5-multiple-dashes-in-name.yml")
-        self.assertListEqual(actual, expected_result)
-
-    @mock.patch.object(glob, 'glob')
-    @mock.patch.object(os.path, 'exists')
-    def test__find_hooks(self, mock_exists, mock_glob):
-        mock_exists.return_value = True
-        mock_command = mock.MagicMock()
-        dispatcher = commands.HookDispatcher(command=mock_command)
-        mock_glob.return_value = [
-            "config/path/hooks/pre.d/1-hook.yml",
-            "config/path/hooks/pre.d/5-hook.yml",
-            "config/path/hooks/pre.d/10-hook.yml",
-        ]
+            os.path.join(path, "5-hook.yml"),
+            os.path.join(path, "10-before-hook.yml"),
+            os.path.join(path, "10-hook.yml"),
+            os.path.join(path, "no-prefix.yml"),
+            os.path.join(path, "z-test-alphabetical.yml"),
+        ]
+        actual = self.dispatcher.hooks(self._paths("config"), "pre",
+                                       "5-multiple-dashes-in-name.yml")
+        self.assertListEqual(expected_result, actual)
+
+    def test__find_hooks(self):
+        path = self._create_hooks(
+            "config", ["1-hook.yml", "5-hook.yml", "10-hook.yml",
+                       "not-a-hook.txt", ".hidden.yml"])
+        self._create_hooks("config", ["post-hook.yml"], target="post")
+        self._create_hooks("config", ["other-hook.yml"],
+                           command="control-host-bootstrap")
         expected_result = [
-            "config/path/hooks/pre.d/1-hook.yml",
-            "config/path/hooks/pre.d/10-hook.yml",
-            "config/path/hooks/pre.d/5-hook.yml",
-        ]
-        actual = dispatcher._find_hooks(["config/path"], "pre")
-        # Sort the result - it is not ordered at this stage.
-        actual.sort()
-        self.assertListEqual(actual, expected_result)
-
-    @mock.patch.object(glob, 'glob')
-    @mock.patch.object(os.path, 'exists')
-    def test__find_hooks_with_env(self, mock_exists, mock_glob):
-        mock_exists.return_value = True
-        mock_command = mock.MagicMock()
-        dispatcher = commands.HookDispatcher(command=mock_command)
-        mock_glob.side_effect = [
-            [
-                "config/path/hooks/pre.d/all.yml",
-                "config/path/hooks/pre.d/base-only.yml",
-            ],
-            [
-                "env/path/hooks/pre.d/all.yml",
-                "env/path/hooks/pre.d/env-only.yml",
-            ]
-        ]
+            os.path.join(path, "1-hook.yml"),
+            os.path.join(path, "5-hook.yml"),
+            os.path.join(path, "10-hook.yml"),
+        ]
+        actual = self.dispatcher._find_hooks(self._paths("config"), "pre")
+        self.assertListEqual(expected_result, [hook.path for hook in actual])
+        self.assertListEqual([1, 5, 10], [hook.sequence for hook in actual])
+
+    def test__find_hooks_with_env(self):
+        config_hooks = self._create_hooks(
+            "config", ["all.yml", "base-only.yml"])
+        env_hooks = self._create_hooks("env", ["all.yml", "env-only.yml"])
         expected_result = [
-            "config/path/hooks/pre.d/base-only.yml",
-            "env/path/hooks/pre.d/all.yml",
-            "env/path/hooks/pre.d/env-only.yml",
-        ]
-        actual = dispatcher._find_hooks(["config/path", "env/path"], "pre")
-        # Sort the result - it is not ordered at this stage.
-        actual.sort()
-        self.assertListEqual(actual, expected_result)
-
-    @mock.patch.object(glob, 'glob')
-    @mock.patch.object(os.path, 'exists')
-    def test__find_hooks_with_nested_envs(self, mock_exists, mock_glob):
-        mock_exists.return_value = True
-        mock_command = mock.MagicMock()
-        dispatcher = commands.HookDispatcher(command=mock_command)
-        mock_glob.side_effect = [
-            [
-                "config/path/hooks/pre.d/all.yml",
-                "config/path/hooks/pre.d/base-only.yml",
-                "config/path/hooks/pre.d/base-env1.yml",
-                "config/path/hooks/pre.d/base-env2.yml",
-            ],
-            [
-                "env1/path/hooks/pre.d/all.yml",
-                "env1/path/hooks/pre.d/env1-only.yml",
-                "env1/path/hooks/pre.d/base-env1.yml",
-                "env1/path/hooks/pre.d/env1-env2.yml",
-            ],
-            [
-                "env2/path/hooks/pre.d/all.yml",
-                "env2/path/hooks/pre.d/env2-only.yml",
-                "env2/path/hooks/pre.d/base-env2.yml",
-                "env2/path/hooks/pre.d/env1-env2.yml",
-            ]
-        ]
+            os.path.join(env_hooks, "all.yml"),
+            os.path.join(config_hooks, "base-only.yml"),
+            os.path.join(env_hooks, "env-only.yml"),
+        ]
+        actual = self.dispatcher._find_hooks(self._paths("config", "env"),
+                                             "pre")
+        self.assertListEqual(expected_result, [hook.path for hook in actual])
+
+    def test__find_hooks_with_nested_envs(self):
+        config_hooks = self._create_hooks(
+            "config", ["all.yml", "base-only.yml", "base-env1.yml",
+                       "base-env2.yml"])
+        env1_hooks = self._create_hooks(
+            "env1", ["all.yml", "env1-only.yml", "base-env1.yml",
+                     "env1-env2.yml"])
+        env2_hooks = self._create_hooks(
+            "env2", ["all.yml", "env2-only.yml", "base-env2.yml",
+                     "env1-env2.yml"])
         expected_result = [
-            "config/path/hooks/pre.d/base-only.yml",
-            "env1/path/hooks/pre.d/base-env1.yml",
-            "env1/path/hooks/pre.d/env1-only.yml",
-            "env2/path/hooks/pre.d/all.yml",
-            "env2/path/hooks/pre.d/base-env2.yml",
-            "env2/path/hooks/pre.d/env1-env2.yml",
-            "env2/path/hooks/pre.d/env2-only.yml",
-        ]
-        actual = dispatcher._find_hooks(["config/path", "env1/path",
-                                         "env2/path"], "pre")
-        # Sort the result - it is not ordered at this stage.
-        actual.sort()
-        self.assertListEqual(actual, expected_result)
-
-    @mock.patch.object(glob, 'glob')
-    @mock.patch.object(os.path, 'exists')
-    def test__find_hooks_non_existent(self, mock_exists, mock_glob):
-        mock_exists.return_value = False
-        mock_command = mock.MagicMock()
-        dispatcher = commands.HookDispatcher(command=mock_command)
-        expected_result = []
-        actual = dispatcher._find_hooks(["config/path"], "pre")
-        self.assertListEqual(actual, expected_result)
-        mock_glob.assert_not_called()
+            os.path.join(env2_hooks, "all.yml"),
+            os.path.join(env1_hooks, "base-env1.yml"),
+            os.path.join(env2_hooks, "base-env2.yml"),
+            os.path.join(config_hooks, "base-only.yml"),
+            os.path.join(env2_hooks, "env1-env2.yml"),
+            os.path.join(env1_hooks, "env1-only.yml"),
+            os.path.join(env2_hooks, "env2-only.yml"),
+        ]
+        actual = self.dispatcher._find_hooks(
+            self._paths("config", "env1", "env2"), "pre")
+        self.assertListEqual(expected_result, [hook.path for hook in actual])
+
+    def test__find_hooks_non_existent(self):
+        actual = self.dispatcher._find_hooks(self._paths("config"), "pre")
+        self.assertListEqual([], actual)
+
+    def test_hooks_list(self):
+        path = self._create_hooks("config", ["10-hook.yml", "other.yml"])
+        command = commands.HooksList(TestApp(), [])
+        parser = command.get_parser("test")
+        parsed_args = parser.parse_args(
+            ["--config-path", os.path.join(self.tmpdir, "config"),
+             "--skip-hooks", "other"])
+        columns, data = command.take_action(parsed_args)
+        self.assertEqual(("Command", "Target", "Sequence", "Path",
+                          "Resolved Path", "Skipped"), columns)
+        expected = [
+            ("overcloud-host-configure", "pre", 10,
+             os.path.join(path, "10-hook.yml"),
+             os.path.join(path, "10-hook.yml"), False),
+            ("overcloud-host-configure", "pre", None,
+             os.path.join(path, "other.yml"),
+             os.path.join(path, "other.yml"), True),
+        ]
+        self.assertListEqual(expected, data)
+
+        parsed_args = parser.parse_args(
+            ["--config-path", os.path.join(self.tmpdir, "config"),
+             "--command", "control host bootstrap"])
+        columns, data = command.take_action(parsed_args)
+        self.assertListEqual([], data)
@@ -0,0 +1,135 @@
+# Copyright (c) 2026 StackHPC Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import datetime
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from ansible import errors as ansible_errors
+from ansible.parsing.vault import VaultedValue
+from oslotest import base
+
+from kayobe.plugins.action import dump_hostvars
+
+
+CIPHERTEXT = "$ANSIBLE_VAULT;1.1;AES256\n6162630a"
+
+
+def _vaulted(value):
+    return VaultedValue(ciphertext=CIPHERTEXT).tag(value)
+
+
+class FakeHostVarsVars(object):
+    """Fake variables of a host, which template variables on access.
+
+    Templated values are looked up in a dict, and raised if they are
+    exceptions.
+    """
+
+    def __init__(self, variables, templated):
+        self.variables = variables
+        self.templated = templated
+
+    def __getitem__(self, name):
+        value = self.templated.get(name, self.variables[name])
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+
+class FakeHostVars(object):
+
+    def __init__(self, host, variables, templated):
+        self.host = host
+        self.variables = variables
+        self.templated = templated
+
+    def raw_get(self, host):
+        assert host == self.host
+        return self.variables
+
+    def __getitem__(self, host):
+        assert host == self.host
+        return FakeHostVarsVars(self.variables, self.templated)
+
+
+@mock.patch.object(dump_hostvars.action.ActionBase, 'run',
+                   mock.Mock(return_value={}))
+class DumpHostvarsTest(base.BaseTestCase):
+
+    def setUp(self):
+        super(DumpHostvarsTest, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.dest = os.path.join(self.tmpdir, "host1.json")
+        self.hostvars = {
+            "key1": _vaulted("secret"),
+            "key2": "value2",
+            "key3": [_vaulted("secret"), 1],
+            "key4": {"key5": _vaulted("secret"), "key6": None},
+            "key7": datetime.date(2026, 1, 2),
+        }
+        self.templated = {}
+
+    def _run(self, **args):
+        action = dump_hostvars.ActionModule.__new__(dump_hostvars.ActionModule)
+        action._task = mock.Mock(args=dict(args, dest=self.dest))
+        hostvars = FakeHostVars("host1", self.hostvars, self.templated)
+        task_vars = {"inventory_hostname": "host1", "hostvars": hostvars}
+        return action.run(task_vars=task_vars)
+
+    def _read(self):
+        with open(self.dest) as f:
+            return json.load(f)
+
+    def test_run(self):
+        result = self._run()
+        self.assertTrue(result["changed"])
+        expected = {
+            "key1": "******",
+            "key2": "value2",
+            "key3": ["******", 1],
+            "key4": {"key5": "******", "key6": None},
+            "key7": "2026-01-02",
+        }
+        self.assertEqual(expected, self._read())
+
+    def test_run_var_name(self):
+        self._run(var_name="key4")
+        self.assertEqual({"key5": "******", "key6": None}, self._read())
+
+    def test_run_var_name_undefined(self):
+        self.assertRaises(ansible_errors.AnsibleActionFail, self._run,
+                          var_name="key8")
+
+    def test_run_omitted(self):
+        self.templated["key2"] = ansible_errors.AnsibleValueOmittedError()
+        self._run()
+        self.assertNotIn("key2", self._read())
+        self.assertRaises(ansible_errors.AnsibleActionFail, self._run,
+                          var_name="key2")
+
+    def test_run_undefined(self):
+        # Variables which reference undefined variables are not templated.
+        self.hostvars["key2"] = "{{ ansible_facts.architecture }}"
+        self.templated["key2"] = ansible_errors.AnsibleUndefinedVariable()
+        self._run(var_name="key2")
+        self.assertEqual("{{ ansible_facts.architecture }}", self._read())
+
+    def test_run_not_serializable(self):
+        self.hostvars["key8"] = object()
+        self.assertRaises(ansible_errors.AnsibleActionFail, self._run)
@@ -0,0 +1,124 @@
+# Copyright (c) 2026 StackHPC Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from oslotest import base
+
+from kayobe.plugins.action import merge_batch
+
+
+def render(action, sources, merge_args, task_vars):
+    return "".join(sources) + merge_args.get('suffix', '')
+
+
+class FakeBatchAction(merge_batch.BatchMergeActionBase):
+
+    RENDER = render
+    MERGE_ARGS = frozenset(['suffix'])
+
+    def __init__(self, args):
+        self._task = mock.Mock(args=args)
+        self._connection = mock.Mock(transport="local")
+        self._play_context = mock.Mock(become=False)
+        self.copied = []
+
+    def _copy(self, src, params, task_vars):
+        with open(src) as f:
+            content = f.read()
+        with open(params['dest'], 'w') as f:
+            f.write(content)
+        os.chmod(params['dest'], int(params.get('mode', '0644'), 8))
+        self.copied.append(params)
+        return {'changed': True}
+
+
+@mock.patch.object(merge_batch.action.ActionBase, 'run',
+                   mock.Mock(return_value={}))
+class BatchMergeTest(base.BaseTestCase):
+
+    def setUp(self):
+        super(BatchMergeTest, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+
+    def _dest(self, name):
+        return os.path.join(self.tmpdir, name)
+
+    def _run(self, files, **args):
+        action = FakeBatchAction(dict(args, files=files))
+        return action, action.run(task_vars={})
+
+    def test_mode_matches(self):
+        self.assertTrue(merge_batch._mode_matches(None, "0644"))
+        self.assertTrue(merge_batch._mode_matches(0o640, "0640"))
+        self.assertTrue(merge_batch._mode_matches("0640", "0640"))
+        self.assertTrue(merge_batch._mode_matches("640", "0640"))
+        self.assertFalse(merge_batch._mode_matches("0600", "0640"))
+        self.assertFalse(merge_batch._mode_matches("u=rw", "0600"))
+
+    def test_id_matches(self):
+        self.assertTrue(merge_batch._id_matches(None, "root", 0))
+        self.assertTrue(merge_batch._id_matches("root", "root", 0))
+        self.assertTrue(merge_batch._id_matches(0, "root", 0))
+        self.assertFalse(merge_batch._id_matches("kolla", "root", 0))
+
+    def test_run(self):
+        files = [
+            {"sources": ["a", "b"], "dest": self._dest("1"), "params": {}},
+            {"sources": "c", "dest": self._dest("2"),
+             "params": {"suffix": "!", "mode": "0600"}},
+        ]
+        action, result = self._run(files, mode="0640")
+        self.assertTrue(result["changed"])
+        self.assertEqual([True, True],
+                         [f["changed"] for f in result["files"]])
+        self.assertEqual([{"dest": self._dest("1"), "mode": "0640"},
+                          {"dest": self._dest("2"), "mode": "0600"}],
+                         action.copied)
+        with open(self._dest("2")) as f:
+            self.assertEqual("c!", f.read())
+
+        # Unchanged files are not copied.
+        action, result = self._run(files, mode="0640")
+        self.assertFalse(result["changed"])
+        self.assertEqual([], action.copied)
+
+        # Changes to content and mode.
+        files[0]["sources"].append("d")
+        os.chmod(self._dest("2"), 0o644)
+        action, result = self._run(files, mode="0640")
+        self.assertTrue(result["changed"])
+        self.assertEqual(2, len(action.copied))
+
+    def test_run_unchecked_params(self):
+        files = [{"sources": ["a"], "dest": self._dest("1"), "params": {}}]
+        self._run(files)
+        action, result = self._run(files, backup=True)
+        self.assertTrue(result["files"][0]["changed"])
+        self.assertEqual(1, len(action.copied))
+
+    def test_run_copy_failed(self):
+        files = [{"sources": ["a"], "dest": self._dest("1"), "params": {}},
+                 {"sources": ["b"], "dest": self._dest("2"), "params": {}}]
+        action = FakeBatchAction({"files": files})
+        with mock.patch.object(action, "_copy",
+                               return_value={"failed": True, "msg": "oops"}):
+            result = action.run(task_vars={})
+        self.assertTrue(result["failed"])
+        self.assertIn("oops", result["msg"])
+        self.assertEqual(1, len(result["files"]))
@@ -0,0 +1,104 @@
+# Copyright (c) 2026 StackHPC Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import unittest
+
+from ansible import errors
+
+from kayobe.plugins.filter import container_images
+
+
+class TestContainerImageFilters(unittest.TestCase):
+
+    def test_container_image_refs(self):
+        containers = {
+            "squid": {"image": "docker.io/stackhpc/squid", "tag": "3.5"},
+            "squid2": {"image": "docker.io/stackhpc/squid", "tag": "3.5"},
+            "registry": {"image": "docker.io/library/registry"},
+        }
+        result = container_images.container_image_refs(containers)
+        self.assertEqual(["docker.io/library/registry:latest",
+                          "docker.io/stackhpc/squid:3.5"], result)
+
+    def test_container_image_refs_empty(self):
+        self.assertEqual([], container_images.container_image_refs({}))
+        self.assertEqual([], container_images.container_image_refs(None))
+
+    def test_container_image_refs_no_image(self):
+        self.assertRaises(errors.AnsibleFilterError,
+                          container_images.container_image_refs,
+                          {"squid": {"tag": "3.5"}})
+
+    def test_container_image_pull_plan(self):
+        host_images = {
+            "host1": ["a:1", "b:1"],
+            "host2": ["a:1", "a:1"],
+            "host3": [],
+        }
+        result = container_images.container_image_pull_plan(host_images)
+        expected = {
+            "hosts": 3,
+            "images": {"a:1": 2, "b:1": 1},
+            "pulls": 3,
+        }
+        self.assertEqual(expected, result)
+
+    def test_container_image_pull_report(self):
+        host_results = {
+            "host1": {
+                "start": 100.0,
+                "end": 102.0,
+                "images": [
+                    {"image": "a:1", "changed": True, "failed": False,
+                     "size": 3 * 10 ** 6},
+                    {"image": "b:1", "changed": False, "failed": False,
+                     "size": 10 ** 6},
+                ],
+            },
+            "host2": {
+                "failed": True,
+                "msg": "Failed to pull images: c:1 (unauthorized)",
+                "start": 101.0,
+                "end": 104.0,
+                "images": [
+                    {"image": "a:1", "changed": True, "failed": False,
+                     "size": 3 * 10 ** 6},
+                    {"image": "c:1", "changed": False, "failed": True,
+                     "size": 0, "msg": "unauthorized"},
+                ],
+            },
+            "host3": {"skipped": True},
+        }
+        result = container_images.container_image_pull_report(host_results)
+        expected = {
+            "pulled": 4,
+            "changed": 2,
+            "failed": [
+                {"host": "host2", "image": "c:1", "msg": "unauthorized"},
+            ],
+            "bytes": 6 * 10 ** 6,
+            "seconds": 4.0,
+            "images_per_second": 1.0,
+            "mb_per_second": 1.5,
+        }
+        self.assertEqual(expected, result)
+
+    def test_container_image_pull_report_module_failure(self):
+        host_results = {"host1": {"failed": True, "msg": "No such file"}}
+        result = container_images.container_image_pull_report(host_results)
+        self.assertEqual(
+            [{"host": "host1", "image": None, "msg": "No such file"}],
+            result["failed"])
+        self.assertEqual(0, result["seconds"])
+        self.assertEqual(0, result["images_per_second"])
@@ -0,0 +1,120 @@
+# Copyright (c) 2026 StackHPC Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import json
+import unittest
+
+from ansible import errors
+
+from kayobe.plugins.filter import kolla_build
+
+
+# Dependency tree in the format output by kolla-build --list-dependencies.
+DEPENDENCIES = {
+    "base": [
+        "cron",
+        {"openstack-base": [
+            {"nova-base": ["nova-api", "nova-compute"]},
+            {"glance-base": ["glance-api"]},
+            {"keystone-base": [{"keystone": ["keystone-ssh"]},
+                               "keystone-fernet"]},
+        ]},
+        {"mariadb-base": ["mariadb-server"]},
+    ],
+}
+
+
+class TestKollaBuildFilters(unittest.TestCase):
+
+    maxDiff = None
+
+    def test_get_chains(self):
+        parents = kolla_build._get_parents(json.dumps(DEPENDENCIES))
+        trunk, chains = kolla_build._get_chains(parents)
+        self.assertEqual({"base", "openstack-base", "nova-base",
+                          "keystone-base"}, trunk)
+        self.assertEqual([["cron"], ["glance-base", "glance-api"],
+                          ["keystone", "keystone-ssh"], ["keystone-fernet"],
+                          ["mariadb-base", "mariadb-server"], ["nova-api"],
+                          ["nova-compute"]], chains)
+
+    def test_schedule_hosts(self):
+        result = kolla_build.kolla_build_schedule(
+            json.dumps(DEPENDENCIES, indent=2), ["host1", "host2"], 2)
+        expected = {
+            "host1": {
+                "shared": ["base", "openstack-base", "nova-base"],
+                "slots": [["glance-base", "glance-api", "nova-api"],
+                          ["mariadb-base", "mariadb-server"]],
+            },
+            "host2": {
+                "shared": ["base", "openstack-base", "keystone-base",
+                           "nova-base"],
+                "slots": [["keystone", "keystone-ssh", "nova-compute"],
+                          ["cron", "keystone-fernet"]],
+            },
+        }
+        self.assertEqual(expected, result)
+
+    def test_schedule_single_slot(self):
+        # Output of older kolla-build releases, using pprint.
+        result = kolla_build.kolla_build_schedule(repr(DEPENDENCIES),
+                                                  ["host1"])
+        self.assertEqual(["base", "openstack-base", "keystone-base",
+                          "nova-base"], result["host1"]["shared"])
+        self.assertEqual(1, len(result["host1"]["slots"]))
+        self.assertEqual(10, len(result["host1"]["slots"][0]))
+
+    def test_schedule_chain(self):
+        result = kolla_build.kolla_build_schedule(
+            {"base": [{"openstack-base": ["nova-api"]}]}, ["host1", "host2"])
+        self.assertEqual({"shared": [],
+                          "slots": [["base", "openstack-base", "nova-api"]]},
+                         result["host1"])
+        self.assertEqual({"shared": [], "slots": []}, result["host2"])
+
+    def test_schedule_nothing_matched(self):
+        result = kolla_build.kolla_build_schedule("Nothing matched",
+                                                  ["host1"], 2)
+        self.assertEqual({"host1": {"shared": [], "slots": []}}, result)
+
+    def test_schedule_invalid(self):
+        self.assertRaises(errors.AnsibleFilterError,
+                          kolla_build.kolla_build_schedule, "{invalid",
+                          ["host1"])
+        self.assertRaises(errors.AnsibleFilterError,
+                          kolla_build.kolla_build_schedule, DEPENDENCIES,
+                          [], 1)
+
+    def test_report(self):
+        summaries = {
+            "host2": [json.dumps({"built": [{"name": "nova-api"}],
+                                  "failed": [{"name": "nova-compute",
+                                              "status": "push_error"}]})],
+            "host1": [
+                json.dumps({"built": [{"name": "base"},
+                                      {"name": "glance-api"}],
+                            "failed": []}),
+                # kolla-build failed before writing a summary.
+                "",
+            ],
+        }
+        expected = {
+            "built": ["base", "glance-api", "nova-api"],
+            "failed": [{"name": "nova-compute", "status": "push_error",
+                        "host": "host2"}],
+            "hosts": {"host1": {"built": 2, "failed": 0},
+                      "host2": {"built": 1, "failed": 1}},
+        }
+        self.assertEqual(expected, kolla_build.kolla_build_report(summaries))
@@ -220,3 +220,210 @@ class TestNetworks(BaseNetworksTest):
         interface = networks.net_physical_interface(self.context, "net1")
         expected = ['eth0']
         self.assertEqual(expected, interface)
+
+
+class TestHostNetworkModel(BaseNetworksTest):
+
+    names = ["net1", "net2", "net3", "net4", "net5"]
+
+    def _model(self, names=None):
+        return networks.get_host_network_model(
+            self.context, names or self.names)
+
+    def test_networks(self):
+        model = self._model()
+        self.assertEqual(self.names, [n.name for n in model.networks])
+        self.assertEqual(["eth0", "eth0.2", "br0", "br0.4", "br0.5"],
+                         [n.device for n in model.networks])
+        self.assertEqual(["ether", "ether", "bridge", "ether", "ether"],
+                         [n.type for n in model.networks])
+
+    def test_network_records_have_slots(self):
+        network = self._model().networks[0]
+        self.assertRaises(AttributeError, setattr, network, "foo", "bar")
+
+    def test_select(self):
+        model = self._model()
+        self.assertEqual(["net1", "net2", "net4", "net5"],
+                         [n.name for n in model.ethers])
+        self.assertEqual(["net3"], [n.name for n in model.bridges])
+        self.assertEqual([], model.bonds)
+        self.assertEqual(["net2", "net4", "net5"],
+                         [n.name for n in model.vlans])
+        self.assertEqual(["net2", "net4", "net5"],
+                         [n.name for n in model.vlan_interfaces])
+
+    def test_vlan_interfaces_parent(self):
+        self._update_context({"net6_interface": "vlan6",
+                              "net6_vlan": 6,
+                              "net6_parent": "eth1"})
+        model = self._model(["net6"])
+        network = model.networks[0]
+        self.assertTrue(network.is_vlan_interface)
+        self.assertEqual("eth1", network.vlan_parent)
+        self.assertEqual(["net6"], [n.name for n in model.vlan_interfaces])
+
+    def test_vlan_interfaces_no_interface(self):
+        model = self._model(["net1", "net6"])
+        self.assertIsNone(model.networks[1].is_vlan_interface)
+        self.assertRaises(errors.AnsibleFilterError,
+                          lambda: model.vlan_interfaces)
+
+    def test_interface_to_vlans(self):
+        interface_to_vlans = self._model().interface_to_vlans()
+        self.assertEqual(
+            {"eth0": ["net2"], "br0": ["net4", "net5"]},
+            {interface: [n.name for n in vlans]
+             for interface, vlans in interface_to_vlans.items()})
+
+    def test_bridge_mtus(self):
+        self._update_context({"net3_mtu": 9000})
+        self.assertEqual({"br0": 9000}, self._model().bridge_mtus())
+
+    def test_bridge_and_bond(self):
+        self._update_context({"net3_bond_slaves": ["eth2"]})
+        self.assertRaises(errors.AnsibleFilterError, self._model)
+
+    def test_cached(self):
+        self.assertIs(self._model(), self._model())
+        self.assertIsNot(self._model(), self._model(["net1"]))
+
+    def test_cache_per_context(self):
+        model = self._model()
+        self._update_context({})
+        self.assertIsNot(model, self._model())
+
+
+class TestNetworkConnectivity(BaseNetworksTest):
+
+    def setUp(self):
+        super(TestNetworkConnectivity, self).setUp()
+        ips = {
+            "net1_ips": {"host1": "10.0.0.1", "host2": "10.0.0.2",
+                         "host3": "10.0.0.3", "host4": "10.0.0.4"},
+            "net2_ips": {"host1": "10.0.1.1", "host3": "10.0.1.3"},
+        }
+        hostvars = {
+            "host1": dict(ips, network_interfaces=["net1", "net2"]),
+            "host2": dict(ips, network_interfaces=["net1", "net2"]),
+            "host3": dict(ips, network_interfaces=["net1", "net2"]),
+            "host4": dict(ips, network_interfaces=["net1"]),
+            "host5": dict(ips),
+        }
+        self.variables = dict(self.variables, hostvars=hostvars)
+        self._update_context({})
+        self.index = networks.net_membership_index(
+            self.context, ["host4", "host3", "host2", "host1", "host5"])
+
+    def test_net_membership_index(self):
+        expected = {
+            "net1": {
+                "hosts": ["host1", "host2", "host3", "host4"],
+                "ips": {"host1": "10.0.0.1", "host2": "10.0.0.2",
+                        "host3": "10.0.0.3", "host4": "10.0.0.4"},
+                "positions": {"host1": 0, "host2": 1, "host3": 2,
+                              "host4": 3},
+            },
+            # host2 has no IP on net2.
+            "net2": {
+                "hosts": ["host1", "host3"],
+                "ips": {"host1": "10.0.1.1", "host3": "10.0.1.3"},
+                "positions": {"host1": 0, "host3": 1},
+            },
+        }
+        self.assertEqual(expected, self.index)
+
+    def test_net_peers(self):
+        peers = networks.net_peers(self.index, "host4", ["net1", "net2"])
+        expected = [{"network": "net1", "host": "host1", "ip": "10.0.0.1"}]
+        self.assertEqual(expected, peers)
+
+    def test_net_peers_count(self):
+        peers = networks.net_peers(self.index, "host3", ["net1", "net2"], 2)
+        expected = [
+            {"network": "net1", "host": "host4", "ip": "10.0.0.4"},
+            {"network": "net1", "host": "host1", "ip": "10.0.0.1"},
+            {"network": "net2", "host": "host1", "ip": "10.0.1.1"},
+        ]
+        self.assertEqual(expected, peers)
+
+    def test_net_peers_all_covered(self):
+        # Each host is checked by count other hosts.
+        destinations = []
+        for host in ["host1", "host2", "host3", "host4"]:
+            peers = networks.net_peers(self.index, host, ["net1"], 2)
+            destinations.extend(peer["host"] for peer in peers)
+        self.assertEqual(["host1", "host1", "host2", "host2", "host3",
+                          "host3", "host4", "host4"], sorted(destinations))
+
+    def test_net_peers_not_member(self):
+        self.assertEqual([], networks.net_peers(self.index, "host2",
+                                                ["net2", "net3"]))
+
+    def test_net_connectivity_targets(self):
+        self.variables["hostvars"]["host2"].update(
+            {"net1_gateway": "10.0.0.254", "net1_mtu": 9000})
+        self._update_context({})
+        targets = networks.net_connectivity_targets(
+            self.context, self.index, ["net1", "net2", "net3"], 1, "host2")
+        expected = [
+            {"type": "gateway", "network": "net1", "destination": "gateway",
+             "address": "10.0.0.254", "mtu": 9000},
+            {"type": "host", "network": "net1", "destination": "host3",
+             "address": "10.0.0.3", "mtu": 9000},
+        ]
+        self.assertEqual(expected, targets)
+
+    def test_net_connectivity_targets_inventory_hostname(self):
+        self._update_context({"inventory_hostname": "host3"})
+        targets = networks.net_connectivity_targets(
+            self.context, self.index, ["net1", "net2"])
+        expected = [
+            {"type": "host", "network": "net1", "destination": "host4",
+             "address": "10.0.0.4", "mtu": None},
+            {"type": "host", "network": "net2", "destination": "host1",
+             "address": "10.0.1.1", "mtu": None},
+        ]
+        self.assertEqual(expected, targets)
+
+    def test_net_connectivity_matrix(self):
+        results = {
+            "host1": {"checks": [
+                {"type": "host", "network": "net1", "destination": "host2",
+                 "address": "10.0.0.2", "failed": False, "loss": 0.0,
+                 "rtt_avg": 0.5},
+                {"type": "host", "network": "net2", "destination": "host3",
+                 "address": "10.0.1.3", "failed": True, "loss": 100.0,
+                 "rtt_avg": None, "msg": "100% packet loss"},
+                {"type": "external", "address": "8.8.8.8", "failed": False,
+                 "loss": 0.0, "rtt_avg": 10.0},
+            ]},
+            "host2": {"checks": [
+                {"type": "gateway", "network": "net1",
+                 "destination": "gateway", "address": "10.0.0.254",
+                 "failed": False, "loss": 0.0, "rtt_avg": 1.5},
+            ]},
+            "host5": {"checks": []},
+            "host6": None,
+        }
+        expected = {
+            "matrix": {
+                "net1": {"host1": {"host2": True}},
+                "net2": {"host1": {"host3": False}},
+            },
+            "networks": {
+                "external": {"checked": 1, "failed": 0, "loss": 0.0,
+                             "rtt_avg": 10.0},
+                "net1": {"checked": 2, "failed": 0, "loss": 0.0,
+                         "rtt_avg": 1.0},
+                "net2": {"checked": 1, "failed": 1, "loss": 100.0,
+                         "rtt_avg": None},
+            },
+            "checked": 4,
+            "failed": [{"type": "host", "network": "net2",
+                        "source": "host1", "destination": "host3",
+                        "address": "10.0.1.3",
+                        "msg": "100% packet loss"}],
+        }
+        self.assertEqual(expected,
+                         networks.net_connectivity_matrix(results))
@@ -0,0 +1,146 @@
+# Copyright (c) 2026 StackHPC Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import importlib.util
+from pathlib import Path
+import unittest
+
+
+MODULE_PATH = (
+    Path(__file__).resolve().parents[5] / "ansible/filter_plugins/switches.py"
+)
+
+
+def _load_module():
+    spec = importlib.util.spec_from_file_location(
+        "kayobe_switches_filter_plugin", MODULE_PATH)
+    if spec is None or spec.loader is None:
+        raise RuntimeError("Failed to load switches filter plugin spec")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+switches = _load_module()
+
+
+class TestSwitchFilters(unittest.TestCase):
+
+    maxDiff = 2000
+
+    def setUp(self):
+        self.config = {
+            "Ethernet1/1": {"description": "compute0", "config": []},
+            "Ethernet1/2": {"description": "compute1", "config": []},
+            "Ethernet1/3": {"description": "compute1", "config": [],
+                            "ngs_trunk_port": False},
+            "Ethernet1/10": {"description": "controller0", "config": []},
+            "Ethernet2/1": {"description": "uplink", "config": [],
+                            "ngs_trunk_port": False},
+            "Port-Channel1": {"config": []},
+        }
+
+    def _names(self, selected):
+        return list(selected)
+
+    def test_index(self):
+        expected = {
+            "descriptions": {
+                "compute0": ["Ethernet1/1"],
+                "compute1": ["Ethernet1/2", "Ethernet1/3"],
+                "controller0": ["Ethernet1/10"],
+                "uplink": ["Ethernet2/1"],
+            },
+            "trunk": ["Ethernet1/1", "Ethernet1/2", "Ethernet1/10",
+                      "Port-Channel1"],
+            "access": ["Ethernet1/3", "Ethernet2/1"],
+        }
+        self.assertEqual(
+            expected, switches.switch_interface_config_index(self.config))
+
+    def test_select_name(self):
+        selected = switches.switch_interface_config_select_name(
+            self.config, ["Ethernet1/2", "Port-Channel1", "Ethernet9/9"])
+        self.assertEqual(["Ethernet1/2", "Port-Channel1"],
+                         self._names(selected))
+        self.assertEqual(self.config["Ethernet1/2"],
+                         selected["Ethernet1/2"])
+
+    def test_select_name_string(self):
+        selected = switches.switch_interface_config_select_name(
+            self.config, "Ethernet2/1")
+        self.assertEqual(["Ethernet2/1"], self._names(selected))
+
+    def test_select_name_range(self):
+        selected = switches.switch_interface_config_select_name(
+            self.config, ["Ethernet1/2-10"])
+        self.assertEqual(["Ethernet1/2", "Ethernet1/3", "Ethernet1/10"],
+                         self._names(selected))
+
+    def test_select_name_range_zero_padded(self):
+        config = {"xe-0/0/%02d" % i: {"config": []} for i in range(12)}
+        selected = switches.switch_interface_config_select_name(
+            config, "xe-0/0/08-10")
+        self.assertEqual(["xe-0/0/08", "xe-0/0/09", "xe-0/0/10"],
+                         self._names(selected))
+
+    def test_select_name_range_large(self):
+        # Ranges are matched numerically, rather than expanded.
+        selected = switches.switch_interface_config_select_name(
+            self.config, ["Ethernet1/3-99999999999999", "Ethernet9/1-2"])
+        self.assertEqual(["Ethernet1/3", "Ethernet1/10"],
+                         self._names(selected))
+
+    def test_select_name_regex(self):
+        selected = switches.switch_interface_config_select_name(
+            self.config, ["re:Ethernet1/1.*", "Ethernet2/1"])
+        self.assertEqual(["Ethernet1/1", "Ethernet1/10", "Ethernet2/1"],
+                         self._names(selected))
+
+    def test_select_description(self):
+        selected = switches.switch_interface_config_select_description(
+            self.config, ["compute1", "uplink", "controller0", "missing"])
+        # Interfaces which are not trunks are not selected.
+        self.assertEqual(["Ethernet1/2", "Ethernet1/10"],
+                         self._names(selected))
+
+    def test_select_description_regex(self):
+        selected = switches.switch_interface_config_select_description(
+            self.config, "re:compute\\d+")
+        self.assertEqual(["Ethernet1/1", "Ethernet1/2"],
+                         self._names(selected))
+
+    def test_select_description_no_range(self):
+        config = {"Ethernet1/1": {"description": "rack1-2", "config": []},
+                  "Ethernet1/2": {"description": "rack1", "config": []}}
+        selected = switches.switch_interface_config_select_description(
+            config, "rack1-2")
+        self.assertEqual(["Ethernet1/1"], self._names(selected))
+
+    def test_select_description_index(self):
+        index = switches.switch_interface_config_index(self.config)
+        selected = switches.switch_interface_config_select_description(
+            self.config, ["compute0", "compute1"], index=index)
+        self.assertEqual(["Ethernet1/1", "Ethernet1/2"],
+                         self._names(selected))
+
+    def test_select_trunk(self):
+        expected = ["Ethernet1/1", "Ethernet1/2", "Ethernet1/10",
+                    "Port-Channel1"]
+        selected = switches.switch_interface_config_select_trunk(self.config)
+        self.assertEqual(expected, self._names(selected))
+        index = switches.switch_interface_config_index(self.config)
+        selected = switches.switch_interface_config_select_trunk(
+            self.config, index=index)
+        self.assertEqual(expected, self._names(selected))
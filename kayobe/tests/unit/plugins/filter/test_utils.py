@@ -0,0 +1,82 @@
+# Copyright (c) 2026 StackHPC Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import unittest
+from unittest import mock
+
+import jinja2
+
+from ansible import errors
+from kayobe.plugins.filter import utils
+
+
+class TestGetHostvar(unittest.TestCase):
+
+    variables = {
+        "inventory_hostname": "test-host",
+        "net1_interface": "eth0",
+        "hostvars": {
+            "other-host": {
+                "net1_interface": "eth1",
+            },
+        },
+    }
+
+    def setUp(self):
+        # Bandit complains about Jinja2 autoescaping without nosec.
+        self.env = jinja2.Environment()  # nosec
+        self.context = self.env.context_class(
+            self.env, parent=self.variables, name='dummy', blocks={})
+
+    def test_get_hostvar(self):
+        self.assertEqual(
+            "eth0", utils.get_hostvar(self.context, "net1_interface"))
+
+    def test_get_hostvar_other_host(self):
+        self.assertEqual(
+            "eth1",
+            utils.get_hostvar(self.context, "net1_interface", "other-host"))
+
+    def test_get_hostvar_unknown_host(self):
+        self.assertRaises(errors.AnsibleFilterError, utils.get_hostvar,
+                          self.context, "net1_interface", "unknown-host")
+
+    def test_get_hostvar_cached(self):
+        with mock.patch.object(self.context, "get",
+                               wraps=self.context.get) as mock_get:
+            for _ in range(3):
+                self.assertEqual(
+                    "eth0", utils.get_hostvar(self.context, "net1_interface"))
+                self.assertIsNone(utils.get_hostvar(self.context, "missing"))
+        mock_get.assert_has_calls([mock.call("net1_interface"),
+                                   mock.call("missing")])
+        self.assertEqual(2, mock_get.call_count)
+
+    def test_get_hostvar_cache_per_context(self):
+        utils.get_hostvar(self.context, "net1_interface")
+        variables = dict(self.variables, net1_interface="eth2")
+        context = self.env.context_class(
+            self.env, parent=variables, name='dummy', blocks={})
+        self.assertEqual("eth2", utils.get_hostvar(context, "net1_interface"))
+
+    def test_clear_context_cache(self):
+        utils.get_hostvar(self.context, "net1_interface")
+        with mock.patch.object(self.context, "get",
+                               return_value="eth3") as mock_get:
+            self.assertEqual(
+                "eth0", utils.get_hostvar(self.context, "net1_interface"))
+            utils.clear_context_cache(self.context)
+            self.assertEqual(
+                "eth3", utils.get_hostvar(self.context, "net1_interface"))
+        mock_get.assert_called_once_with("net1_interface")
@@ -19,18 +19,17 @@ import os
 import os.path
 import shutil
 import subprocess
+import sys
 import tempfile
 import unittest
 from unittest import mock
 
 from kayobe import ansible
+from kayobe import daemon
 from kayobe import exception
 from kayobe import utils
 from kayobe import vault
 
-from ansible.parsing.vault import VaultSecret
-from ansible.parsing.vault import VaultSecretsContext
-
 
 @mock.patch.dict(os.environ, clear=True)
 class TestCase(unittest.TestCase):
@@ -325,6 +324,7 @@ class TestCase(unittest.TestCase):
             "ANSIBLE_ALLOW_BROKEN_CONDITIONALS": "true",
             "KAYOBE_CONFIG_PATH": "/path/to/config",
             "KAYOBE_ENVIRONMENT": "test-env",
+            "KAYOBE_ENVIRONMENT_ORDERING": mock.ANY,
             "ANSIBLE_ROLES_PATH": ":".join([
                 "/path/to/config/ansible/roles",
                 utils.get_data_files_path("ansible", "roles"),
@@ -406,6 +406,7 @@ class TestCase(unittest.TestCase):
             "ANSIBLE_ALLOW_BROKEN_CONDITIONALS": "true",
             "KAYOBE_CONFIG_PATH": "/path/to/config",
             "KAYOBE_ENVIRONMENT": "test-env",
+            "KAYOBE_ENVIRONMENT_ORDERING": mock.ANY,
             "KAYOBE_VAULT_PASSWORD": "test-pass",
             "ANSIBLE_ROLES_PATH": mock.ANY,
             "ANSIBLE_COLLECTIONS_PATH": mock.ANY,
@@ -730,10 +731,98 @@ class TestCase(unittest.TestCase):
         self.assertRaises(SystemExit,
                           ansible.run_playbooks, parsed_args, ["command"])
 
+    @mock.patch.object(utils, "run_command")
+    @mock.patch.object(daemon, "run_playbook")
+    @mock.patch.object(os.path, "exists")
+    @mock.patch.object(ansible, "_get_vars_files")
+    @mock.patch.object(ansible, "_validate_args")
+    def test_run_playbooks_daemon(self, mock_validate, mock_vars,
+                                  mock_exists, mock_daemon, mock_run):
+        parser = argparse.ArgumentParser()
+        ansible.add_args(parser)
+        vault.add_args(parser)
+        parsed_args = parser.parse_args([])
+        mock_vars.return_value = []
+        mock_exists.return_value = True
+        mock_daemon.return_value = 0
+        with mock.patch.dict(os.environ, {"KAYOBE_DAEMON_SOCKET": "/sock"}):
+            ansible.run_playbooks(parsed_args, ["playbook1.yml"])
+        mock_exists.assert_any_call("/sock")
+        mock_daemon.assert_called_once_with(
+            "/sock", mock.ANY, mock.ANY, stdout=None, stderr=None)
+        cmd = mock_daemon.call_args[0][1]
+        self.assertEqual("ansible-playbook", cmd[0])
+        self.assertEqual("playbook1.yml", cmd[-1])
+        self.assertFalse(mock_run.called)
+
+    @mock.patch.object(utils, "run_command")
+    @mock.patch.object(daemon, "run_playbook")
+    @mock.patch.object(os.path, "exists")
+    @mock.patch.object(ansible, "_get_vars_files")
+    @mock.patch.object(ansible, "_validate_args")
+    def test_run_playbooks_daemon_failure(self, mock_validate, mock_vars,
+                                          mock_exists, mock_daemon, mock_run):
+        parser = argparse.ArgumentParser()
+        ansible.add_args(parser)
+        vault.add_args(parser)
+        parsed_args = parser.parse_args([])
+        mock_vars.return_value = []
+        mock_exists.return_value = True
+        mock_daemon.return_value = 2
+        with mock.patch.dict(os.environ, {"KAYOBE_DAEMON_SOCKET": "/sock"}):
+            with self.assertRaises(SystemExit) as cm:
+                ansible.run_playbooks(parsed_args, ["playbook1.yml"])
+        self.assertEqual(2, cm.exception.code)
+        self.assertFalse(mock_run.called)
+
+    @mock.patch.object(utils, "run_command")
+    @mock.patch.object(daemon, "run_playbook")
+    @mock.patch.object(os.path, "exists")
+    @mock.patch.object(ansible, "_get_vars_files")
+    @mock.patch.object(ansible, "_validate_args")
+    def test_run_playbooks_daemon_fallback(self, mock_validate, mock_vars,
+                                           mock_exists, mock_daemon,
+                                           mock_run):
+        parser = argparse.ArgumentParser()
+        ansible.add_args(parser)
+        vault.add_args(parser)
+        parsed_args = parser.parse_args([])
+        mock_vars.return_value = []
+        mock_exists.return_value = True
+        # The daemon declined the request.
+        mock_daemon.return_value = None
+        with mock.patch.dict(os.environ, {"KAYOBE_DAEMON_SOCKET": "/sock"}):
+            ansible.run_playbooks(parsed_args, ["playbook1.yml"], quiet=True)
+        mock_daemon.assert_called_once_with(
+            "/sock", mock.ANY, mock.ANY, stdout=mock.ANY, stderr=mock.ANY)
+        mock_run.assert_called_once_with(mock.ANY, check_output=False,
+                                         quiet=True, env=mock.ANY)
+
+    @mock.patch.object(utils, "run_command")
+    @mock.patch.object(daemon, "run_playbook")
+    @mock.patch.object(os.path, "exists")
+    @mock.patch.object(ansible, "_get_vars_files")
+    @mock.patch.object(ansible, "_validate_args")
+    def test_run_playbooks_daemon_check_output(self, mock_validate, mock_vars,
+                                               mock_exists, mock_daemon,
+                                               mock_run):
+        parser = argparse.ArgumentParser()
+        ansible.add_args(parser)
+        vault.add_args(parser)
+        parsed_args = parser.parse_args([])
+        mock_vars.return_value = []
+        mock_exists.return_value = True
+        with mock.patch.dict(os.environ, {"KAYOBE_DAEMON_SOCKET": "/sock"}):
+            ansible.run_playbooks(parsed_args, ["playbook1.yml"],
+                                  check_output=True)
+        self.assertFalse(mock_daemon.called)
+        mock_run.assert_called_once_with(mock.ANY, check_output=True,
+                                         quiet=False, env=mock.ANY)
+
     @mock.patch.object(shutil, 'rmtree')
-    @mock.patch.object(utils, 'read_config_dump_yaml_file')
+    @mock.patch.object(utils, 'read_config_dump_json_file')
     @mock.patch.object(os, 'listdir')
-    @mock.patch.object(ansible, 'run_playbook')
+    @mock.patch.object(ansible, 'evaluate_hostvars')
     @mock.patch.object(tempfile, 'mkdtemp')
     def test_config_dump(self, mock_mkdtemp, mock_run, mock_listdir, mock_read,
                          mock_rmtree):
@@ -741,7 +830,7 @@ class TestCase(unittest.TestCase):
         parsed_args = parser.parse_args([])
         dump_dir = "/path/to/dump"
         mock_mkdtemp.return_value = dump_dir
-        mock_listdir.return_value = ["host1.yml", "host2.yml"]
+        mock_listdir.return_value = ["host2.json", "host1.json", "host3.yml"]
         mock_read.side_effect = [
             {"var1": "value1"},
             {"var2": "value2"}
@@ -759,83 +848,134 @@ class TestCase(unittest.TestCase):
                                          extra_vars={
                                              "dump_path": dump_dir,
                                          },
-                                         check_output=True, tags=None,
-                                         verbose_level=None, check=False,
-                                         list_tasks=False, diff=False)
+                                         tags=None, verbose_level=None)
         mock_rmtree.assert_called_once_with(dump_dir)
         mock_listdir.assert_any_call(dump_dir)
         mock_read.assert_has_calls([
-            mock.call(os.path.join(dump_dir, "host1.yml")),
-            mock.call(os.path.join(dump_dir, "host2.yml")),
+            mock.call(os.path.join(dump_dir, "host1.json")),
+            mock.call(os.path.join(dump_dir, "host2.json")),
         ])
 
     @mock.patch.object(shutil, 'rmtree')
-    @mock.patch.object(utils, 'read_file')
+    @mock.patch.object(utils, 'read_config_dump_json_file')
     @mock.patch.object(os, 'listdir')
-    @mock.patch.object(ansible, 'run_playbook')
+    @mock.patch.object(ansible, 'evaluate_hostvars')
+    @mock.patch.object(tempfile, 'mkdtemp')
+    def test_config_dump_host(self, mock_mkdtemp, mock_run, mock_listdir,
+                              mock_read, mock_rmtree):
+        parser = argparse.ArgumentParser()
+        parsed_args = parser.parse_args([])
+        dump_dir = "/path/to/dump"
+        mock_mkdtemp.return_value = dump_dir
+        mock_listdir.return_value = ["host1.json"]
+        mock_read.return_value = "value1"
+        result = ansible.config_dump(parsed_args, host="host1",
+                                     var_name="var1")
+        self.assertEqual("value1", result)
+        dump_config_path = utils.get_data_files_path(
+            "ansible", "dump-config.yml")
+        mock_run.assert_called_once_with(parsed_args,
+                                         dump_config_path,
+                                         extra_vars={
+                                             "dump_path": dump_dir,
+                                             "dump_hosts": "host1",
+                                             "dump_var_name": "var1",
+                                         },
+                                         tags=None, verbose_level=None)
+        mock_rmtree.assert_called_once_with(dump_dir)
+
+    @mock.patch.object(shutil, 'rmtree')
+    @mock.patch.object(utils, 'read_config_dump_json_file')
+    @mock.patch.object(os, 'listdir')
+    @mock.patch.object(ansible, 'evaluate_hostvars')
     @mock.patch.object(tempfile, 'mkdtemp')
-    def test_config_dump_vaulted(self, mock_mkdtemp, mock_run, mock_listdir,
-                                 mock_read, mock_rmtree):
+    def test_iter_config_dump(self, mock_mkdtemp, mock_run, mock_listdir,
+                              mock_read, mock_rmtree):
+        parser = argparse.ArgumentParser()
+        parsed_args = parser.parse_args([])
+        dump_dir = "/path/to/dump"
+        mock_mkdtemp.return_value = dump_dir
+        mock_listdir.return_value = ["host1.json", "host2.json"]
+        mock_read.side_effect = [{"var1": "value1"}, {"var2": "value2"}]
+        results = ansible.iter_config_dump(parsed_args, hosts="all")
+        self.assertFalse(mock_run.called)
+        self.assertEqual(("host1", {"var1": "value1"}), next(results))
+        self.assertEqual(1, mock_read.call_count)
+        self.assertFalse(mock_rmtree.called)
+        self.assertEqual([("host2", {"var2": "value2"})], list(results))
+        mock_rmtree.assert_called_once_with(dump_dir)
 
-        secret = VaultSecret(b'test-pass')
-        VaultSecretsContext.initialize(
-            VaultSecretsContext(secrets=[('default', secret)]))
+    @mock.patch.object(shutil, 'rmtree')
+    @mock.patch.object(utils, 'read_config_dump_json_file')
+    @mock.patch.object(os, 'listdir')
+    @mock.patch.object(ansible, 'evaluate_hostvars')
+    @mock.patch.object(ansible, 'run_playbook')
+    @mock.patch.object(tempfile, 'mkdtemp')
+    def test_config_dump_facts(self, mock_mkdtemp, mock_run, mock_evaluate,
+                               mock_listdir, mock_read, mock_rmtree):
         parser = argparse.ArgumentParser()
         parsed_args = parser.parse_args([])
         dump_dir = "/path/to/dump"
         mock_mkdtemp.return_value = dump_dir
-        mock_listdir.return_value = ["host1.yml", "host2.yml"]
-        config = """---
-key1: !vault |
-    $ANSIBLE_VAULT;1.1;AES256
-    65393836643335346138373665636564643436353231623838636261373565633731303835653139
-    6335343464383063373734636161323236636431316532650a333366333366396262353635313531
-    64666236636262326662323931313065376533333961356239363637333363623464666636616233
-    6130373664393533350a663266613165646565346433313536313461653236303563643262323936
-    6262
-key2: value2
-key3:
-  - !vault |
-    $ANSIBLE_VAULT;1.1;AES256
-    65393836643335346138373665636564643436353231623838636261373565633731303835653139
-    6335343464383063373734636161323236636431316532650a333366333366396262353635313531
-    64666236636262326662323931313065376533333961356239363637333363623464666636616233
-    6130373664393533350a663266613165646565346433313536313461653236303563643262323936
-    6262
-"""
-        config_nested = """---
-key1:
-  key2: !vault |
-    $ANSIBLE_VAULT;1.1;AES256
-    65393836643335346138373665636564643436353231623838636261373565633731303835653139
-    6335343464383063373734636161323236636431316532650a333366333366396262353635313531
-    64666236636262326662323931313065376533333961356239363637333363623464666636616233
-    6130373664393533350a663266613165646565346433313536313461653236303563643262323936
-    6262
-"""
-        mock_read.side_effect = [config, config_nested]
-        result = ansible.config_dump(parsed_args)
-        expected_result = {
-            "host1": {"key1": "******", "key2": "value2", "key3": ["******"]},
-            "host2": {"key1": {"key2": "******"}},
-        }
-        self.assertEqual(result, expected_result)
+        mock_listdir.return_value = ["host1.json"]
+        mock_read.return_value = {"ansible_facts": {}}
+        result = ansible.config_dump(parsed_args, facts="yes")
+        self.assertEqual({"host1": {"ansible_facts": {}}}, result)
         dump_config_path = utils.get_data_files_path(
             "ansible", "dump-config.yml")
         mock_run.assert_called_once_with(parsed_args,
                                          dump_config_path,
                                          extra_vars={
                                              "dump_path": dump_dir,
+                                             "dump_facts": "yes",
                                          },
                                          check_output=True, tags=None,
                                          verbose_level=None, check=False,
                                          list_tasks=False, diff=False)
-        mock_rmtree.assert_called_once_with(dump_dir)
-        mock_listdir.assert_any_call(dump_dir)
-        mock_read.assert_has_calls([
-            mock.call(os.path.join(dump_dir, "host1.yml")),
-            mock.call(os.path.join(dump_dir, "host2.yml")),
-        ])
+        self.assertFalse(mock_evaluate.called)
+
+    @mock.patch.object(utils, "run_command")
+    @mock.patch.object(ansible, "_run_daemon_playbook")
+    @mock.patch.object(ansible, "_get_vars_files")
+    @mock.patch.object(ansible, "_validate_args")
+    def test_evaluate_hostvars(self, mock_validate, mock_vars, mock_daemon,
+                               mock_run):
+        mock_vars.return_value = []
+        mock_daemon.return_value = None
+        parser = argparse.ArgumentParser()
+        ansible.add_args(parser)
+        vault.add_args(parser)
+        parsed_args = parser.parse_args([])
+        ansible.evaluate_hostvars(parsed_args, "dump-config.yml",
+                                  extra_vars={"dump_path": "/path/to/dump"})
+        expected_cmd = [
+            "kayobe-hostvars",
+            "--inventory", utils.get_data_files_path("ansible", "inventory"),
+            "--inventory", "/etc/kayobe/inventory",
+            "-e", "dump_path='/path/to/dump'",
+            "dump-config.yml",
+        ]
+        mock_daemon.assert_called_once_with(parsed_args, expected_cmd,
+                                            mock.ANY)
+        mock_run.assert_called_once_with(
+            [sys.executable, "-m", "kayobe.hostvars"] + expected_cmd[1:],
+            env=mock.ANY)
+
+    @mock.patch.object(utils, "run_command")
+    @mock.patch.object(ansible, "_run_daemon_playbook")
+    @mock.patch.object(ansible, "_get_vars_files")
+    @mock.patch.object(ansible, "_validate_args")
+    def test_evaluate_hostvars_daemon_failure(self, mock_validate, mock_vars,
+                                              mock_daemon, mock_run):
+        mock_vars.return_value = []
+        mock_daemon.return_value = 2
+        parser = argparse.ArgumentParser()
+        ansible.add_args(parser)
+        vault.add_args(parser)
+        parsed_args = parser.parse_args([])
+        self.assertRaises(SystemExit, ansible.evaluate_hostvars, parsed_args,
+                          "dump-config.yml")
+        self.assertFalse(mock_run.called)
 
     @mock.patch.object(utils, 'galaxy_role_install', autospec=True)
     @mock.patch.object(utils, 'is_readable_file', autospec=True)
@@ -1123,6 +1263,7 @@ key1:
             "ANSIBLE_ALLOW_BROKEN_CONDITIONALS": "true",
             "KAYOBE_CONFIG_PATH": "/etc/kayobe",
             "KAYOBE_ENVIRONMENT": "test-env",
+            "KAYOBE_ENVIRONMENT_ORDERING": mock.ANY,
             "ANSIBLE_ROLES_PATH": mock.ANY,
             "ANSIBLE_COLLECTIONS_PATH": mock.ANY,
             "ANSIBLE_ACTION_PLUGINS": mock.ANY,
@@ -1167,6 +1308,7 @@ key1:
             "ANSIBLE_ALLOW_BROKEN_CONDITIONALS": "true",
             "KAYOBE_CONFIG_PATH": "/etc/kayobe",
             "KAYOBE_ENVIRONMENT": "test-env",
+            "KAYOBE_ENVIRONMENT_ORDERING": mock.ANY,
             "ANSIBLE_ROLES_PATH": mock.ANY,
             "ANSIBLE_COLLECTIONS_PATH": mock.ANY,
             "ANSIBLE_ACTION_PLUGINS": mock.ANY,
@@ -1212,6 +1354,7 @@ key1:
             "ANSIBLE_ALLOW_BROKEN_CONDITIONALS": "true",
             "KAYOBE_CONFIG_PATH": "/etc/kayobe",
             "KAYOBE_ENVIRONMENT": "test-env",
+            "KAYOBE_ENVIRONMENT_ORDERING": mock.ANY,
             "ANSIBLE_ROLES_PATH": mock.ANY,
             "ANSIBLE_COLLECTIONS_PATH": mock.ANY,
             "ANSIBLE_ACTION_PLUGINS": mock.ANY,
@@ -1262,6 +1405,7 @@ key1:
             "ANSIBLE_ALLOW_BROKEN_CONDITIONALS": "true",
             "KAYOBE_CONFIG_PATH": "/etc/kayobe",
             "KAYOBE_ENVIRONMENT": "test-env",
+            "KAYOBE_ENVIRONMENT_ORDERING": mock.ANY,
             "ANSIBLE_ROLES_PATH": mock.ANY,
             "ANSIBLE_COLLECTIONS_PATH": mock.ANY,
             "ANSIBLE_ACTION_PLUGINS": mock.ANY,
@@ -1344,6 +1488,7 @@ key1:
             "ANSIBLE_ALLOW_BROKEN_CONDITIONALS": "true",
             "KAYOBE_CONFIG_PATH": "/etc/kayobe",
             "KAYOBE_ENVIRONMENT": "test-env",
+            "KAYOBE_ENVIRONMENT_ORDERING": mock.ANY,
             "ANSIBLE_ROLES_PATH": mock.ANY,
             "ANSIBLE_COLLECTIONS_PATH": mock.ANY,
             "ANSIBLE_ACTION_PLUGINS": mock.ANY,
@@ -1358,3 +1503,112 @@ key1:
              "/etc/kayobe/environments/dependency-env",
              "/etc/kayobe/environments/test-env"]
         )
+
+
+@mock.patch.object(ansible, "run_playbooks")
+@mock.patch.object(ansible, "_get_vars_files", lambda paths: [])
+class TestPlaybookPlan(unittest.TestCase):
+
+    def setUp(self):
+        parser = argparse.ArgumentParser()
+        ansible.add_args(parser)
+        vault.add_args(parser)
+        self.parser = parser
+        self.install = utils.get_data_files_path("ansible", "install.yml")
+        self.bootstrap = utils.get_data_files_path("ansible", "bootstrap.yml")
+        self.kolla = utils.get_data_files_path("ansible", "kolla-ansible.yml")
+
+    def test_merge(self, mock_run):
+        parsed_args = self.parser.parse_args([])
+        plan = ansible.PlaybookPlan(parsed_args)
+        plan.add([self.install], ignore_limit=True)
+        # ignore_limit has no effect without a limit.
+        plan.add([self.bootstrap])
+        plan.add([self.kolla], tags="install")
+        self.assertFalse(mock_run.called)
+        plan.flush()
+        expected_calls = [
+            mock.call(parsed_args, [self.install, self.bootstrap],
+                      ignore_limit=True),
+            mock.call(parsed_args, [self.kolla], tags="install"),
+        ]
+        self.assertListEqual(expected_calls, mock_run.call_args_list)
+        self.assertEqual([], plan.stages)
+
+    def test_merge_limit(self, mock_run):
+        parsed_args = self.parser.parse_args(["--limit", "host1"])
+        plan = ansible.PlaybookPlan(parsed_args)
+        plan.add([self.install], ignore_limit=True)
+        plan.add([self.bootstrap])
+        plan.add([self.kolla])
+        plan.flush()
+        expected_calls = [
+            mock.call(parsed_args, [self.install], ignore_limit=True),
+            mock.call(parsed_args, [self.bootstrap, self.kolla]),
+        ]
+        self.assertListEqual(expected_calls, mock_run.call_args_list)
+
+    def test_merge_external(self, mock_run):
+        parsed_args = self.parser.parse_args([])
+        plan = ansible.PlaybookPlan(parsed_args)
+        plan.add(["/etc/kayobe/hooks/pre.yml"])
+        plan.add([self.install])
+        plan.add(["/etc/kayobe/hooks/post1.yml"])
+        plan.add(["/etc/kayobe/hooks/post2.yml"])
+        plan.flush()
+        expected_calls = [
+            mock.call(parsed_args, ["/etc/kayobe/hooks/pre.yml"]),
+            mock.call(parsed_args, [self.install]),
+            mock.call(parsed_args, ["/etc/kayobe/hooks/post1.yml",
+                                    "/etc/kayobe/hooks/post2.yml"]),
+        ]
+        self.assertListEqual(expected_calls, mock_run.call_args_list)
+
+    def test_merge_quiet(self, mock_run):
+        parsed_args = self.parser.parse_args([])
+        plan = ansible.PlaybookPlan(parsed_args)
+        plan.add([self.install], quiet=True)
+        plan.add([self.bootstrap])
+        plan.flush()
+        self.assertEqual(2, mock_run.call_count)
+
+    def test_merge_barrier(self, mock_run):
+        parsed_args = self.parser.parse_args([])
+        plan = ansible.PlaybookPlan(parsed_args)
+        plan.add([self.install])
+        plan.add([self.bootstrap], barrier=True)
+        plan.add([self.kolla])
+        plan.flush()
+        expected_calls = [
+            mock.call(parsed_args, [self.install, self.bootstrap]),
+            mock.call(parsed_args, [self.kolla]),
+        ]
+        self.assertListEqual(expected_calls, mock_run.call_args_list)
+        self.assertEqual(set(), plan.barriers)
+
+    def test_check_output(self, mock_run):
+        parsed_args = self.parser.parse_args([])
+        plan = ansible.PlaybookPlan(parsed_args)
+        plan.add([self.install])
+        plan.add([self.bootstrap], check_output=True)
+        expected_calls = [
+            mock.call(parsed_args, [self.install]),
+            mock.call(parsed_args, [self.bootstrap], check_output=True),
+        ]
+        self.assertListEqual(expected_calls, mock_run.call_args_list)
+
+    def test_explain(self, mock_run):
+        parsed_args = self.parser.parse_args(["--explain-plan"])
+        plan = ansible.PlaybookPlan(parsed_args)
+        plan.add([self.install], ignore_limit=True)
+        plan.add([self.bootstrap])
+        with self.assertLogs("kayobe.ansible", logging.INFO) as logs:
+            plan.flush()
+        self.assertEqual(
+            ["INFO:kayobe.ansible:"
+             "Kayobe playbook plan: 2 stage(s) in 1 invocation(s)\n"
+             "  Invocation 1 (ignore_limit=True):\n"
+             "    Stage 1: install.yml\n"
+             "    Stage 2: bootstrap.yml"],
+            logs.output)
+        self.assertEqual(1, mock_run.call_count)
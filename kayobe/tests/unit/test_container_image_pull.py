@@ -0,0 +1,191 @@
+# Copyright (c) 2026 StackHPC Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import importlib.util
+from pathlib import Path
+import subprocess
+import threading
+import unittest
+from unittest import mock
+
+
+MODULE_PATH = (
+    Path(__file__).resolve().parents[3] /
+    "ansible/roles/manage-containers/library/container_image_pull.py"
+)
+
+
+class ModuleFailed(Exception):
+    def __init__(self, payload):
+        super().__init__(payload.get("msg", "module failed"))
+        self.payload = payload
+
+
+class ModuleExited(Exception):
+    def __init__(self, payload):
+        super().__init__("module exited")
+        self.payload = payload
+
+
+class FakeModule:
+    def __init__(self, params, check_mode=False):
+        self.params = params
+        self.check_mode = check_mode
+
+    def fail_json(self, **kwargs):
+        raise ModuleFailed(kwargs)
+
+    def exit_json(self, **kwargs):
+        raise ModuleExited(kwargs)
+
+
+class FakeEngine:
+    """Fake container engine CLI, tracking images and concurrent pulls."""
+
+    def __init__(self, images=None, fail=None, delay=0):
+        # Map from image reference to a tuple of ID and size.
+        self.images = dict(images or {})
+        # Map from image reference to number of pulls that fail.
+        self.fail = dict(fail or {})
+        self.delay = delay
+        self.pulls = []
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def run(self, cmd, **kwargs):
+        image = cmd[-1]
+        if cmd[1] == "image":
+            if image not in self.images:
+                return subprocess.CompletedProcess(cmd, 1, "", "No such image")
+            image_id, size = self.images[image]
+            return subprocess.CompletedProcess(
+                cmd, 0, "%s %d\n" % (image_id, size), "")
+        with self.lock:
+            self.pulls.append(image)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        # Avoid time.sleep, which is mocked to skip retry delays.
+        threading.Event().wait(self.delay)
+        with self.lock:
+            self.active -= 1
+            if self.fail.get(image):
+                self.fail[image] -= 1
+                return subprocess.CompletedProcess(cmd, 1, "", "unauthorized")
+            self.images[image] = ("sha256:new-" + image, 1000)
+        return subprocess.CompletedProcess(cmd, 0, "", "")
+
+
+class TestContainerImagePull(unittest.TestCase):
+
+    def _load_module(self):
+        spec = importlib.util.spec_from_file_location(
+            "kayobe_container_image_pull_module",
+            MODULE_PATH,
+        )
+        if spec is None or spec.loader is None:
+            raise RuntimeError("Failed to load container_image_pull spec")
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+
+    def _run(self, engine, params, check_mode=False):
+        module = self._load_module()
+        params = dict({"engine": "docker", "concurrency": 4, "retries": 2},
+                      **params)
+        fake_module = FakeModule(params, check_mode)
+        with mock.patch.object(
+            module, "AnsibleModule", return_value=fake_module
+        ):
+            with mock.patch.object(module.subprocess, "run", engine.run):
+                with mock.patch.object(module.time, "sleep"):
+                    module.run_module()
+
+    def test_pull(self):
+        engine = FakeEngine(images={"a:1": ("sha256:new-a:1", 1000),
+                                    "b:1": ("sha256:old", 500)})
+        with self.assertRaises(ModuleExited) as context:
+            self._run(engine, {"images": ["a:1", "b:1", "c:1", "a:1"]})
+
+        payload = context.exception.payload
+        self.assertTrue(payload["changed"])
+        self.assertLessEqual(payload["start"], payload["end"])
+        images = {image["image"]: image for image in payload["images"]}
+        self.assertEqual(["a:1", "b:1", "c:1"], list(images))
+        self.assertFalse(images["a:1"]["changed"])
+        self.assertTrue(images["b:1"]["changed"])
+        self.assertTrue(images["c:1"]["changed"])
+        self.assertEqual(1000, images["c:1"]["size"])
+        self.assertEqual(["a:1", "b:1", "c:1"], sorted(engine.pulls))
+
+    def test_pull_unchanged(self):
+        engine = FakeEngine(images={"a:1": ("sha256:new-a:1", 1000)})
+        with self.assertRaises(ModuleExited) as context:
+            self._run(engine, {"images": ["a:1"]})
+
+        self.assertFalse(context.exception.payload["changed"])
+
+    def test_pull_concurrency(self):
+        engine = FakeEngine(delay=0.05)
+        images = ["image%d:1" % i for i in range(6)]
+        with self.assertRaises(ModuleExited):
+            self._run(engine, {"images": images, "concurrency": 2})
+
+        self.assertEqual(sorted(images), sorted(engine.pulls))
+        self.assertEqual(2, engine.max_active)
+
+    def test_pull_retry(self):
+        engine = FakeEngine(fail={"a:1": 2})
+        with self.assertRaises(ModuleExited) as context:
+            self._run(engine, {"images": ["a:1"], "retries": 2})
+
+        image = context.exception.payload["images"][0]
+        self.assertFalse(image["failed"])
+        self.assertEqual(3, image["attempts"])
+
+    def test_pull_failure(self):
+        engine = FakeEngine(fail={"b:1": 3})
+        with self.assertRaises(ModuleFailed) as context:
+            self._run(engine, {"images": ["a:1", "b:1"], "retries": 1})
+
+        payload = context.exception.payload
+        self.assertEqual("Failed to pull images: b:1 (unauthorized)",
+                         payload["msg"])
+        images = {image["image"]: image for image in payload["images"]}
+        self.assertFalse(images["a:1"]["failed"])
+        self.assertTrue(images["b:1"]["failed"])
+        self.assertEqual(2, images["b:1"]["attempts"])
+
+    def test_pull_check_mode(self):
+        engine = FakeEngine(images={"a:1": ("sha256:old", 1000)})
+        with self.assertRaises(ModuleExited) as context:
+            self._run(engine, {"images": ["a:1", "b:1"]}, check_mode=True)
+
+        payload = context.exception.payload
+        self.assertTrue(payload["changed"])
+        self.assertEqual([False, True],
+                         [image["changed"] for image in payload["images"]])
+        self.assertEqual([], engine.pulls)
+
+    def test_pull_no_engine(self):
+        def run(cmd, **kwargs):
+            raise FileNotFoundError("No such file or directory: 'docker'")
+
+        engine = FakeEngine()
+        engine.run = run
+        with self.assertRaises(ModuleFailed) as context:
+            self._run(engine, {"images": ["a:1"], "retries": 0})
+
+        self.assertIn("No such file or directory",
+                      context.exception.payload["msg"])
@@ -0,0 +1,138 @@
+# Copyright (c) 2025 StackHPC Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from kayobe import daemon
+from kayobe import hostvars
+
+
+class TestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.socket_path = os.path.join(self.tmpdir, "kayobe.sock")
+        self.env = {"ANSIBLE_ROLES_PATH": "/roles", "FOO": "bar"}
+
+    def _serve_one(self, d):
+        """Handle a single request in a background thread."""
+        def serve():
+            conn, _ = d.sock.accept()
+            try:
+                d.handle(conn)
+            finally:
+                conn.close()
+        thread = threading.Thread(target=serve)
+        thread.start()
+        self.addCleanup(thread.join)
+
+    def _daemon(self):
+        d = daemon.PlaybookDaemon(self.socket_path, self.env)
+        d.listen()
+        self.addCleanup(d.close)
+        return d
+
+    @mock.patch.dict(os.environ, {"KAYOBE_DAEMON_SOCKET": "/path/to/sock"})
+    def test_get_socket_path_env(self):
+        result = daemon.get_socket_path("/etc/kayobe")
+        self.assertEqual("/path/to/sock", result)
+
+    @mock.patch.dict(os.environ, {"XDG_RUNTIME_DIR": "/run/user/1000"})
+    def test_get_socket_path(self):
+        os.environ.pop("KAYOBE_DAEMON_SOCKET", None)
+        result = daemon.get_socket_path("/etc/kayobe")
+        self.assertTrue(result.startswith("/run/user/1000/kayobe-"))
+        self.assertTrue(result.endswith(".sock"))
+        self.assertEqual(result, daemon.get_socket_path("/etc/kayobe"))
+        self.assertNotEqual(result,
+                            daemon.get_socket_path("/etc/kayobe", "env1"))
+
+    def test_run_playbook_no_socket(self):
+        result = daemon.run_playbook(self.socket_path,
+                                     ["ansible-playbook"], self.env)
+        self.assertIsNone(result)
+
+    def test_check_request(self):
+        d = daemon.PlaybookDaemon(self.socket_path, self.env)
+        request = {"cmd": ["ansible-playbook", "site.yml"],
+                   "env": dict(self.env, FOO="baz")}
+        self.assertIsNone(d.check_request(request))
+
+    def test_check_request_ansible_env(self):
+        d = daemon.PlaybookDaemon(self.socket_path, self.env)
+        request = {"cmd": ["ansible-playbook", "site.yml"],
+                   "env": dict(self.env, ANSIBLE_ROLES_PATH="/other")}
+        self.assertIsNotNone(d.check_request(request))
+
+    def test_check_request_config_changed(self):
+        config = os.path.join(self.tmpdir, "ansible.cfg")
+        with open(config, "w"):
+            pass
+        self.env["ANSIBLE_CONFIG"] = config
+        d = daemon.PlaybookDaemon(self.socket_path, self.env)
+        d.prepare()
+        request = {"cmd": ["ansible-playbook", "site.yml"], "env": self.env}
+        self.assertIsNone(d.check_request(request))
+        os.utime(config, (0, 0))
+        self.assertIsNotNone(d.check_request(request))
+
+    def test_check_request_command(self):
+        d = daemon.PlaybookDaemon(self.socket_path, self.env)
+        request = {"cmd": ["ansible", "all"], "env": self.env}
+        self.assertIsNotNone(d.check_request(request))
+
+    def test_check_request_hostvars(self):
+        d = daemon.PlaybookDaemon(self.socket_path, self.env)
+        request = {"cmd": ["kayobe-hostvars", "dump-config.yml"],
+                   "env": self.env}
+        self.assertIsNone(d.check_request(request))
+
+    @mock.patch.object(hostvars, "execute")
+    def test_execute_hostvars(self, mock_execute):
+        mock_execute.return_value = 0
+        cmd = ["kayobe-hostvars", "dump-config.yml"]
+        self.assertEqual(0, daemon.execute(cmd))
+        mock_execute.assert_called_once_with(cmd)
+
+    @mock.patch.object(daemon, "execute")
+    def test_run_playbook(self, mock_execute):
+        # The worker is a forked child, so report the command via its return
+        # code.
+        mock_execute.side_effect = lambda cmd: len(cmd)
+        d = self._daemon()
+        self._serve_one(d)
+        devnull = os.open(os.devnull, os.O_RDWR)
+        self.addCleanup(os.close, devnull)
+        result = daemon.run_playbook(self.socket_path,
+                                     ["ansible-playbook", "site.yml"],
+                                     self.env, stdin=devnull, stdout=devnull,
+                                     stderr=devnull)
+        self.assertEqual(2, result)
+        d._reap(None, None)
+
+    @mock.patch.object(daemon, "execute")
+    def test_run_playbook_rejected(self, mock_execute):
+        d = self._daemon()
+        self._serve_one(d)
+        env = dict(self.env, ANSIBLE_ROLES_PATH="/other")
+        result = daemon.run_playbook(self.socket_path,
+                                     ["ansible-playbook", "site.yml"], env)
+        self.assertIsNone(result)
+        self.assertFalse(mock_execute.called)
@@ -0,0 +1,116 @@
+# Copyright (c) 2026 StackHPC Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from kayobe import hooks
+
+
+class TestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.addCleanup(hooks.HookIndex.clear)
+        patcher = mock.patch.dict(
+            os.environ, {"XDG_CACHE_HOME": os.path.join(self.tmpdir, "cache")})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.config_path = os.path.join(self.tmpdir, "config")
+        self.env_paths = [self.config_path]
+        self.hooks_path = os.path.join(self.config_path, "hooks")
+
+    def _create_hook(self, command, target, name):
+        path = os.path.join(self.hooks_path, command, "%s.d" % target)
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, name), "w"):
+            pass
+
+    def _age(self):
+        # Make the hook directories old enough to be cached.
+        past = time.time() - 60
+        for root, dirs, _ in os.walk(self.hooks_path):
+            for path in [root] + [os.path.join(root, d) for d in dirs]:
+                os.utime(path, (past, past))
+
+    def test_split_sequence_number(self):
+        self.assertEqual((10, "foo.yml"),
+                         hooks.split_sequence_number("/a/10-foo.yml"))
+        self.assertEqual((sys.maxsize, "foo-bar.yml"),
+                         hooks.split_sequence_number("foo-bar.yml"))
+        self.assertEqual((sys.maxsize, "foo.yml"),
+                         hooks.split_sequence_number("foo.yml"))
+
+    def test_build(self):
+        self._create_hook("control-host-bootstrap", "pre", "b.yml")
+        self._create_hook("control-host-bootstrap", "post", "1-a.yml")
+        self._create_hook("overcloud-host-configure", "pre", "2-c.yml")
+        index = hooks.HookIndex.build(self.env_paths)
+        self.assertEqual(["control-host-bootstrap",
+                          "overcloud-host-configure"], index.commands())
+        path = os.path.join(self.hooks_path, "control-host-bootstrap",
+                            "post.d", "1-a.yml")
+        self.assertEqual([hooks.Hook(1, "a.yml", path, path)],
+                         index.get("control-host-bootstrap", "post"))
+        self.assertEqual([], index.get("seed-host-configure", "pre"))
+
+    @mock.patch.object(hooks.HookIndex, "build",
+                       wraps=hooks.HookIndex.build)
+    def test_load(self, mock_build):
+        self._create_hook("control-host-bootstrap", "pre", "a.yml")
+        self._age()
+        index = hooks.HookIndex.load(self.env_paths)
+        self.assertEqual(1, len(index.get("control-host-bootstrap", "pre")))
+        self.assertEqual(1, mock_build.call_count)
+
+        # Reused from memory.
+        self.assertIs(index, hooks.HookIndex.load(self.env_paths))
+        self.assertEqual(1, mock_build.call_count)
+
+        # Reused from the cache file.
+        hooks.HookIndex.clear()
+        self.assertEqual(index.get("control-host-bootstrap", "pre"),
+                         hooks.HookIndex.load(self.env_paths).get(
+                             "control-host-bootstrap", "pre"))
+        self.assertEqual(1, mock_build.call_count)
+
+        # Rebuilt after adding a hook.
+        self._create_hook("control-host-bootstrap", "pre", "b.yml")
+        index = hooks.HookIndex.load(self.env_paths)
+        self.assertEqual(2, len(index.get("control-host-bootstrap", "pre")))
+        self.assertEqual(2, mock_build.call_count)
+
+    @mock.patch.object(hooks.HookIndex, "build",
+                       wraps=hooks.HookIndex.build)
+    def test_load_recently_modified(self, mock_build):
+        # Directories modified during the scan are not cached.
+        self._create_hook("control-host-bootstrap", "pre", "a.yml")
+        hooks.HookIndex.load(self.env_paths)
+        hooks.HookIndex.load(self.env_paths)
+        self.assertEqual(2, mock_build.call_count)
+        self.assertFalse(os.path.exists(os.path.join(self.tmpdir, "cache")))
+
+    def test_load_new_command(self):
+        self._create_hook("control-host-bootstrap", "pre", "a.yml")
+        self._age()
+        hooks.HookIndex.load(self.env_paths)
+        self._create_hook("seed-host-configure", "post", "a.yml")
+        index = hooks.HookIndex.load(self.env_paths)
+        self.assertEqual(1, len(index.get("seed-host-configure", "post")))
@@ -0,0 +1,74 @@
+# Copyright (c) 2026 StackHPC Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from ansible import errors
+
+from kayobe import hostvars
+from kayobe import utils
+
+
+class TestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.dump_path = os.path.join(self.tmpdir, "dump")
+        inventory = os.path.join(self.tmpdir, "inventory")
+        os.makedirs(os.path.join(inventory, "group_vars"))
+        with open(os.path.join(inventory, "hosts"), "w") as f:
+            f.write("[controllers]\nctl0\nctl1\n\n[compute]\ncmp0\n")
+        with open(os.path.join(inventory, "group_vars", "all"), "w") as f:
+            f.write("var1: \"{{ inventory_hostname }}-{{ var2 }}\"\n"
+                    "var2: 42\n"
+                    "var3: \"{{ undefined_var }}\"\n")
+        self.playbook = utils.get_data_files_path("ansible",
+                                                  "dump-config.yml")
+        self.args = ["--inventory", inventory,
+                     "-e", "dump_path=%s" % self.dump_path]
+
+    def _read(self, host):
+        with open(os.path.join(self.dump_path, "%s.json" % host)) as f:
+            return json.load(f)
+
+    def test_main_var_name(self):
+        # Ansible initialises global state when parsing arguments, so run the
+        # evaluation in a new interpreter as Kayobe does.
+        args = self.args + ["-e", "dump_hosts=controllers",
+                            "-e", "dump_var_name=var1", "--limit", "ctl1",
+                            self.playbook]
+        subprocess.run([sys.executable, "-m", "kayobe.hostvars"] + args,
+                       check=True, stdin=subprocess.DEVNULL,
+                       capture_output=True)
+        self.assertEqual(["ctl1.json"], os.listdir(self.dump_path))
+        self.assertEqual("ctl1-42", self._read("ctl1"))
+
+    @mock.patch.object(hostvars, "dump")
+    @mock.patch("ansible.cli.CLI.run")
+    @mock.patch("ansible.cli.check_blocking_io")
+    def test_execute_failure(self, mock_check, mock_run, mock_dump):
+        mock_dump.side_effect = errors.AnsibleUndefinedVariable("undefined")
+        cmd = ["kayobe-hostvars"] + self.args + [self.playbook]
+        self.assertEqual(1, hostvars.execute(cmd))
+        playbook_cli = mock_run.call_args[0][0]
+        self.assertEqual(["ansible-playbook"] + cmd[1:], playbook_cli.args)
+        mock_dump.assert_called_once_with(playbook_cli)
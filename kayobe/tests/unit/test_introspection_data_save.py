@@ -0,0 +1,209 @@
+# Copyright (c) 2026 StackHPC Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import importlib.util
+import io
+import json
+import os
+from pathlib import Path
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import yaml
+
+
+ROLE_PATH = (
+    Path(__file__).resolve().parents[3] /
+    "ansible/roles/introspection-data-save"
+)
+
+
+def _load(name, path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    if spec is None or spec.loader is None:
+        raise RuntimeError("Failed to load %s spec" % path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class ModuleFailed(Exception):
+    def __init__(self, payload):
+        super().__init__(payload.get("msg", "module failed"))
+        self.payload = payload
+
+
+class ModuleExited(Exception):
+    def __init__(self, payload):
+        super().__init__("module exited")
+        self.payload = payload
+
+
+class FakeModule:
+    def __init__(self, params, check_mode=False):
+        self.params = params
+        self.check_mode = check_mode
+
+    def fail_json(self, **kwargs):
+        raise ModuleFailed(kwargs)
+
+    def exit_json(self, **kwargs):
+        raise ModuleExited(kwargs)
+
+
+class FakeResponse:
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.text = json.dumps(body)
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class TestExportIntrospectionData(unittest.TestCase):
+
+    def setUp(self):
+        self.script = _load("kayobe_export_introspection_data",
+                            ROLE_PATH / "files/export-introspection-data.py")
+
+    def _get(self, url, microversion=None, raise_exc=True):
+        self.assertEqual("1.81", microversion)
+        self.assertFalse(raise_exc)
+        name = url.split("/")[2]
+        if name == "missing":
+            return FakeResponse(404, {"error_message": "Not found"})
+        return FakeResponse(200, {"inventory": {"name": name}})
+
+    def test_export(self):
+        conn = mock.Mock()
+        conn.baremetal.get.side_effect = self._get
+        out = io.StringIO()
+        self.script.export(conn, ["node0", "node1", "missing"], 2, out)
+
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        records = {record["name"]: record for record in records}
+        self.assertEqual({"name": "node0",
+                          "data": {"inventory": {"name": "node0"}}},
+                         records["node0"])
+        self.assertEqual({"name": "node1",
+                          "data": {"inventory": {"name": "node1"}}},
+                         records["node1"])
+        self.assertEqual("missing", records["missing"]["name"])
+        self.assertIn("HTTP 404", records["missing"]["error"])
+        self.assertEqual(3, conn.baremetal.get.call_count)
+
+
+class TestIntrospectionDataSave(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        self.output_dir = os.path.join(self.path, "output")
+        self.src = os.path.join(self.path, "introspection-data.ndjson")
+        self._write_src("\n".join([
+            "WARNING: some noise",
+            json.dumps({"name": "node0", "data": {"cpu": {"count": 2}}}),
+            json.dumps({"name": "node1", "data": {"cpu": {"count": 4}}}),
+            json.dumps({"name": "node2", "error": "HTTP 404: Not found"}),
+        ]))
+
+    def _write_src(self, data):
+        with open(self.src, "w") as f:
+            f.write(data)
+
+    def _run(self, check_mode=False, **params):
+        module = _load("kayobe_introspection_data_save_module",
+                       ROLE_PATH / "library/introspection_data_save.py")
+        params = dict({"src": self.src, "nodes": [],
+                       "path": self.output_dir, "format": "json",
+                       "concurrency": 2}, **params)
+        fake_module = FakeModule(params, check_mode)
+        with mock.patch.object(
+            module, "AnsibleModule", return_value=fake_module
+        ):
+            module.run_module()
+
+    def _read(self, name):
+        with open(os.path.join(self.output_dir, name)) as f:
+            return f.read()
+
+    def test_save_json(self):
+        with self.assertRaises(ModuleExited) as context:
+            self._run(nodes=["node0", "node1", "node2", "node3"])
+
+        payload = context.exception.payload
+        self.assertTrue(payload["changed"])
+        self.assertEqual(["node0", "node1"], payload["saved"])
+        self.assertEqual({"node2": "HTTP 404: Not found",
+                          "node3": "No introspection data returned"},
+                         payload["failed_nodes"])
+        self.assertEqual(['node0.json', 'node1.json'],
+                         sorted(os.listdir(self.output_dir)))
+        self.assertEqual('{\n    "cpu": {\n        "count": 2\n    }\n}',
+                         self._read("node0.json"))
+
+    def test_save_yaml(self):
+        with self.assertRaises(ModuleExited):
+            self._run(format="yaml")
+
+        self.assertEqual({"cpu": {"count": 4}},
+                         yaml.safe_load(self._read("node1.yaml")))
+
+    def test_save_unchanged(self):
+        with self.assertRaises(ModuleExited):
+            self._run()
+        with self.assertRaises(ModuleExited) as context:
+            self._run()
+
+        payload = context.exception.payload
+        self.assertFalse(payload["changed"])
+        self.assertEqual(["node0", "node1"], payload["saved"])
+
+    def test_save_check_mode(self):
+        with self.assertRaises(ModuleExited) as context:
+            self._run(check_mode=True)
+
+        self.assertTrue(context.exception.payload["changed"])
+        self.assertFalse(os.path.exists(self.output_dir))
+
+    def test_save_many(self):
+        names = ["node%d" % i for i in range(20)]
+        self._write_src("\n".join(
+            json.dumps({"name": name, "data": {"name": name}})
+            for name in names))
+        with self.assertRaises(ModuleExited) as context:
+            self._run(nodes=names)
+
+        payload = context.exception.payload
+        self.assertEqual(sorted(names), payload["saved"])
+        self.assertEqual({}, payload["failed_nodes"])
+        self.assertEqual({"name": "node19"},
+                         json.loads(self._read("node19.json")))
+
+    def test_save_no_src(self):
+        with self.assertRaises(ModuleFailed) as context:
+            self._run(src=os.path.join(self.path, "missing"))
+
+        self.assertIn("Failed to read introspection data",
+                      context.exception.payload["msg"])
+
+    def test_save_invalid(self):
+        self._write_src("{invalid")
+        with self.assertRaises(ModuleFailed) as context:
+            self._run()
+
+        self.assertIn("Failed to parse introspection data",
+                      context.exception.payload["msg"])
@@ -0,0 +1,219 @@
+# Copyright (c) 2026 StackHPC Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import importlib.util
+import os
+from pathlib import Path
+import shutil
+import tempfile
+import unittest
+
+import yaml
+
+
+MODULE_PATH = (
+    Path(__file__).resolve().parents[3] /
+    "ansible/roles/ip-allocation/library/ip_allocation.py"
+)
+
+
+class ModuleFailed(Exception):
+    def __init__(self, payload):
+        super().__init__(payload.get("msg", "module failed"))
+        self.payload = payload
+
+
+class FakeModule:
+    def __init__(self, params, check_mode=False):
+        self.params = params
+        self.check_mode = check_mode
+
+    def fail_json(self, **kwargs):
+        raise ModuleFailed(kwargs)
+
+
+class TestIPAllocation(unittest.TestCase):
+
+    def setUp(self):
+        self.module = self._load_module()
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.allocation_file = os.path.join(self.tmpdir,
+                                            "network-allocation.yml")
+
+    def _load_module(self):
+        spec = importlib.util.spec_from_file_location(
+            "kayobe_ip_allocation_module",
+            MODULE_PATH,
+        )
+        if spec is None or spec.loader is None:
+            raise RuntimeError("Failed to load ip_allocation module spec")
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+
+    def _params(self, **kwargs):
+        params = {
+            "net_name": None,
+            "hostname": None,
+            "cidr": None,
+            "allocation_pool_start": None,
+            "allocation_pool_end": None,
+            "allocation_file": self.allocation_file,
+            "allocations": None,
+        }
+        params.update(kwargs)
+        return params
+
+    def _write(self, allocations):
+        with open(self.allocation_file, "w") as f:
+            yaml.dump(allocations, f)
+
+    def _read(self):
+        with open(self.allocation_file) as f:
+            return yaml.safe_load(f)
+
+    def test_allocate_single(self):
+        self._write({"net1_ips": {"host1": "10.0.0.1"}})
+        params = self._params(net_name="net1", hostname="host2",
+                              cidr="10.0.0.0/24")
+        result = self.module.allocate(FakeModule(params))
+        self.assertEqual({"changed": True, "ip": "10.0.0.2"}, result)
+        expected = {"net1_ips": {"host1": "10.0.0.1", "host2": "10.0.0.2"}}
+        self.assertEqual(expected, self._read())
+
+    def test_allocate_batch(self):
+        self._write({"net1_ips": {"host1": "10.0.0.1"}})
+        params = self._params(allocations={
+            "host1": [
+                {"net_name": "net1", "cidr": "10.0.0.0/24"},
+            ],
+            "host2": [
+                {"net_name": "net1", "cidr": "10.0.0.0/24"},
+                {"net_name": "net2", "cidr": "10.0.1.0/24",
+                 "allocation_pool_start": "10.0.1.10",
+                 "allocation_pool_end": "10.0.1.20"},
+            ],
+            "host3": [
+                {"net_name": "net2", "cidr": "10.0.1.0/24",
+                 "allocation_pool_start": "10.0.1.10",
+                 "allocation_pool_end": "10.0.1.20"},
+            ],
+            "host4": [],
+        })
+        result = self.module.allocate(FakeModule(params))
+        expected_ips = {
+            "host1": {"net1": "10.0.0.1"},
+            "host2": {"net1": "10.0.0.2", "net2": "10.0.1.10"},
+            "host3": {"net2": "10.0.1.11"},
+            "host4": {},
+        }
+        self.assertEqual({"changed": True, "ips": expected_ips}, result)
+        expected = {
+            "net1_ips": {"host1": "10.0.0.1", "host2": "10.0.0.2"},
+            "net2_ips": {"host2": "10.0.1.10", "host3": "10.0.1.11"},
+        }
+        self.assertEqual(expected, self._read())
+        # Only the allocation file should remain.
+        self.assertEqual(["network-allocation.yml"], os.listdir(self.tmpdir))
+
+    def test_allocate_batch_no_change(self):
+        self._write({"net1_ips": {"host1": "10.0.0.1"}})
+        mtime = os.stat(self.allocation_file).st_mtime_ns
+        params = self._params(allocations={
+            "host1": [{"net_name": "net1", "cidr": "10.0.0.0/24"}],
+        })
+        result = self.module.allocate(FakeModule(params))
+        self.assertEqual(
+            {"changed": False, "ips": {"host1": {"net1": "10.0.0.1"}}},
+            result)
+        self.assertEqual(mtime, os.stat(self.allocation_file).st_mtime_ns)
+
+    def test_allocate_batch_check_mode(self):
+        params = self._params(allocations={
+            "host1": [{"net_name": "net1", "cidr": "10.0.0.0/24"}],
+        })
+        result = self.module.allocate(FakeModule(params, check_mode=True))
+        self.assertEqual(
+            {"changed": True, "ips": {"host1": {"net1": "10.0.0.1"}}},
+            result)
+        self.assertFalse(os.path.exists(self.allocation_file))
+
+    def test_allocate_batch_exhausted(self):
+        params = self._params(allocations={
+            "host1": [{"net_name": "net1", "cidr": "10.0.0.0/30"}],
+            "host2": [{"net_name": "net1", "cidr": "10.0.0.0/30"}],
+            "host3": [{"net_name": "net1", "cidr": "10.0.0.0/30"}],
+        })
+        with self.assertRaises(ModuleFailed) as context:
+            self.module.allocate(FakeModule(params))
+        self.assertIn("No unallocated IP addresses for host3 in net1",
+                      context.exception.payload["msg"])
+        self.assertFalse(os.path.exists(self.allocation_file))
+
+    def test_allocate_skips_allocated(self):
+        self._write({"net1_ips": {"host1": "10.0.0.1", "host2": "10.0.0.3"}})
+        params = self._params(allocations={
+            "host3": [{"net_name": "net1", "cidr": "10.0.0.0/24"}],
+            "host4": [{"net_name": "net1", "cidr": "10.0.0.0/24"}],
+            "host5": [{"net_name": "net1", "cidr": "10.0.0.0/24"}],
+        })
+        result = self.module.allocate(FakeModule(params))
+        expected_ips = {
+            "host3": {"net1": "10.0.0.2"},
+            "host4": {"net1": "10.0.0.4"},
+            "host5": {"net1": "10.0.0.5"},
+        }
+        self.assertEqual(expected_ips, result["ips"])
+
+    def test_allocate_point_to_point(self):
+        params = self._params(allocations={
+            "host1": [{"net_name": "net1", "cidr": "10.0.0.0/31"}],
+            "host2": [{"net_name": "net1", "cidr": "10.0.0.0/31"}],
+        })
+        result = self.module.allocate(FakeModule(params))
+        expected_ips = {
+            "host1": {"net1": "10.0.0.0"},
+            "host2": {"net1": "10.0.0.1"},
+        }
+        self.assertEqual(expected_ips, result["ips"])
+
+    def test_allocate_ipv6(self):
+        self._write({"net1_ips": {"host1": "fd00::1"}})
+        params = self._params(net_name="net1", hostname="host2",
+                              cidr="fd00::/64")
+        result = self.module.allocate(FakeModule(params))
+        self.assertEqual({"changed": True, "ip": "fd00::2"}, result)
+
+    def test_allocate_invalid_existing(self):
+        self._write({"net1_ips": {"host1": "10.0.1.1"}})
+        params = self._params(net_name="net1", hostname="host2",
+                              cidr="10.0.0.0/24")
+        with self.assertRaises(ModuleFailed) as context:
+            self.module.allocate(FakeModule(params))
+        self.assertEqual(
+            "Found invalid existing allocations in network 10.0.0.0/24: "
+            "host1: 10.0.1.1",
+            context.exception.payload["msg"])
+
+    def test_allocate_duplicate_existing(self):
+        self._write({"net1_ips": {"host1": "10.0.0.1", "host2": "10.0.0.1"}})
+        params = self._params(net_name="net1", hostname="host3",
+                              cidr="10.0.0.0/24")
+        with self.assertRaises(ModuleFailed) as context:
+            self.module.allocate(FakeModule(params))
+        self.assertEqual(
+            "Found duplicate existing allocations in network 10.0.0.0/24: "
+            "10.0.0.1: host1, host2",
+            context.exception.payload["msg"])
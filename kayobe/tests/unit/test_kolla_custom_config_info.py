@@ -0,0 +1,380 @@
+# Copyright (c) 2026 StackHPC Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import importlib.util
+import json
+import os
+from pathlib import Path
+import shutil
+import tempfile
+import unittest
+
+from ansible.errors import AnsibleUndefinedVariable
+
+
+PLUGIN_PATH = (
+    Path(__file__).resolve().parents[3] /
+    "ansible/roles/kolla-openstack/action_plugins/kolla_custom_config_info.py"
+)
+
+
+def _load_plugin():
+    spec = importlib.util.spec_from_file_location(
+        "kayobe_kolla_custom_config_info", PLUGIN_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class TestConfigCollector(unittest.TestCase):
+
+    def setUp(self):
+        self.plugin = _load_plugin()
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.search_paths = [os.path.join(self.tmpdir, "env"),
+                             os.path.join(self.tmpdir, "base")]
+        self.destination = os.path.join(self.tmpdir, "dest")
+        os.mkdir(self.destination)
+
+    def _touch(self, *parts):
+        path = os.path.join(self.tmpdir, *parts)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w"):
+            pass
+        return path
+
+    def _collect(self, include_globs, ignore_globs=None, rules=None):
+        collector = self.plugin.ConfigCollector(
+            include_globs=[{"glob": g, "enabled": True}
+                           for g in include_globs],
+            ignore_globs=ignore_globs or [],
+            destination=self.destination,
+            search_paths=self.search_paths,
+            rules=rules or [])
+        collector.collect()
+        return collector
+
+    def test_glob_matcher(self):
+        matcher = self.plugin.GlobMatcher(
+            ["nova/**", "**/*.conf", "*.pem", ".hidden/*"])
+        self.assertEqual(0, matcher.first_match("nova/nova.conf"))
+        self.assertEqual(1, matcher.first_match("neutron/ml2/ml2.conf"))
+        self.assertEqual(1, matcher.first_match("nova.conf"))
+        self.assertEqual(2, matcher.first_match("cert.pem"))
+        self.assertEqual(3, matcher.first_match(".hidden/file"))
+        self.assertIsNone(matcher.first_match("neutron/.hidden.conf"))
+        self.assertIsNone(matcher.first_match("neutron/cert.pem"))
+        self.assertEqual([0, 1], matcher.matches("nova/nova.conf"))
+        self.assertIsNone(self.plugin.GlobMatcher([]).first_match("x"))
+
+    def test_glob_matcher_index(self):
+        self.assertEqual("nova", self.plugin._glob_prefix("nova/*.conf"))
+        self.assertEqual("nova.conf", self.plugin._glob_prefix("nova.conf"))
+        self.assertIsNone(self.plugin._glob_prefix("**/*.conf"))
+        self.assertIsNone(self.plugin._glob_prefix("n?va/*.conf"))
+        self.assertEqual(".gz", self.plugin._glob_extension("*.ring.gz"))
+        self.assertEqual("", self.plugin._glob_extension("nova/README"))
+        self.assertIsNone(self.plugin._glob_extension("nova/**"))
+        self.assertIsNone(self.plugin._glob_extension("nova/*"))
+        self.assertIsNone(self.plugin._glob_extension("*.c?nf"))
+        self.assertIsNone(self.plugin._glob_extension("[.]conf"))
+
+        globs = ["nova/*.conf", "**/*.pem", "*", "nova/**", "**/README"]
+        matcher = self.plugin.GlobMatcher(globs)
+        self.assertEqual(0, matcher.first_match("nova/nova.conf"))
+        self.assertEqual(1, matcher.first_match("nova/cert.pem"))
+        self.assertEqual(2, matcher.first_match("nova.conf"))
+        self.assertEqual(3, matcher.first_match("nova/api/api.conf"))
+        self.assertEqual(3, matcher.first_match("nova/README"))
+        self.assertEqual(4, matcher.first_match("neutron/README"))
+        self.assertIsNone(matcher.first_match("neutron/neutron.conf"))
+        # Only globs which may match are compiled.
+        regex, group_globs = matcher._buckets[("nova", ".conf")]
+        self.assertEqual([0, 2, 3], group_globs)
+        # Results are cached.
+        matcher._buckets.clear()
+        self.assertEqual(0, matcher.first_match("nova/nova.conf"))
+        self.assertEqual({}, matcher._buckets)
+
+    def test_collect(self):
+        env_nova = self._touch("env", "nova.conf")
+        base_nova = self._touch("base", "nova.conf")
+        self._touch("base", "nova", "nova.conf")
+        self._touch("base", "other.txt")
+        self._touch("base", "sub", ".hidden.conf")
+        self._touch("dest", "old.conf")
+        self._touch("dest", "nova", "ignored.conf")
+        collector = self._collect(
+            ["*.conf", "nova/*.conf", "**/*.conf"],
+            ignore_globs=[{"glob": "nova/**", "enabled": True}])
+        self.assertEqual(
+            {"nova.conf": [env_nova, base_nova],
+             "nova/nova.conf": [os.path.join(self.search_paths[1],
+                                             "nova/nova.conf")]},
+            collector.files_in_source)
+        self.assertEqual({"old.conf", "nova/ignored.conf"},
+                         collector.files_in_destination)
+        self.assertEqual(["old.conf"],
+                         collector.filter_files_in_destination())
+
+    def test_collect_disabled(self):
+        self._touch("env", "nova.conf")
+        self._touch("dest", "nova.conf")
+        collector = self.plugin.ConfigCollector(
+            include_globs=[{"glob": "nova.conf", "enabled": False}],
+            ignore_globs=[], destination=self.destination,
+            search_paths=self.search_paths, rules=[])
+        collector.collect()
+        self.assertEqual({}, collector.files_in_source)
+        self.assertEqual({"nova.conf"}, collector.files_in_destination)
+
+    def test_collect_not_bool(self):
+        collector = self.plugin.ConfigCollector(
+            include_globs=[{"glob": "nova.conf", "enabled": "yes"}],
+            ignore_globs=[], destination=self.destination,
+            search_paths=self.search_paths, rules=[])
+        self.assertRaises(ValueError, collector.collect)
+
+    def test_collect_symlinks(self):
+        self._touch("shared", "nova.conf")
+        os.makedirs(self.search_paths[0])
+        os.symlink(os.path.join(self.tmpdir, "shared"),
+                   os.path.join(self.search_paths[0], "nova"))
+        # The globstar does not traverse symbolic links to directories.
+        collector = self._collect(["**/*.conf"])
+        self.assertEqual({}, collector.files_in_source)
+        collector = self._collect(["nova/*.conf"])
+        self.assertEqual(["nova/nova.conf"],
+                         list(collector.files_in_source))
+
+    def test_collect_symlink_loop(self):
+        self._touch("env", "nova.conf")
+        os.symlink(self.search_paths[0],
+                   os.path.join(self.search_paths[0], "loop"))
+        collector = self._collect(["**/*.conf", "loop/*.conf"])
+        self.assertEqual(["nova.conf", "loop/nova.conf"],
+                         list(collector.files_in_source))
+
+    def test_partition_rules(self):
+        self._touch("env", "nova.conf")
+        self._touch("base", "nova.conf")
+        self._touch("base", "cert.pem")
+        rules = [
+            {"glob": "**/*.conf", "strategy": "merge_configs",
+             "priority": 2000},
+            {"glob": "**/*.pem", "strategy": "copy", "priority": 1000},
+            {"glob": "nova.conf", "strategy": "copy", "priority": 500,
+             "enabled": False},
+        ]
+        collector = self._collect(["*"], rules=rules)
+        actions = collector.partition_into_actions()
+        self.assertEqual(1, len(actions["merge_configs"]))
+        self.assertEqual(2, len(actions["merge_configs"][0]["sources"]))
+        self.assertEqual(1, len(actions["copy"]))
+
+
+class TestConfigManifest(unittest.TestCase):
+
+    def setUp(self):
+        self.plugin = _load_plugin()
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.manifest_path = os.path.join(self.tmpdir, "manifest.json")
+        self.variables = {"foo": "bar", "baz": {"a": [1, 2]}}
+        self.resolved = []
+
+    def _resolve(self, name):
+        self.resolved.append(name)
+        try:
+            return self.variables[name]
+        except KeyError:
+            raise AnsibleUndefinedVariable(name)
+
+    def _manifest(self):
+        return self.plugin.ConfigManifest(self.manifest_path, self._resolve)
+
+    def _write(self, name, content):
+        path = os.path.join(self.tmpdir, name)
+        with open(path, "w") as f:
+            f.write(content)
+        return path
+
+    def _actions(self, strategy, sources, dest):
+        actions = {s: [] for s in ["copy", "template", "concat",
+                                   "merge_configs", "merge_yaml"]}
+        if strategy in ["copy", "template"]:
+            action = {"src": sources[-1], "dest": dest, "params": {}}
+        else:
+            action = {"sources": sources, "dest": dest, "params": {}}
+        actions[strategy].append(action)
+        return actions
+
+    def _record(self, fingerprints):
+        # Mimic the kolla_custom_config_manifest action plugin.
+        files = {dest: {"fingerprint": fingerprint,
+                        "stat": self.plugin._stat_signature(dest)}
+                 for dest, fingerprint in fingerprints.items()}
+        with open(self.manifest_path, "w") as f:
+            json.dump({"version": self.plugin.MANIFEST_VERSION,
+                       "files": files}, f)
+
+    def test_fingerprint_variables(self):
+        src = self._write("src.conf", "a = {{ foo }}\n{% set x = 1 %}{{ x }}")
+        manifest = self._manifest()
+        fp1 = manifest.fingerprint("template", [src], {})
+        self.assertEqual(["foo"], self.resolved)
+        self.variables["foo"] = "other"
+        fp2 = self._manifest().fingerprint("template", [src], {})
+        self.assertNotEqual(fp1, fp2)
+
+    def test_fingerprint_undefined(self):
+        src = self._write("src.conf", "{% if qux is defined %}{{ qux }}"
+                                      "{% endif %}")
+        fp1 = self._manifest().fingerprint("template", [src], {})
+        self.variables["qux"] = "defined"
+        fp2 = self._manifest().fingerprint("template", [src], {})
+        self.assertNotEqual(fp1, fp2)
+
+    def test_fingerprint_params_and_content(self):
+        src = self._write("src.conf", "{{ foo }}")
+        manifest = self._manifest()
+        fp1 = manifest.fingerprint("template", [src], {})
+        fp2 = manifest.fingerprint("template", [src], {"mode": "0600"})
+        fp3 = manifest.fingerprint("merge_configs", [src], {})
+        self._write("src.conf", "{{ foo }}\n")
+        fp4 = manifest.fingerprint("template", [src], {})
+        self.assertEqual(4, len({fp1, fp2, fp3, fp4}))
+
+    def test_fingerprint_copy_not_templated(self):
+        src = self._write("src.conf", "{{ lookup('env', 'HOME') }}")
+        self._manifest().fingerprint("copy", [src], {})
+        self.assertEqual([], self.resolved)
+
+    def test_fingerprint_uncacheable(self):
+        contents = [
+            "{{ lookup('env', 'HOME') }}",
+            "{{ query('inventory_hostnames', 'all') }}",
+            "{{ hostvars[inventory_hostname].foo }}",
+            "{% include 'other.j2' %}",
+            "#jinja2: variable_start_string:'[%'\n[% foo %]",
+            "{{ template_run_date }}",
+            "{{ foo ",
+            "{{ internal_net_name | net_ip }}",
+            "{{ 'internal' | kayobe.plugins.net_cidr }}",
+            "{% if 'internal' is net_is_vlan %}{% endif %}",
+            "{{ ['internal'] | map('net_ip') | list }}",
+            "{{ ['/etc/hosts'] | select('exists') | list }}",
+            "{{ foo | selectattr('path', 'file') | list }}",
+            "{{ foo | map(bar) | list }}",
+            "{% if '/etc/hosts' is exists %}{% endif %}",
+            "{% if '/etc/hosts' is ansible.builtin.file %}{% endif %}",
+            "{{ foo | random }}",
+            "{{ foo | custom_filter }}",
+        ]
+        for content in contents:
+            src = self._write("src.conf", content)
+            self.assertRaises(self.plugin.Uncacheable,
+                              self._manifest().fingerprint,
+                              "template", [src], {})
+
+    def test_fingerprint_pure_filters(self):
+        content = (
+            "{{ foo | default('x') | to_nice_json }}\n"
+            "{{ baz | ansible.builtin.combine({'b': 1}) | dict2items }}\n"
+            "{{ baz.a | map('string') | select('match', '1') | list }}\n"
+            "{{ baz.a | map(attribute='x') | reject | list }}\n"
+            "{{ [baz] | selectattr('a', 'defined') | list }}\n"
+            "{% if foo is string and foo is ansible.builtin.search('b') %}"
+            "{% endif %}"
+        )
+        src = self._write("src.conf", content)
+        self._manifest().fingerprint("template", [src], {})
+        self.assertEqual(["baz", "foo"], sorted(self.resolved))
+
+    def test_filter_actions(self):
+        src1 = self._write("src1.conf", "{{ foo }}")
+        src2 = self._write("src2.conf", "{{ baz }}")
+        dest = self._write("dest.conf", "bar")
+        actions = self._actions("merge_configs", [src1, src2], dest)
+        result = self._manifest().filter_actions(actions)
+        # Not yet in the manifest.
+        self.assertEqual(1, len(result["merge_configs"]))
+        self.assertEqual([], result["unchanged"])
+        self.assertEqual([dest], list(result["fingerprints"]))
+
+        self._record(result["fingerprints"])
+        actions = self._actions("merge_configs", [src1, src2], dest)
+        result = self._manifest().filter_actions(actions)
+        self.assertEqual([], result["merge_configs"])
+        self.assertEqual([dest], result["unchanged"])
+
+        # A change to a referenced variable.
+        self.variables["baz"]["a"].append(3)
+        actions = self._actions("merge_configs", [src1, src2], dest)
+        result = self._manifest().filter_actions(actions)
+        self.assertEqual(1, len(result["merge_configs"]))
+
+    def test_filter_actions_dest_modified(self):
+        src = self._write("src.conf", "{{ foo }}")
+        dest = self._write("dest.conf", "bar")
+        actions = self._actions("template", [src], dest)
+        result = self._manifest().filter_actions(actions)
+        self._record(result["fingerprints"])
+        self._write("dest.conf", "modified")
+        actions = self._actions("template", [src], dest)
+        result = self._manifest().filter_actions(actions)
+        self.assertEqual(1, len(result["template"]))
+
+    def test_filter_actions_network_filter(self):
+        # net_ip reads internal_ips from the template context, which is not
+        # referenced by the template.
+        self.variables.update({"internal_net_name": "internal",
+                               "internal_ips": {"host": "10.0.0.1"}})
+        src = self._write("src.conf", "ip = {{ internal_net_name | net_ip }}")
+        dest = self._write("dest.conf", "ip = 10.0.0.1")
+        actions = self._actions("template", [src], dest)
+        result = self._manifest().filter_actions(actions)
+        self._record(result["fingerprints"])
+
+        self.variables["internal_ips"] = {"host": "10.0.0.2"}
+        actions = self._actions("template", [src], dest)
+        result = self._manifest().filter_actions(actions)
+        self.assertEqual(1, len(result["template"]))
+        self.assertEqual([], result["unchanged"])
+
+    def test_filter_actions_uncacheable(self):
+        src = self._write("src.conf", "{{ lookup('env', 'HOME') }}")
+        dest = self._write("dest.conf", "bar")
+        actions = self._actions("template", [src], dest)
+        result = self._manifest().filter_actions(actions)
+        self.assertEqual(1, len(result["template"]))
+        self.assertEqual({}, result["fingerprints"])
+
+    def test_manifest_plugin_shares_definitions(self):
+        spec = importlib.util.spec_from_file_location(
+            "kayobe_kolla_custom_config_manifest",
+            PLUGIN_PATH.parent / "kolla_custom_config_manifest.py")
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        self.assertEqual(self.plugin.MANIFEST_VERSION,
+                         module.MANIFEST_VERSION)
+        path = self._write("dest.conf", "bar")
+        self.assertEqual(self.plugin._stat_signature(path),
+                         module._stat_signature(path))
+
+    def test_manifest_version(self):
+        with open(self.manifest_path, "w") as f:
+            json.dump({"version": 0, "files": {"/dest": {}}}, f)
+        self.assertEqual({}, self._manifest().entries)
@@ -0,0 +1,459 @@
+# Copyright (c) 2026 StackHPC Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from http import server
+import importlib.util
+import json
+import os
+from pathlib import Path
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from ansible.constants import DEFAULT_VAULT_ID_MATCH
+from ansible.parsing.vault import VaultLib
+from ansible.parsing.vault import VaultSecret
+import yaml
+
+
+MODULE_PATH = (
+    Path(__file__).resolve().parents[3] /
+    "ansible/roles/kolla-ansible/library/kolla_passwords.py"
+)
+
+
+class ModuleFailed(Exception):
+    def __init__(self, payload):
+        super().__init__(payload.get("msg", "module failed"))
+        self.payload = payload
+
+
+class ModuleExited(Exception):
+    def __init__(self, payload):
+        super().__init__("module exited")
+        self.payload = payload
+
+
+class FakeModule:
+    def __init__(self, params, check_mode=False):
+        self.params = params
+        self.check_mode = check_mode
+        self.commands = []
+
+    def fail_json(self, **kwargs):
+        raise ModuleFailed(kwargs)
+
+    def exit_json(self, **kwargs):
+        raise ModuleExited(kwargs)
+
+    def run_command(self, cmd, check_rc=False, path_prefix=None):
+        """Fake kolla-* commands."""
+        self.commands.append(cmd)
+        path = cmd[cmd.index("--passwords") + 1]
+        with open(path) as f:
+            passwords = yaml.safe_load(f)
+        if cmd[0] == "kolla-genpwd":
+            for key, value in passwords.items():
+                if key.endswith("_ssh_key"):
+                    passwords[key] = {"private_key": "private",
+                                      "public_key": "public"}
+                elif value is None and key != "docker_registry_password":
+                    passwords[key] = "generated-" + key
+        elif cmd[0] == "kolla-readpwd":
+            passwords = {key: "vault-" + key for key in passwords}
+        with open(path, "w") as f:
+            yaml.safe_dump(passwords, f)
+        return 0, "", ""
+
+    def atomic_move(self, src, dest):
+        os.rename(src, dest)
+
+    def load_file_common_arguments(self, params):
+        return {}
+
+    def set_fs_attributes_if_different(self, file_args, changed):
+        return changed
+
+
+class StubVaultHandler(server.BaseHTTPRequestHandler):
+    """Minimal Hashicorp Vault API with a KV v2 secrets engine at kolla/."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _respond(self, status, body):
+        content = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def _handle(self):
+        vault = self.server.vault
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length)) if length else {}
+        with vault.lock:
+            vault.requests.append((self.command, self.path))
+            vault.connections.add(self.client_address)
+        if self.path == "/v1/auth/approle/login":
+            if body != {"role_id": "role", "secret_id": "secret"}:
+                return self._respond(400, {"errors": ["invalid role"]})
+            return self._respond(200, {"auth": {"client_token": "token"}})
+        if self.headers.get("X-Vault-Token") != "token":
+            return self._respond(403, {"errors": ["permission denied"]})
+        prefix = "/v1/kolla/data/"
+        if not self.path.startswith(prefix):
+            return self._respond(404, {"errors": []})
+        key = self.path[len(prefix):]
+        if self.command == "GET":
+            if key not in vault.secrets:
+                return self._respond(404, {"errors": []})
+            return self._respond(200, {"data": {"data": vault.secrets[key],
+                                                "metadata": {}}})
+        with vault.lock:
+            vault.secrets[key] = body["data"]
+        return self._respond(200, {"data": {"version": 1}})
+
+    do_GET = do_POST = do_PUT = _handle
+
+
+class StubVault(object):
+    """A stub Hashicorp Vault server running in a thread."""
+
+    def __init__(self, secrets=None):
+        self.secrets = dict(secrets or {})
+        self.requests = []
+        self.connections = set()
+        self.lock = threading.Lock()
+        self.server = server.ThreadingHTTPServer(("127.0.0.1", 0),
+                                                 StubVaultHandler)
+        self.server.vault = self
+        self.addr = "http://127.0.0.1:%d" % self.server.server_port
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       args=(0.01,))
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def writes(self):
+        return sorted(path.split("/")[-1]
+                      for method, path in self.requests
+                      if method in ("POST", "PUT") and "/data/" in path)
+
+
+class TestKollaPasswords(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        self.sample = os.path.join(self.path, "sample.yml")
+        self.dest = os.path.join(self.path, "kolla", "passwords.yml")
+        self._write(self.sample, {"database_password": None,
+                                  "docker_registry_password": None,
+                                  "nova_ssh_key": {"private_key": None,
+                                                   "public_key": None}})
+        self.vault = VaultLib([(DEFAULT_VAULT_ID_MATCH,
+                                VaultSecret(b"secret"))])
+
+    def _write(self, path, passwords):
+        with open(path, "w") as f:
+            yaml.safe_dump(passwords, f)
+
+    def _read(self, path, encrypted=False):
+        with open(path, "rb") as f:
+            content = f.read()
+        if encrypted:
+            content = self.vault.decrypt(content)
+        return yaml.safe_load(content)
+
+    def _load_module(self):
+        spec = importlib.util.spec_from_file_location(
+            "kayobe_kolla_passwords_module",
+            MODULE_PATH,
+        )
+        if spec is None or spec.loader is None:
+            raise RuntimeError("Failed to load kolla_passwords module spec")
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+
+    def _run(self, check_mode=False, **params):
+        module = self._load_module()
+        params = dict({
+            "dest": self.dest,
+            "overrides": {},
+            "sample": self.sample,
+            "src": self.dest,
+            "vault_password": None,
+            "vault_addr": None,
+            "vault_mount_point": None,
+            "vault_kv_path": None,
+            "vault_namespace": None,
+            "vault_role_id": None,
+            "vault_secret_id": None,
+            "vault_token": None,
+            "vault_cacert": None,
+            "virtualenv": "/venv",
+        }, **params)
+        fake_module = FakeModule(params, check_mode)
+        with mock.patch.object(
+            module, "AnsibleModule", return_value=fake_module
+        ):
+            with self.assertRaises(ModuleExited) as context:
+                module.main()
+        return context.exception.payload, fake_module.commands
+
+    def test_generate(self):
+        result, commands = self._run(overrides={"custom": "value"})
+
+        self.assertTrue(result["changed"])
+        self.assertEqual([["kolla-genpwd", "--passwords", mock.ANY]],
+                         commands)
+        expected = {
+            "custom": "value",
+            "database_password": "generated-database_password",
+            "docker_registry_password": None,
+            "nova_ssh_key": {"private_key": "private",
+                             "public_key": "public"},
+        }
+        self.assertEqual(expected, self._read(self.dest))
+
+    def test_unchanged(self):
+        self._run()
+        inode = os.stat(self.dest).st_ino
+        result, commands = self._run()
+
+        self.assertFalse(result["changed"])
+        self.assertEqual([], commands)
+        self.assertEqual(inode, os.stat(self.dest).st_ino)
+
+    def test_merge_existing(self):
+        os.makedirs(os.path.dirname(self.dest))
+        self._write(self.dest, {"database_password": "existing",
+                                "nova_ssh_key": {"private_key": "a",
+                                                 "public_key": "b"},
+                                "old_password": "old"})
+        result, commands = self._run(
+            overrides={"database_password": "override"})
+
+        self.assertTrue(result["changed"])
+        self.assertEqual([], commands)
+        expected = {
+            "database_password": "override",
+            "docker_registry_password": None,
+            "nova_ssh_key": {"private_key": "a", "public_key": "b"},
+            "old_password": "old",
+        }
+        self.assertEqual(expected, self._read(self.dest))
+
+    def test_new_sample_key(self):
+        self._run()
+        passwords = self._read(self.sample)
+        passwords["new_password"] = None
+        self._write(self.sample, passwords)
+        result, commands = self._run()
+
+        self.assertTrue(result["changed"])
+        self.assertEqual(1, len(commands))
+        self.assertEqual("generated-new_password",
+                         self._read(self.dest)["new_password"])
+
+    def test_migrate_redis_password(self):
+        # As with kolla-mergepwd, the existing Redis password is used for
+        # Valkey on upgrade.
+        self._run()
+        passwords = self._read(self.sample)
+        passwords["valkey_master_password"] = None
+        self._write(self.sample, passwords)
+        passwords = self._read(self.dest)
+        passwords["redis_master_password"] = "redis"
+        self._write(self.dest, passwords)
+        result, commands = self._run()
+
+        self.assertTrue(result["changed"])
+        self.assertEqual([], commands)
+        passwords = self._read(self.dest)
+        self.assertEqual("redis", passwords["valkey_master_password"])
+        self.assertEqual("redis", passwords["redis_master_password"])
+
+    def test_regenerate_null(self):
+        # Setting a password to null forces it to be regenerated, as with
+        # kolla-genpwd.
+        self._run()
+        passwords = self._read(self.dest)
+        passwords["database_password"] = None
+        self._write(self.dest, passwords)
+        result, commands = self._run()
+
+        self.assertTrue(result["changed"])
+        self.assertEqual(1, len(commands))
+        self.assertEqual("generated-database_password",
+                         self._read(self.dest)["database_password"])
+        self.assertIsNone(self._read(self.dest)["docker_registry_password"])
+
+    def test_encrypt(self):
+        result, _ = self._run(vault_password="secret")
+
+        self.assertTrue(result["changed"])
+        with open(self.dest) as f:
+            self.assertTrue(f.readline().startswith("$ANSIBLE_VAULT;"))
+        passwords = self._read(self.dest, encrypted=True)
+        self.assertEqual("generated-database_password",
+                         passwords["database_password"])
+
+        # Unchanged content is not encrypted again.
+        with open(self.dest) as f:
+            content = f.read()
+        result, commands = self._run(vault_password="secret")
+        self.assertFalse(result["changed"])
+        self.assertEqual([], commands)
+        with open(self.dest) as f:
+            self.assertEqual(content, f.read())
+
+    def test_encrypt_existing_plaintext(self):
+        self._run()
+        result, _ = self._run(vault_password="secret")
+
+        self.assertTrue(result["changed"])
+        self._read(self.dest, encrypted=True)
+
+    def test_check_mode(self):
+        result, _ = self._run(check_mode=True)
+
+        self.assertTrue(result["changed"])
+        self.assertFalse(os.path.exists(self.dest))
+
+    def test_no_sample(self):
+        os.unlink(self.sample)
+        module = self._load_module()
+        fake_module = FakeModule({"sample": self.sample})
+        with self.assertRaises(ModuleFailed) as context:
+            module.kolla_passwords(fake_module)
+
+        self.assertIn("does not exist", context.exception.payload["msg"])
+
+    def _run_vault(self, stub_vault, **params):
+        params = dict({"vault_addr": stub_vault.addr,
+                       "vault_mount_point": "kolla",
+                       "vault_kv_path": "passwords",
+                       "vault_namespace": "",
+                       "vault_cacert": ""}, **params)
+        if "vault_role_id" not in params:
+            params.setdefault("vault_token", "token")
+        return self._run(**params)
+
+    def _stub_vault(self, secrets=None):
+        stub_vault = StubVault(secrets)
+        self.addCleanup(stub_vault.stop)
+        return stub_vault
+
+    def test_hashicorp_vault(self):
+        stub_vault = self._stub_vault(
+            {"passwords/database_password": {"password": "stored"}})
+        result, commands = self._run_vault(stub_vault,
+                                           overrides={"custom": "value"})
+
+        self.assertTrue(result["changed"])
+        self.assertEqual(["custom", "nova_ssh_key"], result["vault_written"])
+        self.assertEqual(["kolla-genpwd"],
+                         [command[0] for command in commands])
+        passwords = self._read(self.dest)
+        self.assertEqual("stored", passwords["database_password"])
+        self.assertEqual("value", passwords["custom"])
+        self.assertEqual({"password": "value"},
+                         stub_vault.secrets["passwords/custom"])
+        # SSH key pairs are stored directly, as by kolla-writepwd.
+        self.assertEqual(
+            {"private_key": "private", "public_key": "public"},
+            stub_vault.secrets["passwords/nova_ssh_key"])
+        # Empty values are not written.
+        self.assertNotIn("passwords/docker_registry_password",
+                         stub_vault.secrets)
+        self.assertEqual(["custom", "nova_ssh_key"], stub_vault.writes())
+
+    def test_hashicorp_vault_unchanged(self):
+        stub_vault = self._stub_vault()
+        self._run_vault(stub_vault)
+        stub_vault.requests.clear()
+        result, commands = self._run_vault(stub_vault)
+
+        self.assertFalse(result["changed"])
+        self.assertEqual([], result["vault_written"])
+        self.assertEqual([], commands)
+        self.assertEqual([], stub_vault.writes())
+
+    def test_hashicorp_vault_changed(self):
+        stub_vault = self._stub_vault()
+        self._run_vault(stub_vault)
+        result, _ = self._run_vault(
+            stub_vault, overrides={"database_password": "override"})
+
+        self.assertTrue(result["changed"])
+        self.assertEqual(["database_password"], result["vault_written"])
+        self.assertEqual({"password": "override"},
+                         stub_vault.secrets["passwords/database_password"])
+
+    def test_hashicorp_vault_ssh_key(self):
+        # SSH key pair stored by kolla-writepwd.
+        ssh_key = {"private_key": "stored-private",
+                   "public_key": "stored-public"}
+        stub_vault = self._stub_vault({"passwords/nova_ssh_key": ssh_key})
+        result, commands = self._run_vault(stub_vault)
+
+        self.assertEqual(["database_password"], result["vault_written"])
+        self.assertEqual(["kolla-genpwd"],
+                         [command[0] for command in commands])
+        # The stored key pair is used rather than generating a new one.
+        self.assertEqual(ssh_key, self._read(self.dest)["nova_ssh_key"])
+        self.assertEqual(ssh_key, stub_vault.secrets["passwords/nova_ssh_key"])
+        self.assertEqual(["database_password"], stub_vault.writes())
+
+    def test_hashicorp_vault_connection_reuse(self):
+        secrets = {"passwords/password%d" % i: {"password": "stored"}
+                   for i in range(50)}
+        stub_vault = self._stub_vault(secrets)
+        self._write(self.sample, {key.split("/")[1]: None for key in secrets})
+        self._run_vault(stub_vault)
+
+        self.assertEqual(50, len(stub_vault.requests))
+        module = self._load_module()
+        self.assertLessEqual(len(stub_vault.connections),
+                             module.VAULT_CONCURRENCY)
+
+    def test_hashicorp_vault_approle(self):
+        stub_vault = self._stub_vault()
+        result, _ = self._run_vault(stub_vault, vault_role_id="role",
+                                    vault_secret_id="secret")
+
+        self.assertTrue(result["changed"])
+        logins = [path for _, path in stub_vault.requests
+                  if path == "/v1/auth/approle/login"]
+        self.assertEqual(1, len(logins))
+
+    def test_hashicorp_vault_auth_failure(self):
+        stub_vault = self._stub_vault()
+        with self.assertRaises(ModuleFailed) as context:
+            self._run_vault(stub_vault, vault_token="wrong")
+
+        self.assertIn("Failed to generate kolla passwords",
+                      context.exception.payload["msg"])
+        self.assertFalse(os.path.exists(self.dest))
@@ -0,0 +1,223 @@
+# Copyright (c) 2026 StackHPC Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import importlib.util
+from pathlib import Path
+import subprocess
+import threading
+import unittest
+from unittest import mock
+
+
+MODULE_PATH = (
+    Path(__file__).resolve().parents[3] /
+    "ansible/roles/network-connectivity/library/"
+    "network_connectivity_check.py"
+)
+
+IPUTILS_OUTPUT = """\
+PING 10.0.0.2 (10.0.0.2) 8972(9000) bytes of data.
+
+--- 10.0.0.2 ping statistics ---
+3 packets transmitted, 2 received, 33.3333% packet loss, time 401ms
+rtt min/avg/max/mdev = 0.101/0.150/0.199/0.049 ms
+"""
+
+IPUTILS_FAILED_OUTPUT = """\
+PING 10.0.0.3 (10.0.0.3) 56(84) bytes of data.
+
+--- 10.0.0.3 ping statistics ---
+1 packets transmitted, 0 received, 100% packet loss, time 0ms
+"""
+
+BUSYBOX_OUTPUT = """\
+PING 10.0.0.4 (10.0.0.4): 56 data bytes
+
+--- 10.0.0.4 ping statistics ---
+1 packets transmitted, 1 packets received, 0% packet loss
+round-trip min/avg/max = 0.300/0.300/0.300 ms
+"""
+
+
+class ModuleFailed(Exception):
+    def __init__(self, payload):
+        super().__init__(payload.get("msg", "module failed"))
+        self.payload = payload
+
+
+class ModuleExited(Exception):
+    def __init__(self, payload):
+        super().__init__("module exited")
+        self.payload = payload
+
+
+class FakeModule:
+    def __init__(self, params, check_mode=False):
+        self.params = params
+        self.check_mode = check_mode
+
+    def fail_json(self, **kwargs):
+        raise ModuleFailed(kwargs)
+
+    def exit_json(self, **kwargs):
+        raise ModuleExited(kwargs)
+
+
+class FakePing:
+    """Fake ping CLI, tracking commands and concurrent processes."""
+
+    def __init__(self, unreachable=(), delay=0):
+        self.unreachable = set(unreachable)
+        self.delay = delay
+        self.cmds = []
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def run(self, cmd, **kwargs):
+        address = cmd[-1]
+        with self.lock:
+            self.cmds.append(cmd)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        threading.Event().wait(self.delay)
+        with self.lock:
+            self.active -= 1
+        if address in self.unreachable:
+            return subprocess.CompletedProcess(cmd, 1, IPUTILS_FAILED_OUTPUT,
+                                               "")
+        return subprocess.CompletedProcess(cmd, 0, BUSYBOX_OUTPUT, "")
+
+
+class TestNetworkConnectivityCheck(unittest.TestCase):
+
+    def _load_module(self):
+        spec = importlib.util.spec_from_file_location(
+            "kayobe_network_connectivity_check_module",
+            MODULE_PATH,
+        )
+        if spec is None or spec.loader is None:
+            raise RuntimeError("Failed to load network_connectivity_check "
+                               "spec")
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+
+    def _run(self, ping, params):
+        module = self._load_module()
+        params = dict({"count": 1, "timeout": 1, "interval": 0.2,
+                       "concurrency": 64, "icmp_overhead_bytes": 28},
+                      **params)
+        fake_module = FakeModule(params)
+        with mock.patch.object(
+            module, "AnsibleModule", return_value=fake_module
+        ):
+            with mock.patch.object(module.subprocess, "run", ping.run):
+                module.run_module()
+
+    def test_parse_ping(self):
+        module = self._load_module()
+        self.assertEqual({"transmitted": 3, "received": 2,
+                          "loss": 33.3333, "rtt_min": 0.101,
+                          "rtt_avg": 0.15, "rtt_max": 0.199},
+                         module.parse_ping(IPUTILS_OUTPUT))
+        self.assertEqual({"transmitted": 1, "received": 0, "loss": 100.0,
+                          "rtt_min": None, "rtt_avg": None,
+                          "rtt_max": None},
+                         module.parse_ping(IPUTILS_FAILED_OUTPUT))
+        self.assertEqual({"transmitted": 1, "received": 1, "loss": 0.0,
+                          "rtt_min": 0.3, "rtt_avg": 0.3, "rtt_max": 0.3},
+                         module.parse_ping(BUSYBOX_OUTPUT))
+
+    def test_ping_cmd(self):
+        module = self._load_module()
+        self.assertEqual(
+            ["ping", "-q", "-n", "-c", "1", "-W", "1", "8.8.8.8"],
+            module.ping_cmd({"address": "8.8.8.8"}, 1, 1, 0.2, 28))
+        self.assertEqual(
+            ["ping", "-q", "-n", "-c", "3", "-W", "2", "-i", "0.2",
+             "-M", "do", "-s", "8972", "10.0.0.2"],
+            module.ping_cmd({"address": "10.0.0.2", "mtu": 9000}, 3, 2, 0.2,
+                            28))
+
+    def test_check(self):
+        ping = FakePing()
+        targets = [
+            {"type": "gateway", "network": "net1", "destination": "gateway",
+             "address": "10.0.0.1", "mtu": 1500},
+            {"type": "host", "network": "net1", "destination": "host2",
+             "address": "10.0.0.2", "mtu": 1500},
+            {"type": "external", "address": "8.8.8.8"},
+        ]
+        with self.assertRaises(ModuleExited) as context:
+            self._run(ping, {"targets": targets})
+
+        payload = context.exception.payload
+        self.assertFalse(payload["changed"])
+        self.assertEqual(targets[1], {key: payload["checks"][1][key]
+                                      for key in targets[1]})
+        self.assertEqual([False, False, False],
+                         [check["failed"] for check in payload["checks"]])
+        self.assertEqual({"net1": {"checked": 2, "failed": 0, "loss": 0.0,
+                                   "rtt_avg": 0.3, "mtu": 1500}},
+                         payload["networks"])
+        self.assertEqual(3, len(ping.cmds))
+
+    def test_check_concurrency(self):
+        ping = FakePing(delay=0.05)
+        targets = [{"address": "10.0.0.%d" % i} for i in range(6)]
+        with self.assertRaises(ModuleExited):
+            self._run(ping, {"targets": targets, "concurrency": 2})
+
+        self.assertEqual(6, len(ping.cmds))
+        self.assertEqual(2, ping.max_active)
+
+    def test_check_failure(self):
+        ping = FakePing(unreachable={"10.0.0.3"})
+        targets = [
+            {"type": "host", "network": "net1", "destination": "host2",
+             "address": "10.0.0.2"},
+            {"type": "host", "network": "net1", "destination": "host3",
+             "address": "10.0.0.3"},
+        ]
+        with self.assertRaises(ModuleFailed) as context:
+            self._run(ping, {"targets": targets})
+
+        payload = context.exception.payload
+        self.assertEqual("Failed to reach host3 (100% packet loss)",
+                         payload["msg"])
+        self.assertEqual([False, True],
+                         [check["failed"] for check in payload["checks"]])
+        self.assertEqual({"net1": {"checked": 2, "failed": 1, "loss": 50.0,
+                                   "rtt_avg": 0.3, "mtu": None}},
+                         payload["networks"])
+
+    def test_check_no_ping(self):
+        def run(cmd, **kwargs):
+            raise FileNotFoundError("No such file or directory: 'ping'")
+
+        ping = FakePing()
+        ping.run = run
+        with self.assertRaises(ModuleFailed) as context:
+            self._run(ping, {"targets": [{"address": "10.0.0.2"}]})
+
+        self.assertIn("No such file or directory",
+                      context.exception.payload["msg"])
+
+    def test_check_no_address(self):
+        with self.assertRaises(ModuleFailed) as context:
+            self._run(FakePing(), {"targets": [{"network": "net1"}]})
+
+        self.assertIn("Targets without an address",
+                      context.exception.payload["msg"])
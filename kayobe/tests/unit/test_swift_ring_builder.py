@@ -0,0 +1,231 @@
+# Copyright (c) 2026 StackHPC Ltd.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import importlib.util
+from pathlib import Path
+import unittest
+from unittest import mock
+
+
+SCRIPT_PATH = (
+    Path(__file__).resolve().parents[3] /
+    "ansible/roles/swift-rings/files/swift-ring-builder.py"
+)
+
+
+def _load_script():
+    spec = importlib.util.spec_from_file_location(
+        "kayobe_swift_ring_builder", SCRIPT_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+CONFIG = {
+    "part_power": 10,
+    "replication_count": 3,
+    "min_part_hours": 1,
+    "hosts": [
+        {"host": "swift1", "region": 1, "zone": 1, "ip": "10.0.0.1",
+         "port": 6001, "replication_ip": "10.1.0.1",
+         "replication_port": 6001,
+         "devices": [{"device": "sdb", "weight": 100},
+                     {"device": "sdc", "weight": 100}]},
+        {"host": "swift2", "region": 1, "zone": 2, "ip": "10.0.0.2",
+         "port": 6001, "replication_ip": "10.1.0.2",
+         "replication_port": 6001, "devices": None},
+    ],
+}
+
+
+class TestSwiftRingBuilder(unittest.TestCase):
+
+    def setUp(self):
+        self.script = _load_script()
+
+    def test_get_builder(self):
+        self.script.SwiftRingBuilder = None
+        builder = self.script.get_builder("/builds", "object")
+        self.assertIsInstance(builder, self.script.RingBuilder)
+        self.script.SwiftRingBuilder = mock.Mock()
+        builder = self.script.get_builder("/builds", "object")
+        self.assertIsInstance(builder, self.script.InProcessRingBuilder)
+        self.assertEqual("/builds/object.builder", builder.builder_file)
+        self.assertEqual("/builds/object.ring.gz", builder.ring_file)
+
+    @mock.patch("subprocess.check_call")
+    def test_build_rings_command(self, mock_call):
+        self.script.SwiftRingBuilder = None
+        self.script.build_rings(CONFIG, "/builds", "object")
+        commands = [c[0][0][2] for c in mock_call.call_args_list]
+        self.assertEqual(["create", "add", "add", "rebalance"], commands)
+
+    def test_build_rings_in_process(self):
+        swift_builder = mock.Mock()
+        swift_builder.return_value.devs = []
+        swift_builder.return_value.rebalance.return_value = (3072, 0.0, 0)
+        swift_builder.return_value.parts = 1024
+        swift_builder.return_value.replicas = 3.0
+        swift_builder.return_value.dispersion = 0
+        self.script.SwiftRingBuilder = swift_builder
+        self.script.validate_and_normalize_address = lambda a: a
+        self.script.build_rings(CONFIG, "/builds", "object")
+        swift_builder.assert_called_once_with(10, 3.0, 1)
+        builder = swift_builder.return_value
+        self.assertEqual(["sdb", "sdc"],
+                         [c[0][0]["device"]
+                          for c in builder.add_dev.call_args_list])
+        builder.rebalance.assert_called_once_with()
+        builder.save.assert_called_once_with("/builds/object.builder")
+        builder.get_ring.return_value.save.assert_called_once_with(
+            "/builds/object.ring.gz")
+
+    def test_main_build_path(self):
+        with mock.patch.object(self.script, "build_service_rings",
+                               return_value=0) as mock_build:
+            with mock.patch("sys.argv", ["swift-ring-builder.py",
+                                         "--build-path", "/builds",
+                                         "object", "account"]):
+                self.script.main()
+        mock_build.assert_called_once_with("/builds", ["object", "account"],
+                                           False)
+
+    def test_main_incremental(self):
+        with mock.patch.object(self.script, "build_service_rings",
+                               return_value=0) as mock_build:
+            with mock.patch("sys.argv", ["swift-ring-builder.py",
+                                         "--incremental", "--build-path",
+                                         "/builds", "object"]):
+                self.script.main()
+        mock_build.assert_called_once_with("/builds", ["object"], True)
+
+    def test_main_build_path_failed(self):
+        with mock.patch.object(self.script, "build_service_rings",
+                               return_value=1):
+            with mock.patch("sys.argv", ["swift-ring-builder.py",
+                                         "--build-path", "/builds",
+                                         "object"]):
+                self.assertRaises(SystemExit, self.script.main)
+
+
+def _dev(dev_id, ip, device, weight=100.0, zone=1):
+    return {"id": dev_id, "region": 1, "zone": zone, "ip": ip, "port": 6001,
+            "replication_ip": ip, "replication_port": 6001,
+            "device": device, "weight": weight, "meta": ""}
+
+
+class TestSwiftRingUpdate(unittest.TestCase):
+
+    def setUp(self):
+        self.script = _load_script()
+        self.script.validate_and_normalize_address = lambda a: a
+        self.script.swift_exceptions = mock.Mock(RingBuilderError=ValueError)
+        self.builder = self.script.InProcessRingBuilder("/builds", "object")
+        self.builder.builder = mock.Mock(part_power=10, replicas=3.0,
+                                         min_part_hours=1)
+
+    def _config(self, **kwargs):
+        config = {
+            "part_power": 10,
+            "replication_count": 3,
+            "min_part_hours": 1,
+            "hosts": [
+                {"host": "swift1", "region": 1, "zone": 1,
+                 "ip": "10.0.0.1", "port": 6001,
+                 "replication_ip": "10.0.0.1", "replication_port": 6001,
+                 "devices": [{"device": "sdb", "weight": 100},
+                             {"device": "sdc", "weight": 50}]},
+                {"host": "swift2", "region": 1, "zone": 2,
+                 "ip": "10.0.0.2", "port": 6001,
+                 "replication_ip": "10.0.0.2", "replication_port": 6001,
+                 "devices": [{"device": "sdb", "weight": 100}]},
+            ],
+        }
+        config.update(kwargs)
+        return config
+
+    def test_update(self):
+        builder = self.builder.builder
+        builder.devs = [
+            # Unchanged.
+            _dev(0, "10.0.0.1", "sdb"),
+            # Reweighted.
+            _dev(1, "10.0.0.1", "sdc"),
+            # Moved to a different zone.
+            _dev(2, "10.0.0.2", "sdb"),
+            None,
+            # Removed.
+            _dev(4, "10.0.0.3", "sdb"),
+        ]
+        summary = self.builder.update(self._config())
+        self.assertEqual({"added": 1, "removed": 2, "reweighted": 1,
+                          "updated": 0}, summary)
+        builder.set_dev_weight.assert_called_once_with(1, 50.0)
+        self.assertEqual([mock.call(2), mock.call(4)],
+                         builder.remove_dev.call_args_list)
+        builder.add_dev.assert_called_once_with(mock.ANY)
+        added = builder.add_dev.call_args[0][0]
+        self.assertEqual(("10.0.0.2", "sdb", 2),
+                         (added["ip"], added["device"], added["zone"]))
+        builder.set_replicas.assert_not_called()
+        builder.change_min_part_hours.assert_not_called()
+
+    def test_update_replication_address(self):
+        builder = self.builder.builder
+        builder.devs = [_dev(0, "10.0.0.1", "sdb"),
+                        _dev(1, "10.0.0.1", "sdc", weight=50.0),
+                        _dev(2, "10.0.0.2", "sdb", zone=2)]
+        config = self._config()
+        config["hosts"][1]["replication_ip"] = "10.1.0.2"
+        summary = self.builder.update(config)
+        self.assertEqual({"added": 0, "removed": 0, "reweighted": 0,
+                          "updated": 1}, summary)
+        self.assertEqual("10.1.0.2", builder.devs[2]["replication_ip"])
+
+    def test_update_ring_parameters(self):
+        builder = self.builder.builder
+        builder.devs = []
+        self.builder.update(self._config(replication_count=2,
+                                         min_part_hours=24))
+        builder.set_replicas.assert_called_once_with(2.0)
+        builder.change_min_part_hours.assert_called_once_with(24)
+
+    def test_update_part_power(self):
+        self.builder.builder.devs = []
+        self.assertRaises(SystemExit, self.builder.update,
+                          self._config(part_power=12))
+
+    def test_update_duplicate_device(self):
+        self.builder.builder.devs = []
+        config = self._config()
+        config["hosts"][0]["devices"].append({"device": "sdb",
+                                              "weight": 10})
+        self.assertRaises(SystemExit, self.builder.update, config)
+
+    def test_rebalance_not_strict(self):
+        builder = self.builder.builder
+        builder.rebalance.return_value = (512, 10.0, 0)
+        builder.parts = 1024
+        builder.dispersion = 1.0
+        self.assertRaises(SystemExit, self.builder.rebalance)
+        result = self.builder.rebalance(strict=False)
+        self.assertEqual({"parts_moved": 512, "parts_total": 3072,
+                          "parts_moved_percent": 16.67, "balance": 10.0,
+                          "dispersion": 1.0}, result)
+        self.assertEqual(2, builder.save.call_count)
+
+    def test_update_rings_requires_swift(self):
+        self.script.SwiftRingBuilder = None
+        self.assertRaises(SystemExit, self.script.update_rings,
+                          self._config(), "/builds", "object")
@@ -12,13 +12,15 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import json
 import logging
 import os
+import shutil
 import subprocess
+import tempfile
 import unittest
 from unittest import mock
 
-from ansible.parsing.vault import EncryptedString
 import yaml
 
 from kayobe import exception
@@ -29,6 +31,9 @@ class TestCase(unittest.TestCase):
 
     maxDiff = None
 
+    def setUp(self):
+        self.addCleanup(utils.EnvironmentFinder.clear)
+
     @mock.patch.object(utils, "run_command")
     def test_galaxy_role_install(self, mock_run):
         utils.galaxy_role_install("/path/to/role/file", "/path/to/roles")
@@ -133,57 +138,6 @@ key2: value2
         mock_read.return_value = "[1{!"
         self.assertRaises(SystemExit, utils.read_yaml_file, "/path/to/file")
 
-    @mock.patch.object(utils, "read_file")
-    def test_read_config_dump_yaml_file(self, mock_read):
-        config = """---
-key1: value1
-key2: value2
-"""
-        mock_read.return_value = config
-        result = utils.read_config_dump_yaml_file("/path/to/file")
-        self.assertEqual(result, {"key1": "value1", "key2": "value2"})
-        mock_read.assert_called_once_with("/path/to/file")
-
-    @mock.patch.object(utils, "read_file")
-    def test_read_config_dump_yaml_file_vaulted(self, mock_read):
-        config = """---
-key1: !vault |
-  $ANSIBLE_VAULT;1.1;AES256
-  633230623736383232323862393364323037343430393530316636363961626361393133646437
-  643438663261356433656365646138666133383032376532310a63323432306431303437623637
-  346236316161343635636230613838316566383933313338636237616338326439616536316639
-  6334343462333062363334300a3930313762313463613537626531313230303731343365643766
-  666436333037
-key2: value2
-key3:
-  - !vault |
-    $ANSIBLE_VAULT;1.1;AES256
-    633230623736383232323862393364323037343430393530316636363961626361393133646437
-    643438663261356433656365646138666133383032376532310a63323432306431303437623637
-    346236316161343635636230613838316566383933313338636237616338326439616536316639
-    6334343462333062363334300a3930313762313463613537626531313230303731343365643766
-    666436333037
-"""
-        mock_read.return_value = config
-        result = utils.read_config_dump_yaml_file("/path/to/file")
-        # Can't read the value without an encryption key, so just check type.
-        self.assertIsInstance(result["key1"], EncryptedString)
-        self.assertEqual(result["key2"], "value2")
-        self.assertIsInstance(result["key3"][0], EncryptedString)
-        mock_read.assert_called_once_with("/path/to/file")
-
-    @mock.patch.object(utils, "read_file")
-    def test_read_config_dump_yaml_file_open_failure(self, mock_read):
-        mock_read.side_effect = IOError
-        self.assertRaises(SystemExit, utils.read_config_dump_yaml_file,
-                          "/path/to/file")
-
-    @mock.patch.object(utils, "read_file")
-    def test_read_config_dump_yaml_file_not_yaml(self, mock_read):
-        mock_read.return_value = "[1{!"
-        self.assertRaises(SystemExit, utils.read_config_dump_yaml_file,
-                          "/path/to/file")
-
     @mock.patch.object(subprocess, "check_call")
     def test_run_command(self, mock_call):
         output = utils.run_command(["command", "to", "run"])
@@ -450,3 +404,90 @@ project=baz
             ["git", "rev-parse", "--show-toplevel"],
             check_output=True, quiet=True)
         mock_readable.assert_called_once_with("/path/to/repo/.gitreview")
+
+
+class TestEnvironmentFinderCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.addCleanup(utils.EnvironmentFinder.clear)
+        self.config_path = os.path.join(self.tmpdir, "etc", "kayobe")
+        environ = {"XDG_CACHE_HOME": os.path.join(self.tmpdir, "cache")}
+        patcher = mock.patch.dict(os.environ, environ)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        os.environ.pop(utils.ENVIRONMENT_ORDERING_ENV, None)
+        self._write_metadata("environment-B", ["environment-A"])
+
+    def _write_metadata(self, environment, dependencies):
+        path = os.path.join(self.config_path, "environments", environment)
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, ".kayobe-environment"), "w") as f:
+            yaml.safe_dump({"dependencies": dependencies}, f)
+
+    def _ordered(self, environment="environment-B"):
+        utils.EnvironmentFinder.clear()
+        return utils.EnvironmentFinder(self.config_path, environment).ordered()
+
+    def test_singleton(self):
+        finder = utils.EnvironmentFinder(self.config_path, "environment-B")
+        self.assertIs(finder,
+                      utils.EnvironmentFinder(self.config_path,
+                                              "environment-B"))
+
+    @mock.patch.object(utils.EnvironmentFinder, "_read_metadata",
+                       wraps=utils.EnvironmentFinder._read_metadata)
+    def test_cache(self, mock_read):
+        expected = ["environment-A", "environment-B"]
+        self.assertEqual(expected, self._ordered())
+        self.assertEqual(2, mock_read.call_count)
+        cache_files = os.listdir(
+            os.path.join(self.tmpdir, "cache", "kayobe", "environments"))
+        self.assertEqual(1, len(cache_files))
+
+        # Resolved from the cache.
+        self.assertEqual(expected, self._ordered())
+        self.assertEqual(2, mock_read.call_count)
+
+        # Unchanged content with a new modification time.
+        self._write_metadata("environment-B", ["environment-A"])
+        self.assertEqual(expected, self._ordered())
+        self.assertEqual(2, mock_read.call_count)
+
+        # Changed dependencies.
+        self._write_metadata("environment-A", ["environment-C"])
+        self.assertEqual(["environment-C"] + expected, self._ordered())
+        self.assertEqual(5, mock_read.call_count)
+
+    def test_cache_trivial(self):
+        self.assertEqual(["environment-C"], self._ordered("environment-C"))
+        self.assertFalse(os.path.exists(os.path.join(self.tmpdir, "cache")))
+
+    @mock.patch.object(utils.EnvironmentFinder, "_read_metadata")
+    def test_export(self, mock_read):
+        mock_read.return_value = {}
+        finder = utils.EnvironmentFinder(self.config_path, "environment-B")
+        env = {}
+        with mock.patch.object(finder, "ordered",
+                               return_value=["environment-X",
+                                             "environment-B"]):
+            finder.export(env)
+        entry = json.loads(env[utils.ENVIRONMENT_ORDERING_ENV])
+        self.assertEqual(["environment-X", "environment-B"], entry["ordering"])
+
+        # The exported ordering is used by child processes.
+        with mock.patch.dict(os.environ, env):
+            self.assertEqual(["environment-X", "environment-B"],
+                             self._ordered())
+            # Exports for other environments are ignored.
+            self.assertEqual(["environment-C"],
+                             self._ordered("environment-C"))
+        mock_read.assert_called_once_with(
+            os.path.join(self.config_path, "environments", "environment-C",
+                         ".kayobe-environment"))
+
+    def test_export_no_environment(self):
+        env = {}
+        utils.EnvironmentFinder(self.config_path, None).export(env)
+        self.assertEqual({}, env)
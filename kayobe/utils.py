@@ -17,17 +17,19 @@ from collections import defaultdict
 import configparser
 import glob
 import graphlib
+import hashlib
 from importlib.metadata import Distribution
 import json
 import logging
 import os
 import shutil
+import stat
 import subprocess
 import sys
+import tempfile
 from urllib.parse import unquote
 from urllib.parse import urlparse
 
-from ansible.parsing.yaml.loader import AnsibleLoader
 import yaml
 
 from kayobe import exception
@@ -179,20 +181,17 @@ def read_yaml_file(path):
         sys.exit(1)
 
 
-def read_config_dump_yaml_file(path):
-    """Read and decode a configuration dump YAML file."""
+def read_config_dump_json_file(path):
+    """Read and decode a configuration dump JSON file."""
     try:
-        content = read_file(path)
+        with open(path) as f:
+            return json.load(f)
     except IOError as e:
         print("Failed to open config dump file %s: %s" %
               (path, repr(e)))
         sys.exit(1)
-    try:
-        # AnsibleLoader supports loading vault encrypted variables.
-        data = AnsibleLoader(content).get_single_data()
-        return data
-    except yaml.YAMLError as e:
-        print("Failed to decode config dump YAML file %s: %s" %
+    except ValueError as e:
+        print("Failed to decode config dump JSON file %s: %s" %
               (path, repr(e)))
         sys.exit(1)
 
@@ -333,23 +332,75 @@ def get_kayobe_environment_path(base_path, environment):
     return env_path
 
 
+# Name of the environment variable used to pass resolved orderings of Kayobe
+# environments to child processes.
+ENVIRONMENT_ORDERING_ENV = "KAYOBE_ENVIRONMENT_ORDERING"
+
+
+def get_cache_path(*relative_path):
+    """Return the path to a file in the Kayobe cache directory."""
+    cache_home = (os.environ.get("XDG_CACHE_HOME") or
+                  os.path.join(os.path.expanduser("~"), ".cache"))
+    return os.path.join(cache_home, "kayobe", *relative_path)
+
+
+def _file_digest(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _file_fingerprint(path):
+    """Return a fingerprint of a file, or None if it is not a regular file."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if not stat.S_ISREG(st.st_mode):
+        return None
+    return [st.st_mtime_ns, _file_digest(path)]
+
+
+def _file_fingerprint_matches(path, fingerprint):
+    try:
+        st = os.stat(path)
+    except OSError:
+        st = None
+    if st is None or not stat.S_ISREG(st.st_mode):
+        return fingerprint is None
+    if fingerprint is None:
+        return False
+    # Avoid reading the file if its modification time is unchanged.
+    if st.st_mtime_ns == fingerprint[0]:
+        return True
+    try:
+        return _file_digest(path) == fingerprint[1]
+    except OSError:
+        return False
+
+
 class EnvironmentFinder(object):
     """Dependency resolver for kayobe environments
 
     The constraints are specified via a .kayobe-environment file.
+
+    Resolved orderings are cached in a file, keyed by a fingerprint of the
+    .kayobe-environment files they were resolved from, and may be passed to
+    child processes via the KAYOBE_ENVIRONMENT_ORDERING environment variable
+    using export().
     """
 
+    # Singleton instances, keyed by base path and environment.
+    _instances = {}
+
     def __new__(cls, base_path, environment):
         # Singleton instance so we don't have to resolve dependencies multiple
         # times or pass round a single instance.
-        it = cls.__dict__.get("__it__")
-        if it is None:
-            it = {}
-        if (base_path, environment) in it:
-            return it[(base_path, environment)]
-        singleton = object.__new__(cls)
-        singleton._init(base_path, environment)
-        it[(base_path, environment)] = singleton
+        key = (base_path, environment)
+        singleton = cls._instances.get(key)
+        if singleton is None:
+            singleton = object.__new__(cls)
+            singleton._init(base_path, environment)
+            cls._instances[key] = singleton
         return singleton
 
     def _init(self, base_path, environment):
@@ -357,6 +408,11 @@ class EnvironmentFinder(object):
         self._environment = environment
         self._ordering = None
 
+    @classmethod
+    def clear(cls):
+        """Forget all singleton instances and their resolved orderings."""
+        cls._instances.clear()
+
     @staticmethod
     def _read_metadata(path):
         if os.path.exists(path) and os.path.isfile(path):
@@ -384,15 +440,11 @@ class EnvironmentFinder(object):
                                       "should be strings")
             self._collect(dependency, result, visited)
 
-    def ordered(self):
-        """List of environments ordered by the constraints"""
+    def _resolve(self):
         environment = self._environment
-        if not environment:
-            return []
-        if self._ordering is not None:
-            return self._ordering.copy()
         graph = defaultdict(set)
-        self._collect(environment, graph, set())
+        visited = set()
+        self._collect(environment, graph, visited)
         ts = graphlib.TopologicalSorter(graph)
         try:
             ordering = list(ts.static_order())
@@ -403,7 +455,76 @@ class EnvironmentFinder(object):
                                   "environment dependencies. Please break "
                                   "this cycle and try again. The cycle is: %s"
                                   % cycle)
-        self._ordering = ordering if ordering else [environment]
+        ordering = ordering if ordering else [environment]
+        self._write_cache(ordering, visited)
+        return ordering
+
+    def _cache_key(self):
+        return {
+            "base_path": os.path.realpath(self._base_path),
+            "environment": self._environment,
+        }
+
+    def _cache_path(self):
+        key = json.dumps(self._cache_key(), sort_keys=True)
+        digest = hashlib.sha256(key.encode()).hexdigest()[:16]
+        return get_cache_path("environments", "%s.json" % digest)
+
+    def _read_env(self):
+        """Return an ordering passed by a parent process, or None."""
+        value = os.environ.get(ENVIRONMENT_ORDERING_ENV)
+        if not value:
+            return None
+        try:
+            entry = json.loads(value)
+        except ValueError:
+            return None
+        if (not isinstance(entry, dict) or
+                entry.get("key") != self._cache_key()):
+            return None
+        return entry.get("ordering")
+
+    def _read_cache(self):
+        """Return a cached ordering if it is up to date, or None."""
+        try:
+            with open(self._cache_path()) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if (not isinstance(entry, dict) or
+                entry.get("key") != self._cache_key()):
+            return None
+        files = entry.get("files") or {}
+        for path, fingerprint in files.items():
+            if not _file_fingerprint_matches(path, fingerprint):
+                return None
+        return entry.get("ordering")
+
+    def _write_cache(self, ordering, paths):
+        files = {path: _file_fingerprint(path) for path in sorted(paths)}
+        # Resolution is trivial without any .kayobe-environment files.
+        if not any(files.values()):
+            return
+        entry = {"key": self._cache_key(), "ordering": ordering,
+                 "files": files}
+        path = self._cache_path()
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, "w") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            LOG.debug("Failed to write environment cache %s: %s", path, e)
+
+    def ordered(self):
+        """List of environments ordered by the constraints"""
+        environment = self._environment
+        if not environment:
+            return []
+        if self._ordering is None:
+            self._ordering = (self._read_env() or self._read_cache() or
+                              self._resolve())
         return self._ordering.copy()
 
     def ordered_paths(self):
@@ -418,6 +539,16 @@ class EnvironmentFinder(object):
             result.append(full_path)
         return result
 
+    def export(self, env):
+        """Pass the resolved ordering to child processes.
+
+        :param env: environment variables dict for child processes.
+        """
+        if not self._environment:
+            return
+        entry = {"key": self._cache_key(), "ordering": self.ordered()}
+        env[ENVIRONMENT_ORDERING_ENV] = json.dumps(entry)
+
 
 def _gitreview_is_kayobe_config(gitreview_path):
     """Return whether a .gitreview file is for kayobe-config."""
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+
+# Benchmark the kolla_custom_config_info action plugin's ConfigCollector.
+#
+# Usage: tools/benchmark-config-collector.py [--files N] [--search-paths N]
+#
+# Generates a synthetic tree of files in each search path and in the
+# destination, then collects them using the default include globs, ignore
+# globs and rules of the kolla-openstack role.
+
+import argparse
+import importlib.util
+import os
+import pathlib
+import random
+import tempfile
+import time
+
+import yaml
+
+script_dir = pathlib.Path(__file__).parent.absolute()
+role_dir = os.path.join(script_dir, "../ansible/roles/kolla-openstack")
+path = os.path.join(role_dir, "action_plugins/kolla_custom_config_info.py")
+
+
+def load_module():
+    spec = importlib.util.spec_from_file_location("kolla_custom_config_info",
+                                                  path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_vars(name):
+    with open(os.path.join(role_dir, name, "main.yml")) as f:
+        return yaml.safe_load(f)
+
+
+def strip_templates(items):
+    # Enable items whose values are templated, and use the default INI merge
+    # strategy.
+    result = []
+    for item in items:
+        item = dict(item)
+        if isinstance(item.get("enabled"), str):
+            item["enabled"] = True
+        if "{{" in item.get("strategy", ""):
+            item["strategy"] = "concat"
+        if isinstance(item.get("params"), str):
+            item["params"] = {}
+        result.append(item)
+    return result
+
+
+def make_tree(root, files, services, rnd):
+    # Roughly half of the files match an include glob.
+    names = ["%s.conf" % s for s in services] + ["policy.yaml", "README"]
+    for i in range(files):
+        service = rnd.choice(services)
+        depth = rnd.randint(0, 3)
+        parts = [service] + ["dir%d" % rnd.randint(0, 9) for _ in range(depth)]
+        dirname = os.path.join(root, *parts[:depth])
+        os.makedirs(dirname, exist_ok=True)
+        name = rnd.choice(names) if i % 2 else "file%d.txt" % i
+        with open(os.path.join(dirname, name), "w"):
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=20000,
+                        help="Total number of files in the search paths")
+    parser.add_argument("--search-paths", type=int, default=3,
+                        help="Number of search paths")
+    args = parser.parse_args()
+
+    module = load_module()
+    defaults = load_vars("defaults")
+    include_globs = strip_templates(
+        defaults["kolla_openstack_custom_config_include_globs_default"])
+    rules = strip_templates(
+        defaults["kolla_openstack_custom_config_rules_default"])
+    role_vars = load_vars("vars")
+    ignore_globs = strip_templates(
+        role_vars["_kolla_openstack_custom_config_cleanup_ignore_globs"])
+    services = sorted({item["glob"].split("/")[0].split(".")[0]
+                       for item in include_globs} - {"**"})
+
+    rnd = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        search_paths = []
+        for i in range(args.search_paths):
+            search_path = os.path.join(tmpdir, "config%d" % i)
+            make_tree(search_path, args.files // args.search_paths, services,
+                      rnd)
+            search_paths.append(search_path)
+        destination = os.path.join(tmpdir, "destination")
+        make_tree(destination, args.files // args.search_paths, services, rnd)
+
+        start = time.perf_counter()
+        collector = module.ConfigCollector(
+            include_globs=include_globs, ignore_globs=ignore_globs,
+            destination=destination, search_paths=search_paths, rules=rules)
+        collector.collect()
+        collected = time.perf_counter()
+        actions = collector.partition_into_actions()
+        elapsed = time.perf_counter() - start
+
+    generated = sum(len(actions[s]) for s in
+                    ["copy", "template", "concat", "merge_configs",
+                     "merge_yaml"])
+    print("Collected %d files in %d search paths with %d include globs and "
+          "%d rules in %.2fs (collect %.2fs), producing %d files and %d "
+          "deletions" % (args.files, args.search_paths, len(include_globs),
+                         len(rules), elapsed, collected - start, generated,
+                         len(actions["delete"])))
+
+
+if __name__ == "__main__":
+    main()
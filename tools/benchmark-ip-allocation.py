@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+
+# Benchmark the ip_allocation module.
+#
+# Usage: tools/benchmark-ip-allocation.py [--existing N] [--new N]
+#
+# Allocates IP addresses for new hosts on a number of /16 networks, each of
+# which has a number of existing allocations.
+
+import argparse
+import importlib.util
+import os
+import pathlib
+import tempfile
+import time
+
+import netaddr
+import yaml
+
+script_dir = pathlib.Path(__file__).parent.absolute()
+path = os.path.join(script_dir,
+                    "../ansible/roles/ip-allocation/library/ip_allocation.py")
+
+# Use the C dumper if PyYAML was built with libyaml, as ip_allocation does.
+YAML_DUMPER = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+
+class FakeModule:
+    check_mode = False
+
+    def __init__(self, params):
+        self.params = params
+
+    def fail_json(self, **kwargs):
+        raise SystemExit(kwargs["msg"])
+
+
+def load_module():
+    spec = importlib.util.spec_from_file_location("ip_allocation", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--networks", type=int, default=3,
+                        help="Number of /16 networks")
+    parser.add_argument("--existing", type=int, default=50000,
+                        help="Number of existing allocations per network")
+    parser.add_argument("--new", type=int, default=1000,
+                        help="Number of new hosts to allocate")
+    args = parser.parse_args()
+
+    module = load_module()
+    networks = ["10.%d.0.0/16" % i for i in range(args.networks)]
+    allocations = {}
+    for i, cidr in enumerate(networks):
+        first = netaddr.IPNetwork(cidr).first + 1
+        allocations["net%d_ips" % i] = {
+            "existing%d" % j: str(netaddr.IPAddress(first + j))
+            for j in range(args.existing)
+        }
+    requests = {
+        "new%d" % j: [{"net_name": "net%d" % i, "cidr": cidr}
+                      for i, cidr in enumerate(networks)]
+        for j in range(args.new)
+    }
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filename = os.path.join(tmpdir, "network-allocation.yml")
+        with open(filename, "w") as f:
+            yaml.dump(allocations, f, Dumper=YAML_DUMPER,
+                      default_flow_style=False)
+        params = {"allocation_file": filename, "allocations": requests}
+        start = time.perf_counter()
+        module.allocate(FakeModule(params))
+        elapsed = time.perf_counter() - start
+
+    print("Allocated %d IPs on %d networks with %d existing allocations each "
+          "in %.2fs" % (args.new * args.networks, args.networks,
+                        args.existing, elapsed))
+
+
+if __name__ == "__main__":
+    main()